@@ -0,0 +1,133 @@
+# bench_columnar.py
+#
+# Carga de ServiceResourceSkill da org inteira (páginas de 2.000 registros em JSON,
+# como a SOQL/queryMore devolve), decodificada de 2 jeitos:
+#   - dicts:    json.loads + lista de registros (o get_all_query_results de sempre:
+#               `attributes` com type/url e o Skill aninhado em cada registro)
+#   - colunas:  cada página vai para o Columns e é descartada (sem `attributes`,
+#               Ids/labels internados, 1 lista por campo)
+#
+# Mede a memória retida depois da carga (tracemalloc), o tempo de decodificação
+# (sem tracemalloc, melhor de --repeticoes) e o tempo de consumo: agrupar por
+# técnico e montar o build_plan, que lê as linhas com .get() nos 2 formatos.
+#
+# Uso:
+#   python benchmarks/bench_columnar.py
+#   python benchmarks/bench_columnar.py --tecnicos 50000 --skills-por-tecnico 12
+
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from columnar import Columns  # noqa: E402
+from ensure_manutencao_skill import build_plan  # noqa: E402
+
+PAGE_SIZE = 2000
+
+def make_pages(args) -> list:
+    """Páginas JSON da SOQL (com totalSize/done/nextRecordsUrl), na ordem do ORDER BY."""
+    rnd = random.Random(args.seed)
+    catalog = [(f"0Hs{i:012d}AAA", f"Skill {i:04d} - Manutenção") for i in range(args.catalogo)]
+    records = []
+    for i in range(args.tecnicos):
+        sr_id = f"0Hn{i:012d}AAA"
+        for n, (skill_id, label) in enumerate(rnd.sample(catalog, args.skills_por_tecnico)):
+            link_id = f"0Hr{i * 100 + n:012d}AAA"
+            records.append({
+                "attributes": {"type": "ServiceResourceSkill",
+                               "url": f"/services/data/v65.0/sobjects/ServiceResourceSkill/{link_id}"},
+                "Id": link_id,
+                "ServiceResourceId": sr_id,
+                "SkillId": skill_id,
+                "Skill": {"attributes": {"type": "Skill", "url": f"/services/data/v65.0/sobjects/Skill/{skill_id}"},
+                          "MasterLabel": label, "DeveloperName": label.replace(" ", "_")},
+                "SystemModstamp": "2024-05-01T12:30:00.000+0000",
+            })
+    pages = []
+    for start in range(0, len(records), PAGE_SIZE):
+        last = start + PAGE_SIZE >= len(records)
+        page = {"totalSize": len(records), "done": last, "records": records[start:start + PAGE_SIZE]}
+        if not last:
+            page["nextRecordsUrl"] = f"/services/data/v65.0/query/01gXX-{start + PAGE_SIZE}"
+        pages.append(json.dumps(page))
+    return pages
+
+def decode_dicts(pages: list) -> list:
+    out = []
+    for text in pages:
+        out.extend(json.loads(text).get("records", []))
+    return out
+
+def decode_columns(pages: list) -> Columns:
+    out = Columns()
+    for text in pages:
+        out.extend(json.loads(text).get("records", []))
+    return out
+
+def consume(rows) -> int:
+    """O que list_current_skill_links_bulk + build_plan fazem com o resultado."""
+    by_tech = {}
+    for r in rows:
+        by_tech.setdefault(r.get("ServiceResourceId"), []).append(r)
+    plans = [build_plan(sr_id, {"id": sr_id, "name": sr_id}, links) for sr_id, links in by_tech.items()]
+    return len(plans)
+
+def retained(decoder, pages: list) -> int:
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    rows = decoder(pages)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del rows
+    return used
+
+def best_time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser(description="Memória e tempo de decodificação: dicts x colunas")
+    ap.add_argument("--tecnicos", type=int, default=10000)
+    ap.add_argument("--skills-por-tecnico", type=int, default=8)
+    ap.add_argument("--catalogo", type=int, default=120, help="Skills distintas na org")
+    ap.add_argument("--repeticoes", type=int, default=3, help="Execuções por medida de tempo (vale a melhor)")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    pages = make_pages(args)
+    dicts, cols = decode_dicts(pages), decode_columns(pages)
+    n = len(dicts)
+    if consume(dicts) != consume(cols) or [build_plan("x", {"id": "x", "name": "x"}, dicts[:50])["current_names"]] != \
+            [build_plan("x", {"id": "x", "name": "x"}, cols[:50])["current_names"]]:
+        raise SystemExit("❌ Os 2 formatos deram planos diferentes.")
+
+    rows = []
+    for name, decoder, decoded in (("dicts", decode_dicts, dicts), ("colunas", decode_columns, cols)):
+        rows.append((name, retained(decoder, pages), best_time(lambda: decoder(pages), args.repeticoes),
+                     best_time(lambda: consume(decoded), args.repeticoes)))
+
+    print(f"{n} registros em {len(pages)} páginas ({args.tecnicos} técnicos x {args.skills_por_tecnico} skills, "
+          f"catálogo de {args.catalogo})")
+    print(f"{'FORMATO':<10} {'MEMÓRIA':>10} {'POR REGISTRO':>13} {'DECODIFICAR':>12} {'CONSUMIR':>10}")
+    for name, used, decode_s, consume_s in rows:
+        print(f"{name:<10} {used / 2**20:>8.1f}MB {used / n:>11.0f} B {1000 * decode_s:>10.0f}ms {1000 * consume_s:>8.0f}ms")
+    (_, mem_d, dec_d, _), (_, mem_c, dec_c, _) = rows
+    print(f"memória: {100.0 * (1 - mem_c / mem_d):.0f}% menor ({mem_d / mem_c:.1f}x) | "
+          f"decodificação: {dec_c / dec_d:.2f}x o tempo dos dicts")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# bench_hotpaths.py
+#
+# Microbenchmarks do CPU gasto fora da rede (o que pesa com 10k+ técnicos e
+# catálogo de 2.000 skills), com dados sintéticos e semente fixa:
+#   - build_label_to_id / build_groups_resolved   (catálogo -> grupos)
+#   - get_skill_label_from_link                    (links aninhados e "achatados")
+#   - normalize_records                            (lista / dict da SOQL)
+#   - build_plan                                   (links -> TechPlan)
+#   - compute_changes                              (modos 1, 2 e 3 por técnico)
+#   - box / print_preview                          (prévia renderizada, stdout descartado)
+#
+# Cada caso roda 1 vez para aquecer e depois --repeticoes vezes (gc desligado
+# durante a medida); o relatório mostra mediana e mínimo por execução e o custo
+# por item. Guarde um relatório com --json e compare depois com --comparar
+# (a variação do MÍNIMO, o número menos sujeito a ruído, aparece por caso; pior
+# que --tolerancia é marcado e, com --falhar, o comando sai com código 1).
+# Compare só na mesma máquina.
+#
+# Uso:
+#   python benchmarks/bench_hotpaths.py
+#   python benchmarks/bench_hotpaths.py --json benchmarks/bench_hotpaths_base.json
+#   python benchmarks/bench_hotpaths.py --comparar benchmarks/bench_hotpaths_base.json
+#   python benchmarks/bench_hotpaths.py --casos compute_changes,build_plan --tecnicos 50000 --comparar base.json --falhar
+
+import io
+import os
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ensure_manutencao_skill as ems  # noqa: E402
+
+# =========================
+# DADOS SINTÉTICOS
+# =========================
+def make_catalog(rnd: random.Random, size: int) -> list:
+    """Skills como a SOQL devolve: os labels do GROUPS_MAP + enchimento até `size`."""
+    labels = list(dict.fromkeys(label for g in ems.GROUP_ORDER for label in ems.GROUPS_MAP.get(g, [])))
+    n = 0
+    while len(labels) < size:
+        labels.append(f"Skill {n:04d} - {rnd.choice(['Manutenção', 'Instalação', 'Retirada', 'Vistoria'])}")
+        n += 1
+    return [{"attributes": {"type": "Skill", "url": f"/services/data/v65.0/sobjects/Skill/0Hs{i:012d}AAA"},
+             "Id": f"0Hs{i:012d}AAA", "MasterLabel": label, "DeveloperName": label.replace(" ", "_")}
+            for i, label in enumerate(labels[:size])]
+
+def make_links(rnd: random.Random, sr_id: str, catalog: list, per_tech: int, seq: int) -> list:
+    """ServiceResourceSkill de 1 técnico (formato aninhado da SOQL; ~1 em 8 "achatado" como no Composite/CSV)."""
+    links = []
+    for n, skill in enumerate(rnd.sample(catalog, per_tech)):
+        link_id = f"0Hr{seq * 100 + n:012d}AAA"
+        if rnd.random() < 0.125:
+            links.append({"Id": link_id, "ServiceResourceId": sr_id, "SkillId": skill["Id"],
+                          "Skill.MasterLabel": skill["MasterLabel"], "SystemModstamp": "2024-05-01T12:30:00.000+0000"})
+        else:
+            links.append({"attributes": {"type": "ServiceResourceSkill"}, "Id": link_id, "ServiceResourceId": sr_id,
+                          "SkillId": skill["Id"], "SystemModstamp": "2024-05-01T12:30:00.000+0000",
+                          "Skill": {"attributes": {"type": "Skill"}, "MasterLabel": skill["MasterLabel"],
+                                    "DeveloperName": skill["DeveloperName"]}})
+    return links
+
+def make_dataset(args) -> dict:
+    rnd = random.Random(args.seed)
+    catalog = make_catalog(rnd, args.skills)
+    # técnicos tendem a ter skills dos grupos: metade das skills sorteadas vem dos primeiros 60 do catálogo
+    head = catalog[:60]
+    links_by_tech = []
+    for i in range(args.tecnicos):
+        sr_id = f"0Hn{i:012d}AAA"
+        k = args.skills_por_tecnico
+        links = make_links(rnd, sr_id, head, k // 2, i) + make_links(rnd, sr_id, catalog[60:], k - k // 2, i + 10 ** 6)
+        links_by_tech.append((f"TECNICO {i:05d}", {"id": sr_id, "name": f"TECNICO {i:05d}"}, links))
+    label_to_id = ems.build_label_to_id(catalog)
+    groups_resolved, _ = ems.build_groups_resolved(label_to_id)
+    group = args.grupo if args.grupo in groups_resolved else ems.GROUP_ORDER[0]
+    desired = {s["id"]: s["label"] for s in groups_resolved[group]}
+    plans = [ems.build_plan(ident, sr, links) for ident, sr, links in links_by_tech]
+    return {
+        "catalog": catalog,
+        "label_to_id": label_to_id,
+        "links_by_tech": links_by_tech,
+        "all_links": [l for _, _, links in links_by_tech for l in links],
+        "soql_results": [{"totalSize": len(links), "done": True, "records": links} for _, _, links in links_by_tech],
+        "plans": plans,
+        "group": group,
+        "desired": desired,
+        "desired_ids": set(desired),
+    }
+
+# =========================
+# CASOS
+# =========================
+def make_cases(data: dict, args) -> dict:
+    """nome -> (itens por execução, função que roda 1 execução)."""
+    catalog = data["catalog"]
+    label_to_id = data["label_to_id"]
+    all_links = data["all_links"]
+    plans = data["plans"]
+    desired_ids = data["desired_ids"]
+    current = [p["current_ids"] for p in plans]
+    soql_results = data["soql_results"]
+    preview_plans = plans[:args.preview_tecnicos]
+    box_lines = [f"🆔 ServiceResourceId: {p['sr_id']}" for p in preview_plans[:20]] + ["x" * 300, ""]
+
+    def run_build_plan():
+        for ident, sr, links in data["links_by_tech"]:
+            ems.build_plan(ident, sr, links)
+
+    def run_compute_changes():
+        for ids in current:
+            for mode in ("1", "2", "3"):
+                ems.compute_changes(mode, ids, desired_ids)
+
+    def run_print_preview():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for p in preview_plans:
+                ems.print_preview(p, data["group"], "3", data["desired"], color=True)
+
+    def run_box():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(1000):
+                ems.box("👷 TECNICO 00001  [OK]", box_lines, enabled=True)
+
+    return {
+        "build_label_to_id": (len(catalog), lambda: ems.build_label_to_id(catalog)),
+        "build_groups_resolved": (sum(len(v) for v in ems.GROUPS_MAP.values()),
+                                  lambda: ems.build_groups_resolved(label_to_id)),
+        "get_skill_label_from_link": (len(all_links), lambda: [ems.get_skill_label_from_link(l) for l in all_links]),
+        "normalize_records": (len(soql_results), lambda: [ems.normalize_records(r) for r in soql_results]),
+        "build_plan": (len(data["links_by_tech"]), run_build_plan),
+        "compute_changes": (3 * len(current), run_compute_changes),
+        "box": (1000, run_box),
+        "print_preview": (len(preview_plans), run_print_preview),
+    }
+
+def measure(fn, repeat: int) -> list:
+    fn()  # aquecimento (caches, catálogo interno do TechPlan)
+    times = []
+    gc_was = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - started)
+    finally:
+        if gc_was:
+            gc.enable()
+    return times
+
+# =========================
+# RELATÓRIO
+# =========================
+def print_report(report: dict, base: dict = None, tolerance: float = 10.0) -> list:
+    """Imprime a tabela; devolve os casos piores que a base além da tolerância (%)."""
+    cfg = report["config"]
+    print(f"\n{cfg['tecnicos']} técnicos x {cfg['skills_por_tecnico']} skills | catálogo {cfg['skills']} | "
+          f"prévia de {cfg['preview_tecnicos']} | {cfg['repeticoes']} repetições | Python {report['ambiente']['python']}")
+    print(f"\n{'CASO':<28} {'ITENS':>7} {'MEDIANA':>11} {'MÍNIMO':>11} {'POR ITEM':>11} {'VS BASE':>9}")
+    worse = []
+    for name, s in report["casos"].items():
+        ref = ((base or {}).get("casos") or {}).get(name)
+        vs = ""
+        if ref and ref.get("min_ms"):
+            change = 100.0 * (s["min_ms"] - ref["min_ms"]) / ref["min_ms"]
+            vs = f"{change:+.1f}%"
+            if change > tolerance:
+                vs += " ⚠"
+                worse.append(name)
+        print(f"{name:<28} {s['itens']:>7} {s['mediana_ms']:>9.2f}ms {s['min_ms']:>9.2f}ms "
+              f"{s['por_item_us']:>9.2f}µs {vs:>9}")
+    if base:
+        if worse:
+            print(f"\nPiores que a base (> {tolerance:g}%): {', '.join(worse)}")
+        else:
+            print(f"\nNenhum caso piorou mais de {tolerance:g}% em relação à base.")
+    return worse
+
+def main():
+    ap = argparse.ArgumentParser(description="Microbenchmarks dos caminhos quentes (sem rede)")
+    ap.add_argument("--tecnicos", type=int, default=10000, help="Técnicos sintéticos. Padrão: 10000")
+    ap.add_argument("--skills", type=int, default=2000, help="Skills no catálogo. Padrão: 2000")
+    ap.add_argument("--skills-por-tecnico", type=int, default=8, help="Links por técnico. Padrão: 8")
+    ap.add_argument("--preview-tecnicos", type=int, default=500, help="Técnicos renderizados no print_preview. Padrão: 500")
+    ap.add_argument("--grupo", default="Retirada", help="Grupo desejado nos casos de plano/prévia. Padrão: Retirada")
+    ap.add_argument("--repeticoes", type=int, default=7, help="Execuções medidas por caso. Padrão: 7")
+    ap.add_argument("--casos", default=None, help="Só esses casos (separados por vírgula)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--json", default=None, help="Grava o relatório em JSON (use como base do --comparar)")
+    ap.add_argument("--comparar", default=None, help="Relatório JSON anterior: mostra a variação do mínimo de cada caso")
+    ap.add_argument("--tolerancia", type=float, default=10.0, help="%% de piora aceita no --comparar. Padrão: 10")
+    ap.add_argument("--falhar", action="store_true", help="Com --comparar: sai com código 1 se algum caso piorou além da tolerância")
+    args = ap.parse_args()
+
+    data = make_dataset(args)
+    cases = make_cases(data, args)
+    if args.casos:
+        wanted = [c.strip() for c in args.casos.split(",") if c.strip()]
+        unknown = [c for c in wanted if c not in cases]
+        if unknown:
+            raise SystemExit(f"❌ Caso desconhecido: {', '.join(unknown)} (use {', '.join(cases)})")
+        cases = {k: cases[k] for k in wanted}
+
+    report = {
+        "config": {k: getattr(args, k) for k in ("tecnicos", "skills", "skills_por_tecnico", "preview_tecnicos",
+                                                 "grupo", "repeticoes", "seed")},
+        "ambiente": {"python": platform.python_version(), "implementacao": platform.python_implementation(),
+                     "maquina": platform.machine(), "sistema": platform.system()},
+        "casos": {},
+    }
+    for name, (items, fn) in cases.items():
+        times = measure(fn, args.repeticoes)
+        median = statistics.median(times)
+        report["casos"][name] = {
+            "itens": items,
+            "mediana_ms": round(1000 * median, 3),
+            "min_ms": round(1000 * min(times), 3),
+            "por_item_us": round(1e6 * median / items, 3) if items else 0.0,
+        }
+
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        if base.get("config") != report["config"]:
+            print("⚠ Configuração diferente da base: a comparação não é justa.", file=sys.stderr)
+    worse = print_report(report, base, args.tolerancia)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.falhar and worse:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
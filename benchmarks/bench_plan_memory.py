@@ -0,0 +1,103 @@
+# bench_plan_memory.py
+#
+# Memória por técnico dos planos guardados durante a execução (lista `plans`):
+#   - dict antigo: links crus do Salesforce (com Skill aninhado) + current_by_skillid
+#     + current_ids + current_names (4 cópias do mesmo dado)
+#   - TechPlan: índices no catálogo interno (array) + Ids dos links numa string
+#
+# Os links são gerados como JSON e decodificados (como a resposta da SOQL), e
+# descartados depois de montar o plano: o que sobra na memória é só o que o
+# plano retém. Medido com tracemalloc.
+#
+# Uso:
+#   python benchmarks/bench_plan_memory.py
+#   python benchmarks/bench_plan_memory.py --tecnicos 50000 --skills-por-tecnico 12
+
+import os
+import sys
+import gc
+import json
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ensure_manutencao_skill import build_plan, get_skill_label_from_link  # noqa: E402
+
+def legacy_build_plan(identifier: str, sr: dict, current_links: list) -> dict:
+    """build_plan como era antes do TechPlan (referência da comparação)."""
+    current_by_skillid = {}
+    current_ids = set()
+    current_names = []
+    for l in current_links:
+        sid = l.get("SkillId")
+        lid = l.get("Id")
+        if sid and lid:
+            current_by_skillid[sid] = lid
+            current_ids.add(sid)
+        current_names.append(get_skill_label_from_link(l))
+    return {
+        "status": "OK",
+        "identifier": identifier,
+        "sr_id": sr["id"],
+        "sr_name": sr["name"],
+        "current_links": current_links,
+        "current_by_skillid": current_by_skillid,
+        "current_ids": current_ids,
+        "current_names": current_names,
+    }
+
+def make_links_json(rnd: random.Random, sr_id: str, catalog: list, per_tech: int, seq: int) -> str:
+    records = []
+    for n, (skill_id, label) in enumerate(rnd.sample(catalog, per_tech)):
+        link_id = f"0Hr{seq * 100 + n:012d}AAA"
+        records.append({
+            "attributes": {"type": "ServiceResourceSkill",
+                           "url": f"/services/data/v65.0/sobjects/ServiceResourceSkill/{link_id}"},
+            "Id": link_id,
+            "ServiceResourceId": sr_id,
+            "SkillId": skill_id,
+            "Skill": {"attributes": {"type": "Skill", "url": f"/services/data/v65.0/sobjects/Skill/{skill_id}"},
+                      "MasterLabel": label, "DeveloperName": label.replace(" ", "_")},
+        })
+    return json.dumps(records)
+
+def measure(builder, args) -> int:
+    rnd = random.Random(args.seed)
+    catalog = [(f"0Hs{i:012d}AAA", f"Skill {i:04d} - Manutenção") for i in range(args.catalogo)]
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    plans = []
+    for i in range(args.tecnicos):
+        sr_id = f"0Hn{i:012d}AAA"
+        links = json.loads(make_links_json(rnd, sr_id, catalog, args.skills_por_tecnico, i))
+        plans.append(builder(f"TECNICO {i:05d}", {"id": sr_id, "name": f"TECNICO {i:05d}"}, links))
+        del links
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del plans
+    return used
+
+def main():
+    ap = argparse.ArgumentParser(description="Memória por técnico: plano dict x TechPlan")
+    ap.add_argument("--tecnicos", type=int, default=10000)
+    ap.add_argument("--skills-por-tecnico", type=int, default=8)
+    ap.add_argument("--catalogo", type=int, default=120, help="Skills distintas na org")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    legacy = measure(legacy_build_plan, args)
+    compact = measure(build_plan, args)
+
+    n = args.tecnicos
+    print(f"{n} técnicos x {args.skills_por_tecnico} skills (catálogo de {args.catalogo})")
+    print(f"{'PLANO':<10} {'TOTAL':>10} {'POR TÉCNICO':>13}")
+    print(f"{'dict':<10} {legacy / 2**20:>8.1f}MB {legacy / n:>11.0f} B")
+    print(f"{'TechPlan':<10} {compact / 2**20:>8.1f}MB {compact / n:>11.0f} B")
+    print(f"redução: {100.0 * (1 - compact / legacy):.0f}% ({legacy / compact:.1f}x menor)")
+
+if __name__ == "__main__":
+    main()
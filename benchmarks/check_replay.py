@@ -0,0 +1,83 @@
+# check_replay.py
+#
+# Ida e volta do cassete (--gravar / --reproduzir) contra o Salesforce "de mentira":
+# grava uma prévia do --pipeline por NOME (Name IN (...), inclusive nome com outra caixa e
+# nome que só o índice acha), reproduz o cassete sem rede e confere se os 2 planos
+# são iguais (mesmo técnico, status, skills a remover/adicionar) e se nenhuma chamada
+# da reprodução ficou fora do cassete.
+#
+# Uso:
+#   python benchmarks/check_replay.py
+#   python benchmarks/check_replay.py --tecnicos 60 --grupo 6 --modo 3
+
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from loadtest_api import ROOT, free_port, wait_http, stop_servers
+
+PLAN_FIELDS = ("identifier", "status", "sr_id", "atuais", "remover", "adicionar")
+
+def names(args) -> list:
+    out = [f"TECNICO {i:05d}" for i in range(1, args.tecnicos + 1)]
+    out[1] = out[1].lower()               # Name = '...' na SOQL ignora a caixa
+    out.append(f"TECNCO {args.tecnicos:05d}")  # não bate exato: vai para o índice de nomes
+    return out
+
+def run_cli(extra: list, env: dict, ids_file: str, args) -> tuple:
+    cmd = [sys.executable, os.path.join(ROOT, "ensure_manutencao_skill.py"), "--arquivo", ids_file,
+           "--pipeline", "--sim", "--grupo", args.grupo, "--modo", args.modo, "--dry-run", "--saida", "jsonl"] + extra
+    done = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True, encoding="utf-8")
+    if done.returncode != 0:
+        raise SystemExit(f"❌ {' '.join(extra)} falhou ({done.returncode}):\n{done.stderr[-2000:]}")
+    plans = {}
+    for line in done.stdout.splitlines():
+        rec = json.loads(line)
+        if rec.get("tipo") == "plano":
+            plans[rec["identifier"]] = {k: rec.get(k) for k in PLAN_FIELDS}
+    return plans, done.stderr
+
+def main():
+    ap = argparse.ArgumentParser(description="Grava e reproduz um cassete e compara os planos")
+    ap.add_argument("--tecnicos", type=int, default=20, help="Técnicos por nome na prévia")
+    ap.add_argument("--grupo", default="6")
+    ap.add_argument("--modo", default="3")
+    args = ap.parse_args()
+
+    port = free_port()
+    sf_url = f"http://127.0.0.1:{port}"
+    fake = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "fake_salesforce.py"),
+                             "--port", str(port), "--tecnicos", str(max(200, args.tecnicos))],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_http(f"{sf_url}/__stats")
+        with tempfile.TemporaryDirectory() as tmp:
+            ids_file = os.path.join(tmp, "tecnicos.txt")
+            with open(ids_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(names(args)) + "\n")
+            cassette = os.path.join(tmp, "sessao.jsonl")
+            env = {**os.environ, "SF_DOMAIN": sf_url, "SF_CLIENT_ID": "x", "SF_CLIENT_SECRET": "x",
+                   "SF_USERNAME": "x", "SF_PASSWORD": "x"}
+            env.pop("SF_REPLAY_SAL", None)
+            recorded, _ = run_cli(["--gravar", cassette], env, ids_file, args)
+            replay_env = {k: v for k, v in env.items() if not k.startswith("SF_") or k == "SF_REPLAY_SAL"}
+            replayed, log = run_cli(["--reproduzir", cassette, "--reproduzir-escala", "0"], replay_env, ids_file, args)
+    finally:
+        stop_servers([fake])
+
+    misses = re.search(r"(\d+) fora do cassete", log)
+    diff = [ident for ident in recorded if recorded[ident] != replayed.get(ident)]
+    print(f"gravação: {len(recorded)} plano(s) | reprodução: {len(replayed)} plano(s), "
+          f"{misses.group(1) if misses else '?'} chamada(s) fora do cassete")
+    for ident in diff[:10]:
+        print(f"  {ident}: gravado {recorded[ident]} | reproduzido {replayed.get(ident)}")
+    if diff or not misses or misses.group(1) != "0" or len(recorded) != len(replayed):
+        raise SystemExit("❌ A reprodução não repetiu a gravação.")
+    print("✅ Reprodução igual à gravação.")
+
+if __name__ == "__main__":
+    main()
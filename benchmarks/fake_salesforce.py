@@ -0,0 +1,534 @@
+# fake_salesforce.py
+#
+# Salesforce "de mentira" para testes locais de carga/latência.
+# Implementa só o que o ensure_manutencao_skill.py usa:
+#   - POST /services/oauth2/token
+#   - GET  /services/data/<v>/query?q=...      (SOQL simples: =, IN, LIKE, AND)
+#   - GET  /services/data/<v>/query/<cursor>   (paginação)
+#   - GET  /services/data/<v>/queryAll?q=...   (inclui os apagados, com IsDeleted = true)
+#   - POST/PATCH/DELETE /services/data/<v>/sobjects/<tipo>[/<id>]
+#   - POST/DELETE /services/data/<v>/composite/sobjects
+#   - POST /services/data/<v>/composite
+#   - GET  /__stats                            (contadores de chamadas, para os benchmarks)
+#
+# Uso:
+#   python benchmarks/fake_salesforce.py --port 8765 --latencia-ms 80 --tecnicos 5000
+#   python benchmarks/fake_salesforce.py --latencia-ms 50 --cauda-pct 2 --cauda-ms 800   (2% das respostas lentas)
+#   SF_DOMAIN=http://127.0.0.1:8765 SF_CLIENT_ID=x SF_CLIENT_SECRET=x SF_USERNAME=x SF_PASSWORD=x \
+#     python ensure_manutencao_skill.py --api --port 5000
+
+import re
+import io
+import csv
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_SIZE = 2000
+
+SKILL_LABELS = [
+    "Alteração de plano", "Ativação", "Chip", "Manutenção", "Manutenção Garantia", "Mesh",
+    "Migração", "Migração - Zhone", "MotoDesk", "Mudança de endereço", "OS critica", "PME",
+    "Retirada de Equipamento - Compulsório", "Retirada de Equipamento - Voluntário",
+    "Serviços Adicionais", "TV",
+]
+
+
+class FakeOrg:
+    def __init__(self, tecnicos=200, skills_por_tecnico=4, extra_skills=0, seed=42):
+        rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.calls = 0
+        self.calls_by_kind = {}
+        self.cursors = {}
+        self.jobs = {}
+        self.link_keys = {}
+        self.links_by_sr = {}
+        self.tables = {"Skill": {}, "ServiceResource": {}, "ServiceResourceSkill": {}, "User": {}}
+        self.recycle = {}  # sObject -> {Id: registro apagado} (lixeira, só o queryAll vê)
+
+        labels = SKILL_LABELS + [f"Skill Extra {i:04d}" for i in range(extra_skills)]
+        for label in labels:
+            sid = self.new_id("0Hs")
+            self.tables["Skill"][sid] = {"Id": sid, "MasterLabel": label,
+                                         "DeveloperName": re.sub(r"\W+", "_", label), "IsDeleted": False}
+        skill_ids = list(self.tables["Skill"])
+
+        for i in range(tecnicos):
+            uid = self.new_id("005")
+            email = f"tecnico{i}@example.com"
+            self.tables["User"][uid] = {"Id": uid, "Name": f"TECNICO {i:05d}", "Email": email}
+            sr_id = self.new_id("0Hn")
+            self.tables["ServiceResource"][sr_id] = {
+                "Id": sr_id, "Name": f"TECNICO {i:05d}", "IsActive": i % 17 != 0,
+                "RelatedRecordId": uid, "LastModifiedDate": self.now(), "SystemModstamp": self.now(),
+            }
+            for skill_id in rnd.sample(skill_ids, min(skills_por_tecnico, len(skill_ids))):
+                self.insert("ServiceResourceSkill", {"ServiceResourceId": sr_id, "SkillId": skill_id})
+
+    @staticmethod
+    def now():
+        t = time.time()
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + f".{int(t * 1000) % 1000:03d}+0000"
+
+    def new_id(self, prefix):
+        self.seq += 1
+        return f"{prefix}{self.seq:012d}AAA"
+
+    def count(self, kind, total=True):
+        """Conta 1 chamada. Subrequisições do composite entram só por tipo (o Salesforce cobra 1 chamada)."""
+        with self.lock:
+            if total:
+                self.calls += 1
+            self.calls_by_kind[kind] = self.calls_by_kind.get(kind, 0) + 1
+
+    def insert(self, sobject, fields):
+        with self.lock:
+            if sobject == "ServiceResourceSkill":
+                key = (fields.get("ServiceResourceId"), fields.get("SkillId"))
+                if key in self.link_keys:
+                    return None, {"statusCode": "DUPLICATE_VALUE", "message": "duplicate value found"}
+                self.link_keys[key] = True
+            rid = self.new_id({"ServiceResourceSkill": "0Hr"}.get(sobject, "001"))
+            rec = {k: v for k, v in fields.items() if k != "attributes"}
+            rec.update({"Id": rid, "SystemModstamp": self.now()})
+            self.tables.setdefault(sobject, {})[rid] = rec
+            if sobject == "ServiceResourceSkill":
+                self.links_by_sr.setdefault(rec.get("ServiceResourceId"), set()).add(rid)
+            return rid, None
+
+    def delete(self, rid):
+        with self.lock:
+            for table in self.tables.values():
+                if rid in table:
+                    rec = table.pop(rid)
+                    sobject = next(k for k, v in self.tables.items() if v is table)
+                    self.recycle.setdefault(sobject, {})[rid] = {**rec, "IsDeleted": True, "SystemModstamp": self.now()}
+                    self.link_keys.pop((rec.get("ServiceResourceId"), rec.get("SkillId")), None)
+                    self.links_by_sr.get(rec.get("ServiceResourceId"), set()).discard(rid)
+                    return True
+            return False
+
+    def update(self, sobject, rid, fields):
+        with self.lock:
+            rec = self.tables.get(sobject, {}).get(rid)
+            if not rec:
+                return False
+            rec.update(fields)
+            rec["SystemModstamp"] = self.now()
+            return True
+
+    # ---------- SOQL ----------
+    def get_field(self, sobject, rec, path):
+        if "." not in path:
+            return rec.get(path)
+        rel, field = path.split(".", 1)
+        target = {"Skill": ("Skill", "SkillId"), "RelatedRecord": ("User", "RelatedRecordId"),
+                  "ServiceResource": ("ServiceResource", "ServiceResourceId")}.get(rel)
+        if not target:
+            return None
+        other = self.tables[target[0]].get(rec.get(target[1]))
+        return self.get_field(target[0], other, field) if other else None
+
+    def predicate(self, sobject, cond):
+        """Compila 1 condição do WHERE numa função (parse 1x por query, não por registro)."""
+        cond = cond.strip()
+        m = re.match(r"(\S+)\s+IN\s*\((.*)\)$", cond, re.S | re.I)
+        if m:
+            field = m.group(1)
+            values = {x.replace("\\'", "'").lower() for x in re.findall(r"'((?:[^'\\]|\\.)*)'", m.group(2))}
+            return lambda r: str(self.get_field(sobject, r, field) or "").lower() in values
+        m = re.match(r"(\S+)\s+LIKE\s+'(.*)'$", cond, re.S | re.I)
+        if m:
+            field = m.group(1)
+            pattern = re.compile(re.escape(m.group(2).replace("\\'", "'")).replace("%", ".*"), re.I)
+            return lambda r: pattern.fullmatch(str(self.get_field(sobject, r, field) or "")) is not None
+        m = re.match(r"(\S+)\s*(>=|=|>)\s*(.*)$", cond, re.S)
+        if m:
+            field, op, raw = m.group(1), m.group(2), m.group(3).strip()
+            if raw.lower() in ("true", "false"):
+                flag = raw.lower() == "true"
+                return lambda r: bool(self.get_field(sobject, r, field)) == flag
+            if raw.startswith("'"):
+                raw = raw[1:-1].replace("\\'", "'")
+            if op in (">", ">="):
+                # datas: compara só AAAA-MM-DDThh:mm:ss (literal da SOQL vem com Z, o registro com .000+0000)
+                cut = 19 if re.match(r"\d{4}-\d\d-\d\dT", raw) else None
+                if op == ">":
+                    return lambda r: str(self.get_field(sobject, r, field) or "")[:cut] > raw[:cut]
+                return lambda r: str(self.get_field(sobject, r, field) or "")[:cut] >= raw[:cut]
+            if field == "Id":
+                return lambda r: str(r.get("Id") or "")[:15] == raw[:15]
+            low = raw.lower()
+            return lambda r: str(self.get_field(sobject, r, field) or "").lower() == low
+        return lambda r: True
+
+    def candidates(self, sobject, conds, deleted=False):
+        """Atalhos por índice para os filtros mais comuns (Id / ServiceResourceId)."""
+        table = self.tables.get(sobject, {})
+        if deleted:
+            table = {**table, **self.recycle.get(sobject, {})}
+        for cond in conds:
+            m = re.match(r"(Id|ServiceResourceId)\s*(=|IN)\s*\(?(.*?)\)?$", cond.strip(), re.S | re.I)
+            if not m:
+                continue
+            values = {x.replace("\\'", "'") for x in re.findall(r"'((?:[^'\\]|\\.)*)'", m.group(3))}
+            if m.group(1) == "Id":
+                by15 = {v[:15] for v in values}
+                return [r for k, r in table.items() if k[:15] in by15]
+            if deleted:
+                return [r for r in table.values() if r.get("ServiceResourceId") in values]
+            out = []
+            for v in values:
+                out.extend(table[i] for i in self.links_by_sr.get(v, ()) if i in table)
+            return out
+        return list(table.values())
+
+    def run_soql(self, q, deleted=False):
+        q = " ".join(q.split())
+        m = re.match(r"SELECT (.+?) FROM (\w+)(?: WHERE (.+?))?(?: GROUP BY (\w+))?(?: ORDER BY (.+?))?(?: LIMIT (\d+))?$", q, re.I)
+        if not m:
+            raise ValueError(f"MALFORMED_QUERY: {q}")
+        fields = [f.strip() for f in m.group(1).split(",")]
+        sobject, where, group, order, limit = m.group(2), m.group(3), m.group(4), m.group(5), m.group(6)
+        conds = re.split(r"\s+AND\s+", where, flags=re.I) if where else []
+        preds = [self.predicate(sobject, c) for c in conds]
+        with self.lock:
+            rows = [r for r in self.candidates(sobject, conds, deleted) if all(p(r) for p in preds)]
+        if group:
+            return self.aggregate(rows, group, fields)
+        if order:
+            key, _, direction = order.partition(" ")
+            rows.sort(key=lambda r: str(self.get_field(sobject, r, key) or ""), reverse=direction.upper() == "DESC")
+        if limit:
+            rows = rows[:int(limit)]
+        out = []
+        for r in rows:
+            rec = {"attributes": {"type": sobject, "url": f"/services/data/v65.0/sobjects/{sobject}/{r['Id']}"}}
+            for f in fields:
+                if "." in f:
+                    rel, sub = f.split(".", 1)
+                    rel_rec = rec.setdefault(rel, {"attributes": {"type": rel}})
+                    rel_rec[sub] = self.get_field(sobject, r, f)
+                else:
+                    rec[f] = r.get(f)
+            out.append(rec)
+        return out
+
+    @staticmethod
+    def aggregate(rows, group, fields):
+        """GROUP BY com COUNT/MAX/MIN (aliases; sem alias vira expr0, expr1...)."""
+        groups = {}
+        for r in rows:
+            groups.setdefault(r.get(group), []).append(r)
+        out = []
+        for key, members in groups.items():
+            rec = {"attributes": {"type": "AggregateResult"}}
+            expr = 0
+            for f in fields:
+                m = re.match(r"(COUNT|MAX|MIN)\((\w*)\)(?:\s+(\w+))?$", f, re.I)
+                if not m:
+                    rec[f.split()[-1]] = key
+                    continue
+                fn, field, alias = m.group(1).upper(), m.group(2), m.group(3)
+                if not alias:
+                    alias, expr = f"expr{expr}", expr + 1
+                values = [x.get(field) for x in members if x.get(field) is not None] if field else members
+                rec[alias] = len(values) if fn == "COUNT" else ((max if fn == "MAX" else min)(values) if values else None)
+            out.append(rec)
+        return out
+
+    def query_page(self, records, start=0):
+        page = records[start:start + PAGE_SIZE]
+        res = {"totalSize": len(records), "done": start + PAGE_SIZE >= len(records), "records": page}
+        if not res["done"]:
+            with self.lock:
+                self.seq += 1
+                cursor = f"01g{self.seq:012d}-{start + PAGE_SIZE}"
+                self.cursors[cursor] = records
+            res["nextRecordsUrl"] = f"/services/data/v65.0/query/{cursor}"
+        return res
+
+
+def make_handler(org, latency_ms=0.0, jitter_ms=0.0, max_concurrent=0, tail_pct=0.0, tail_ms=0.0):
+    in_flight = [0]
+    in_flight_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *a):
+            pass
+
+        def sleep(self):
+            delay = latency_ms + random.uniform(-jitter_ms, jitter_ms) if latency_ms or jitter_ms else 0.0
+            if tail_pct and random.random() * 100.0 < tail_pct:
+                delay += tail_ms  # cauda: resposta lenta de vez em quando (GC/lock do lado do Salesforce)
+            if delay > 0:
+                time.sleep(delay / 1000.0)
+
+        def send(self, status, body=None):
+            data = b"" if body is None else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def body(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(n) if n else b""
+            ctype = self.headers.get("Content-Type") or ""
+            if "json" in ctype:
+                return json.loads(raw or b"{}")
+            if "csv" in ctype:
+                return raw.decode("utf-8")
+            return dict(urllib.parse.parse_qsl(raw.decode("utf-8")))
+
+        def route(self, method):
+            if self.path == "/__stats":
+                # contadores para o benchmarks/loadtest_api.py (não conta como chamada, sem latência)
+                with org.lock:
+                    return self.send(200, {"calls": org.calls, "calls_by_kind": dict(org.calls_by_kind)})
+            if not max_concurrent:
+                return self.route_limited(method)
+            with in_flight_lock:
+                in_flight[0] += 1
+                over = in_flight[0] > max_concurrent
+            try:
+                if over:
+                    org.count("rejeitada")
+                    self.body() if method in ("POST", "PATCH", "PUT") else None
+                    return self.send(403, [{"errorCode": "REQUEST_LIMIT_EXCEEDED",
+                                            "message": "ConcurrentRequests Limit exceeded."}])
+                return self.route_limited(method)
+            finally:
+                with in_flight_lock:
+                    in_flight[0] -= 1
+
+        def route_limited(self, method):
+            parsed = urllib.parse.urlparse(self.path)
+            path, qs = parsed.path, urllib.parse.parse_qs(parsed.query)
+            body = self.body() if method in ("POST", "PATCH", "PUT") else None
+            self.sleep()
+
+            if path == "/services/oauth2/token":
+                org.count("token")
+                host = self.headers.get("Host")
+                return self.send(200, {"access_token": "00Dfake!token", "instance_url": f"http://{host}",
+                                       "token_type": "Bearer"})
+            if org.require_auth and not (self.headers.get("Authorization") or "").startswith("Bearer "):
+                return self.send(401, [{"errorCode": "INVALID_SESSION_ID", "message": "Session expired or invalid"}])
+
+            m = re.match(r"/services/data/v[\d.]+/(.*)$", path)
+            if not m:
+                return self.send(404, [{"errorCode": "NOT_FOUND", "message": path}])
+            rest = m.group(1).rstrip("/")
+            return self.dispatch(method, rest, qs, body)
+
+        subrequest = False
+
+        def count(self, kind):
+            if self.subrequest:
+                org.count(f"composite>{kind}", total=False)
+            else:
+                org.count(kind)
+
+        def dispatch(self, method, rest, qs, body):
+            if rest in ("query", "queryAll") and method == "GET":
+                self.count(rest)
+                try:
+                    return self.send(200, org.query_page(org.run_soql(qs["q"][0], deleted=rest == "queryAll")))
+                except ValueError as e:
+                    return self.send(400, [{"errorCode": "MALFORMED_QUERY", "message": str(e)}])
+            if rest.startswith("query/") and method == "GET":
+                self.count("queryMore")
+                cursor = rest.split("/", 1)[1]
+                records = org.cursors.get(cursor)
+                if records is None:
+                    return self.send(400, [{"errorCode": "INVALID_QUERY_LOCATOR", "message": cursor}])
+                return self.send(200, org.query_page(records, int(cursor.rsplit("-", 1)[1])))
+            if rest == "composite/sobjects":
+                self.count(f"collections:{method}")
+                if method == "POST":
+                    out = []
+                    for rec in body.get("records", []):
+                        rid, error = org.insert(rec["attributes"]["type"], rec)
+                        out.append({"id": rid, "success": rid is not None, "errors": [error] if error else []})
+                    return self.send(200, out)
+                if method == "DELETE":
+                    ids = (qs.get("ids") or [""])[0].split(",")
+                    out = []
+                    for i in ids:
+                        done = org.delete(i)
+                        out.append({"id": i, "success": done,
+                                    "errors": [] if done else [{"statusCode": "ENTITY_IS_DELETED", "message": i}]})
+                    return self.send(200, out)
+            if rest.startswith("jobs/ingest"):
+                self.count(f"bulk:{method}")
+                return self.bulk(method, rest, body)
+            if rest == "composite" and method == "POST":
+                self.count("composite")
+                return self.send(200, self.composite(body))
+            m = re.match(r"sobjects/(\w+)(?:/(\w+))?$", rest)
+            if m:
+                self.count(f"sobject:{method}")
+                sobject, rid = m.group(1), m.group(2)
+                if method == "POST" and not rid:
+                    rid, error = org.insert(sobject, body)
+                    if error:
+                        return self.send(400, [{"errorCode": error["statusCode"], "message": error["message"]}])
+                    return self.send(201, {"id": rid, "success": True, "errors": []})
+                if method == "PATCH" and rid:
+                    return self.send(204) if org.update(sobject, rid, body) else self.send(404, [{"errorCode": "NOT_FOUND"}])
+                if method == "DELETE" and rid:
+                    return self.send(204) if org.delete(rid) else self.send(404, [{"errorCode": "ENTITY_IS_DELETED"}])
+            return self.send(404, [{"errorCode": "NOT_FOUND", "message": rest}])
+
+        def bulk(self, method, rest, body):
+            parts = rest.split("/")
+            if len(parts) == 2 and method == "POST":
+                with org.lock:
+                    org.seq += 1
+                    job = {"id": f"750{org.seq:012d}AAA", "object": body["object"], "operation": body["operation"],
+                           "state": "Open", "rows": [], "ok": [], "fail": []}
+                    org.jobs[job["id"]] = job
+                return self.send(200, {k: job[k] for k in ("id", "object", "operation", "state")})
+            job = org.jobs.get(parts[2]) if len(parts) > 2 else None
+            if not job:
+                return self.send(404, [{"errorCode": "NOT_FOUND"}])
+            if len(parts) == 4 and parts[3] == "batches" and method == "PUT":
+                job["rows"].extend(csv.DictReader(io.StringIO(body)))
+                return self.send(201)
+            if len(parts) == 3 and method == "PATCH" and (body or {}).get("state") == "Aborted":
+                job["state"] = "Aborted"
+                return self.send(200, {"id": job["id"], "state": "Aborted"})
+            if len(parts) == 3 and method == "PATCH":
+                for row in job["rows"]:
+                    if job["operation"] == "insert":
+                        rid, error = org.insert(job["object"], row)
+                        (job["ok"] if rid else job["fail"]).append({"sf__Id": rid or "", "sf__Error": (error or {}).get("message", ""), **row})
+                    else:
+                        done = org.delete(row["Id"])
+                        (job["ok"] if done else job["fail"]).append({"sf__Id": row["Id"], "sf__Error": "" if done else "ENTITY_IS_DELETED", **row})
+                job["state"] = "JobComplete"
+                return self.send(200, {"id": job["id"], "state": "UploadComplete"})
+            if len(parts) == 3 and method == "GET":
+                return self.send(200, {"id": job["id"], "state": job["state"], "numberRecordsProcessed": len(job["rows"]),
+                                       "numberRecordsFailed": len(job["fail"])})
+            if len(parts) == 4 and method == "GET":
+                rows = {"successfulResults": job["ok"], "failedResults": job["fail"], "unprocessedrecords": []}.get(parts[3], [])
+                out = io.StringIO()
+                if rows:
+                    w = csv.DictWriter(out, fieldnames=list(rows[0]), lineterminator="\n")
+                    w.writeheader()
+                    w.writerows(rows)
+                data = out.getvalue().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            return self.send(404, [{"errorCode": "NOT_FOUND"}])
+
+        def composite(self, body):
+            refs = {}
+            out = []
+
+            def resolve(text):
+                def sub(m):
+                    ref, _, path = m.group(1).partition(".")
+                    cur = refs.get(ref)
+                    for part in re.findall(r"[^.\[\]]+", path):
+                        cur = cur[int(part)] if isinstance(cur, list) else (cur or {}).get(part)
+                    if cur is None:
+                        raise KeyError(m.group(0))
+                    return str(cur)
+                return re.sub(r"@\{([^}]+)\}", sub, text)
+
+            for sub in body.get("compositeRequest", []):
+                ref = sub.get("referenceId")
+                try:
+                    url = resolve(sub["url"])
+                except (KeyError, IndexError, TypeError) as e:
+                    out.append({"body": [{"errorCode": "PROCESSING_HALTED",
+                                          "message": f"Invalid reference specified: {e}"}],
+                                "httpStatusCode": 400, "referenceId": ref})
+                    continue
+                parsed = urllib.parse.urlparse(url)
+                m = re.match(r"/services/data/v[\d.]+/(.*)$", parsed.path)
+                result = self.capture(sub["method"], m.group(1).rstrip("/") if m else parsed.path,
+                                      urllib.parse.parse_qs(parsed.query), sub.get("body"))
+                refs[ref] = result["body"]
+                result["referenceId"] = ref
+                out.append(result)
+            return {"compositeResponse": out}
+
+        def capture(self, method, rest, qs, body):
+            box = {}
+            real_send = self.send
+            self.send = lambda status, b=None: box.update(httpStatusCode=status, body=b)
+            self.subrequest = True
+            try:
+                self.dispatch(method, rest, qs, body)
+            finally:
+                self.send = real_send
+                self.subrequest = False
+            return box
+
+        def do_GET(self):
+            self.route("GET")
+
+        def do_POST(self):
+            self.route("POST")
+
+        def do_PUT(self):
+            self.route("PUT")
+
+        def do_PATCH(self):
+            self.route("PATCH")
+
+        def do_DELETE(self):
+            self.route("DELETE")
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=8765, latency_ms=0.0, jitter_ms=0.0, org=None, max_concurrent=0, tail_pct=0.0, tail_ms=0.0):
+    org = org or FakeOrg()
+    server = ThreadingHTTPServer((host, port), make_handler(org, latency_ms, jitter_ms, max_concurrent, tail_pct, tail_ms))
+    server.daemon_threads = True
+    server.org = org
+    return server
+
+
+FakeOrg.require_auth = True
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latencia-ms", type=float, default=0.0, help="Latência injetada por chamada")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="Variação (+/-) da latência")
+    ap.add_argument("--cauda-pct", type=float, default=0.0, help="%% das respostas que recebem --cauda-ms a mais")
+    ap.add_argument("--cauda-ms", type=float, default=0.0, help="Atraso extra das respostas da cauda")
+    ap.add_argument("--tecnicos", type=int, default=200)
+    ap.add_argument("--skills-extras", type=int, default=0, help="Skills extras no catálogo (além das do mapa)")
+    ap.add_argument("--max-concorrentes", type=int, default=0,
+                    help="Acima de N requisições simultâneas responde 403 REQUEST_LIMIT_EXCEEDED (0 = sem limite)")
+    args = ap.parse_args()
+
+    srv = serve(args.host, args.port, args.latencia_ms, args.jitter_ms,
+                FakeOrg(tecnicos=args.tecnicos, extra_skills=args.skills_extras), args.max_concorrentes,
+                args.cauda_pct, args.cauda_ms)
+    print(f"Fake Salesforce em http://{args.host}:{args.port} ({args.tecnicos} técnicos)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
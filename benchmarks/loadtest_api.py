@@ -0,0 +1,321 @@
+# loadtest_api.py
+#
+# Gerador de carga para a API (create_api_app) contra um Salesforce "de mentira".
+# Sobe o benchmarks/fake_salesforce.py (com latência injetada) e a API em
+# subprocessos, dispara um MIX de chamadas numa TAXA alvo (carga aberta: a
+# latência conta desde o horário agendado, então fila também aparece) e mede:
+#   - vazão, p50/p95/p99 e % de erro por endpoint e no total
+#   - chamadas ao Salesforce por requisição (contadores do fake)
+#
+# Uso:
+#   python benchmarks/loadtest_api.py --rps 50 --duracao 20
+#   python benchmarks/loadtest_api.py --mix consultar=60,existe=30,adicionar=5,remover=5 --latencia-ms 80
+#   python benchmarks/loadtest_api.py --servidor-args "--producao --threads 16" --json prod.json
+#   python benchmarks/loadtest_api.py --servidor-args "--producao --threads 16" --comparar prod.json
+#   python benchmarks/loadtest_api.py --alvo http://127.0.0.1:5000 --sf-url http://127.0.0.1:8765   (servidores já rodando)
+#
+# --rps 0 = carga fechada (cada cliente manda a próxima assim que a anterior volta).
+
+import os
+import sys
+import json
+import time
+import queue
+import random
+import shlex
+import socket
+import argparse
+import threading
+import subprocess
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = ("existe", "consultar", "adicionar", "remover", "lote")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_http(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise SystemExit(f"❌ {url} não respondeu em {timeout:.0f}s")
+
+def parse_mix(text: str) -> list:
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"❌ Endpoint desconhecido no --mix: {name} (use {', '.join(ENDPOINTS)})")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+def sf_calls(sf_url: str) -> dict:
+    if not sf_url:
+        return {}
+    try:
+        return requests.get(f"{sf_url}/__stats", timeout=5).json()
+    except Exception:
+        return {}
+
+# =========================
+# SERVIDORES
+# =========================
+def start_servers(args) -> tuple:
+    """Sobe fake + API em subprocessos. Retorna (api_url, sf_url, [processos])."""
+    sf_port, api_port = free_port(), free_port()
+    sf_url, api_url = f"http://127.0.0.1:{sf_port}", f"http://127.0.0.1:{api_port}"
+    procs = []
+
+    fake_cmd = [sys.executable, os.path.join(ROOT, "benchmarks", "fake_salesforce.py"), "--port", str(sf_port),
+                "--tecnicos", str(args.tecnicos), "--latencia-ms", str(args.latencia_ms), "--jitter-ms", str(args.jitter_ms),
+                "--cauda-pct", str(args.cauda_pct), "--cauda-ms", str(args.cauda_ms)]
+    procs.append(subprocess.Popen(fake_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    wait_http(f"{sf_url}/__stats")
+
+    env = {**os.environ, "SF_DOMAIN": sf_url, "SF_CLIENT_ID": "x", "SF_CLIENT_SECRET": "x",
+           "SF_USERNAME": "x", "SF_PASSWORD": "x"}
+    api_cmd = [sys.executable, os.path.join(ROOT, "ensure_manutencao_skill.py"), "--api",
+               "--host", "127.0.0.1", "--port", str(api_port)] + shlex.split(args.servidor_args or "")
+    log = open(args.log_servidor, "w") if args.log_servidor else subprocess.DEVNULL
+    procs.append(subprocess.Popen(api_cmd, env=env, cwd=ROOT, stdout=log, stderr=log))
+    wait_http(f"{api_url}/api/health")
+    return api_url, sf_url, procs
+
+def stop_servers(procs: list) -> None:
+    for p in reversed(procs):
+        p.terminate()
+    for p in reversed(procs):
+        try:
+            p.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+# =========================
+# CARGA
+# =========================
+def make_request(kind: str, rnd: random.Random, args):
+    """Monta (método, caminho, json) de uma chamada do mix."""
+    if rnd.random() < args.inexistentes:
+        email = f"naoexiste{rnd.randrange(10 ** 6)}@example.com"
+    else:
+        email = f"tecnico{rnd.randrange(args.tecnicos)}@example.com"
+    if kind == "existe":
+        return "POST", "/api/tecnico/existe", {"email": email}
+    if kind == "consultar":
+        return "GET", f"/api/tecnico/consultar?email={email}", None
+    if kind in ("adicionar", "remover"):
+        return "POST", f"/api/grupo/{kind}", {"email": email, "grupo": args.grupo}
+    itens = [{"email": f"tecnico{rnd.randrange(args.tecnicos)}@example.com", "grupo": args.grupo,
+              "acao": rnd.choice(("adicionar", "remover"))} for _ in range(args.itens_lote)]
+    return "POST", "/api/grupo/lote", {"itens": itens}
+
+def run_load(api_url: str, args) -> dict:
+    mix = parse_mix(args.mix)
+    kinds, weights = [k for k, _ in mix], [w for _, w in mix]
+    rnd = random.Random(args.seed)
+    samples = {k: [] for k in kinds}  # (latência, ok)
+    lock = threading.Lock()
+    completed = [0]  # todas as respostas, inclusive aquecimento (base das chamadas SF por requisição)
+    work = queue.Queue()
+    started = time.monotonic()
+    measure_from = started + args.aquecimento
+    stop_at = measure_from + args.duracao
+
+    def record(kind, scheduled, ok):
+        done = time.monotonic()
+        with lock:
+            completed[0] += 1
+        if scheduled >= measure_from:
+            with lock:
+                samples[kind].append((done - scheduled, ok))
+
+    def call(session, kind, scheduled):
+        with lock:
+            method, path, body = make_request(kind, rnd, args)
+        try:
+            r = session.request(method, api_url + path, json=body, timeout=args.timeout)
+            # 404 = técnico não encontrado (resposta esperada para os --inexistentes)
+            ok = r.status_code < 400 or r.status_code == 404
+        except requests.RequestException:
+            ok = False
+        record(kind, scheduled, ok)
+
+    def open_worker():
+        session = requests.Session()
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            call(session, *item)
+
+    def closed_worker():
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            with lock:
+                kind = rnd.choices(kinds, weights)[0]
+            call(session, kind, time.monotonic())
+
+    threads = [threading.Thread(target=open_worker if args.rps else closed_worker, daemon=True)
+               for _ in range(args.clientes)]
+    for t in threads:
+        t.start()
+
+    if args.rps:
+        # despacho em taxa fixa: o i-ésimo pedido é agendado para started + i/rps
+        i = 0
+        while True:
+            scheduled = started + i / args.rps
+            if scheduled >= stop_at:
+                break
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            with lock:
+                kind = rnd.choices(kinds, weights)[0]
+            work.put((kind, scheduled))
+            i += 1
+        for _ in threads:
+            work.put(None)
+
+    for t in threads:
+        t.join(timeout=args.timeout + 5)
+    elapsed = min(time.monotonic(), stop_at + args.timeout) - measure_from
+    report = summarize(samples, max(elapsed, args.duracao))
+    report["respostas"] = completed[0]
+    return report
+
+def summarize(samples: dict, duration: float) -> dict:
+    def stats(values):
+        lat = sorted(v for v, _ in values)
+        errors = sum(1 for _, ok in values if not ok)
+        return {
+            "req": len(values),
+            "rps": round(len(values) / duration, 2),
+            "p50_ms": round(percentile(lat, 50) * 1000, 1),
+            "p95_ms": round(percentile(lat, 95) * 1000, 1),
+            "p99_ms": round(percentile(lat, 99) * 1000, 1),
+            "erros_pct": round(100.0 * errors / len(values), 2) if values else 0.0,
+        }
+    out = {"endpoints": {k: stats(v) for k, v in samples.items() if v}}
+    out["total"] = stats([s for v in samples.values() for s in v])
+    return out
+
+# =========================
+# RELATÓRIO
+# =========================
+def print_report(report: dict, base: dict = None) -> None:
+    def delta(path, value):
+        if not base:
+            return ""
+        ref = base
+        for key in path:
+            ref = (ref or {}).get(key)
+        if not ref:
+            return ""
+        return f" ({100.0 * (value - ref) / ref:+.0f}%)"
+
+    cfg = report["config"]
+    print(f"\nCarga: mix={cfg['mix']} rps={cfg['rps'] or 'fechada'} clientes={cfg['clientes']} "
+          f"duração={cfg['duracao']}s | latência SF={cfg['latencia_ms']}ms | servidor: {cfg['servidor_args'] or '(dev)'}")
+    print(f"\n{'ENDPOINT':<12} {'REQ':>7} {'REQ/S':>16} {'P50':>16} {'P95':>16} {'P99':>16} {'ERRO%':>7}")
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, s in rows:
+        path = ("total",) if name == "TOTAL" else ("endpoints", name)
+        print(f"{name:<12} {s['req']:>7} "
+              f"{(str(s['rps']) + delta(path + ('rps',), s['rps'])):>16} "
+              f"{(str(s['p50_ms']) + 'ms' + delta(path + ('p50_ms',), s['p50_ms'])):>16} "
+              f"{(str(s['p95_ms']) + 'ms' + delta(path + ('p95_ms',), s['p95_ms'])):>16} "
+              f"{(str(s['p99_ms']) + 'ms' + delta(path + ('p99_ms',), s['p99_ms'])):>16} "
+              f"{s['erros_pct']:>7}")
+    sf = report.get("salesforce")
+    if sf:
+        per = sf["por_requisicao"]
+        print(f"\nSalesforce: {sf['chamadas']} chamadas | {per} por requisição{delta(('salesforce', 'por_requisicao'), per)}")
+        print("  " + " | ".join(f"{k}={v}" for k, v in sorted(sf["por_tipo"].items())))
+    hedge = (report.get("api_health") or {}).get("hedge") or {}
+    if hedge.get("ligado"):
+        print(f"\nHedge: {hedge['hedges']} cópias em {hedge['leituras']} leituras (taxa {100 * hedge['taxa_hedge']:.1f}%) | "
+              f"hedge venceu {100 * hedge['taxa_vitoria']:.0f}% | sem orçamento: {hedge['sem_orcamento']}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Teste de carga da API contra o fake Salesforce")
+    ap.add_argument("--mix", default="consultar=60,existe=30,adicionar=5,remover=5",
+                    help=f"Pesos por endpoint ({', '.join(ENDPOINTS)}). Padrão: consultar=60,existe=30,adicionar=5,remover=5")
+    ap.add_argument("--rps", type=float, default=30.0, help="Taxa alvo (req/s). 0 = carga fechada. Padrão: 30")
+    ap.add_argument("--clientes", type=int, default=64, help="Conexões/threads cliente (máx. em voo). Padrão: 64")
+    ap.add_argument("--duracao", type=float, default=20.0, help="Segundos medidos. Padrão: 20")
+    ap.add_argument("--aquecimento", type=float, default=2.0, help="Segundos iniciais descartados. Padrão: 2")
+    ap.add_argument("--timeout", type=float, default=30.0, help="Timeout por requisição (s). Padrão: 30")
+    ap.add_argument("--grupo", default="Retirada", help="Grupo usado em adicionar/remover/lote. Padrão: Retirada")
+    ap.add_argument("--itens-lote", type=int, default=10, help="Técnicos por chamada de /api/grupo/lote. Padrão: 10")
+    ap.add_argument("--inexistentes", type=float, default=0.05, help="Fração de e-mails que não existem. Padrão: 0.05")
+    ap.add_argument("--seed", type=int, default=42)
+
+    ap.add_argument("--tecnicos", type=int, default=1000, help="Técnicos no fake. Padrão: 1000")
+    ap.add_argument("--latencia-ms", type=float, default=50.0, help="Latência injetada no fake. Padrão: 50")
+    ap.add_argument("--jitter-ms", type=float, default=10.0, help="Variação da latência do fake. Padrão: 10")
+    ap.add_argument("--cauda-pct", type=float, default=0.0, help="%% das respostas do fake com --cauda-ms extra. Padrão: 0")
+    ap.add_argument("--cauda-ms", type=float, default=0.0, help="Atraso extra das respostas lentas do fake. Padrão: 0")
+    ap.add_argument("--servidor-args", default="", help='Argumentos extras da API (ex.: "--producao --threads 16")')
+    ap.add_argument("--log-servidor", default=None, help="Grava stdout/stderr da API nesse arquivo")
+
+    ap.add_argument("--alvo", default=None, help="Usa uma API já rodando (não sobe nada)")
+    ap.add_argument("--sf-url", default=None, help="Fake Salesforce já rodando (para contar chamadas com --alvo)")
+    ap.add_argument("--json", default=None, help="Grava o relatório em JSON")
+    ap.add_argument("--comparar", default=None, help="Relatório JSON anterior: mostra a variação %% de cada número")
+    args = ap.parse_args()
+
+    procs = []
+    try:
+        if args.alvo:
+            api_url, sf_url = args.alvo.rstrip("/"), (args.sf_url or "").rstrip("/")
+        else:
+            api_url, sf_url, procs = start_servers(args)
+
+        before = sf_calls(sf_url)
+        report = run_load(api_url, args)
+        after = sf_calls(sf_url)
+        try:
+            report["api_health"] = requests.get(f"{api_url}/api/health", timeout=5).json()
+        except Exception:
+            pass
+    finally:
+        stop_servers(procs)
+
+    report["config"] = {k: getattr(args, k) for k in ("mix", "rps", "clientes", "duracao", "latencia_ms", "tecnicos", "servidor_args")}
+    if before and after:
+        kinds = set(before["calls_by_kind"]) | set(after["calls_by_kind"])
+        by_kind = {k: after["calls_by_kind"].get(k, 0) - before["calls_by_kind"].get(k, 0) for k in kinds}
+        total = after["calls"] - before["calls"]
+        report["salesforce"] = {
+            "chamadas": total,
+            "por_requisicao": round(total / report["respostas"], 2) if report["respostas"] else 0.0,
+            "por_tipo": {k: v for k, v in by_kind.items() if v},
+        }
+
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+    print_report(report, base)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
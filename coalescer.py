@@ -0,0 +1,114 @@
+import threading
+import contextvars
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Hashable, List, Optional
+
+class Batch:
+    """Lote aberto de uma chave: registros únicos, na ordem em que chegaram."""
+    __slots__ = ("items", "position", "full", "done", "results", "error")
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.position: Dict[Any, int] = {}  # registro -> posição em items (iguais viram 1 só)
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results: List[Any] = []
+        self.error: BaseException = None
+
+class WriteCoalescer:
+    """
+    Junta escritas de requisições simultâneas num lote só por chave (ex.: inserir
+    skills com o mesmo token e SkillLevel) e devolve a cada chamador o resultado
+    dos seus registros, na ordem em que ele mandou.
+
+    Sem thread fixa (seguro com pre-fork): quem abre o lote é o "líder" — solta uma
+    thread que espera até max_wait segundos (ou o lote encher com max_items registros
+    únicos), fecha e envia. Todos, o líder inclusive, só esperam o resultado. Registros
+    iguais de chamadores diferentes são enviados uma vez e o resultado vale para todos.
+
+    flush(key, items) -> [resultado por item, mesma ordem]
+    budget() -> segundos que cada chamador ainda pode esperar o lote (None = sem limite);
+    esgotado, ele desiste com TimeoutError.
+    detach() -> contexto em que o envio roda (ex.: sf_http.detached): o lote não herda o
+    prazo de quem o abriu, senão o prazo curto de um derrubaria o lote de todos.
+
+    Quem desiste no prazo NÃO desfaz nada: o lote segue e a escrita pode ser gravada no
+    Salesforce mesmo com o chamador recebendo erro de prazo (504 na API): quem repete
+    a operação depois deve conferir o estado antes.
+    """
+
+    def __init__(self, flush: Callable[[Hashable, list], list], max_wait: float = 0.005, max_items: int = 200,
+                 budget: Optional[Callable[[], Optional[float]]] = None,
+                 detach: Optional[Callable[[], ContextManager]] = None):
+        self.flush = flush
+        self.budget = budget
+        self.detach = detach or nullcontext
+        self.max_wait = max_wait
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self.pending: Dict[Hashable, Batch] = {}
+        self.counters = {"pedidos": 0, "registros": 0, "lotes": 0, "enviados": 0, "maior_lote": 0}
+
+    def submit(self, key: Hashable, items: list) -> list:
+        """Bloqueia até o(s) lote(s) com os itens serem enviados. Exceção do flush sobe para todos."""
+        items = list(items)
+        if not items:
+            return []
+        if self.max_wait <= 0:
+            return self.flush(key, items)
+
+        slots = []  # (lote, posição no lote) de cada item, na ordem de items
+        leading = []
+        with self.lock:
+            self.counters["pedidos"] += 1
+            self.counters["registros"] += len(items)
+            for item in items:
+                batch = self.pending.get(key)
+                if batch is None:
+                    batch = self.pending[key] = Batch()
+                    leading.append(batch)
+                pos = batch.position.get(item)
+                if pos is None:
+                    pos = batch.position[item] = len(batch.items)
+                    batch.items.append(item)
+                    if len(batch.items) >= self.max_items:
+                        # cheio: sai da fila de abertos e acorda o líder
+                        del self.pending[key]
+                        batch.full.set()
+                slots.append((batch, pos))
+
+        for batch in leading:
+            ctx = contextvars.copy_context()
+            threading.Thread(target=ctx.run, args=(self.send, key, batch), name="coalescer", daemon=True).start()
+        out = []
+        for batch, pos in slots:
+            left = self.budget() if self.budget else None
+            if not batch.done.wait(None if left is None else max(0.0, left)):
+                raise TimeoutError("Prazo esgotado esperando o lote de escrita")
+            if batch.error is not None:
+                raise batch.error
+            out.append(batch.results[pos])
+        return out
+
+    def send(self, key: Hashable, batch: Batch) -> None:
+        batch.full.wait(self.max_wait)
+        with self.lock:
+            if self.pending.get(key) is batch:
+                del self.pending[key]
+            self.counters["lotes"] += 1
+            self.counters["enviados"] += len(batch.items)
+            self.counters["maior_lote"] = max(self.counters["maior_lote"], len(batch.items))
+        try:
+            with self.detach():
+                batch.results = self.flush(key, batch.items)
+        except BaseException as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            out = dict(self.counters)
+        out["janela_ms"] = round(self.max_wait * 1000, 1)
+        out["media_por_lote"] = round(out["enviados"] / out["lotes"], 1) if out["lotes"] else 0.0
+        return out
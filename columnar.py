@@ -0,0 +1,132 @@
+import sys
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, List
+
+# Strings até esse tamanho são internadas (Ids, labels, datas repetidas viram 1 objeto só)
+INTERN_MAX = 80
+
+class Columns(Sequence):
+    """
+    Resultado de SOQL em colunas: 1 lista por campo ("Id", "SkillId", "Skill.MasterLabel"...),
+    sem o `attributes` (type/url) de cada registro e com as strings curtas internadas.
+    Relacionamentos aninhados viram colunas com ponto; a coluna do próprio relacionamento
+    ("Skill") guarda só se ele veio (True) ou veio nulo (None).
+
+    Continua se comportando como a lista de registros: len(), índice, iteração, e cada
+    linha é uma Row com .get()/[] (inclusive row.get("Skill").get("MasterLabel")).
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]] = ()):
+        self.data: Dict[str, List[Any]] = {}
+        self.relations: set = set()
+        self.size = 0
+        self.extend(records)
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Acrescenta registros crus da SOQL (1 página por vez; a página pode ser descartada depois)."""
+        data = self.data
+        flatten = self.flatten
+        for record in records:
+            seen = flatten(record, "", {})
+            size = self.size
+            for path, value in seen.items():
+                col = data.get(path)
+                if col is None:
+                    col = data[path] = [None] * size  # campo novo no meio do resultado
+                col.append(value)
+            self.size = size = size + 1
+            if len(seen) != len(data):
+                for col in data.values():
+                    if len(col) < size:
+                        col.append(None)
+
+    def flatten(self, record: Dict[str, Any], prefix: str, out: Dict[str, Any]) -> Dict[str, Any]:
+        intern = sys.intern
+        for key, value in record.items():
+            if key == "attributes":
+                continue
+            path = prefix + key
+            if value.__class__ is str:
+                out[path] = intern(value) if len(value) <= INTERN_MAX else value
+            elif isinstance(value, dict) and "records" not in value:
+                self.relations.add(path)
+                out[path] = True
+                self.flatten(value, path + ".", out)
+            else:
+                out[path] = value
+        return out
+
+    def column(self, path: str) -> List[Any]:
+        """A coluna inteira (lista vazia se o campo não veio)."""
+        return self.data.get(path) or []
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Registros como dicts aninhados (sem `attributes`), para quem precisa de dict de verdade."""
+        return [row.to_dict() for row in self]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Row(self, "", i) for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return Row(self, "", index)
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield Row(self, "", i)
+
+    def __repr__(self) -> str:
+        return f"Columns({self.size} registros, {len(self.data)} campos)"
+
+class Row(Mapping):
+    """Uma linha (ou um relacionamento dela, com prefix) de Columns, lida como dict."""
+    __slots__ = ("cols", "prefix", "index")
+
+    def __init__(self, cols: Columns, prefix: str, index: int):
+        self.cols = cols
+        self.prefix = prefix
+        self.index = index
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self.prefix + key
+        col = self.cols.data.get(path)
+        if col is None:
+            return default
+        value = col[self.index]
+        if path in self.cols.relations:
+            return Row(self.cols, path + ".", self.index) if value else None
+        return value
+
+    def __getitem__(self, key: str) -> Any:
+        if self.prefix + key not in self.cols.data:
+            raise KeyError(key)
+        return self.get(key)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self.prefix + key in self.cols.data
+
+    def keys(self) -> List[str]:
+        # só o nível desta linha: "Skill" aparece, "Skill.MasterLabel" fica dentro dele
+        n = len(self.prefix)
+        return [p[n:] for p in self.cols.data if p.startswith(self.prefix) and "." not in p[n:]]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {}
+        for key in self.keys():
+            value = self.get(key)
+            out[key] = value.to_dict() if isinstance(value, Row) else value
+        return out
+
+    def __repr__(self) -> str:
+        return f"Row({self.to_dict()!r})"
@@ -4,7 +4,8 @@
 #   pip install requests
 #   (e seus módulos existentes)
 #     - sf_auth.py: get_salesforce_token, get_auth_headers
-#     - sf_query.py: get_all_query_results
+#     - sf_query.py: get_all_query_results, execute_composite (API)
+#     - sf_bulk.py: run_ingest_job (Bulk API 2.0, lotes muito grandes)
 #
 # Uso:
 #   python ensure_manutencao_skill.py --listar-grupos
@@ -12,6 +13,7 @@
 #   python ensure_manutencao_skill.py --id-ou-nome "NOME" --grupo "Retirada" --modo 1
 #   python ensure_manutencao_skill.py --ids-ou-nomes "NOME1" "NOME2" "0Hn..." --grupo "Ativação" --modo 3
 #   python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo "Retirada" --modo 1 --dry-run
+#   python ensure_manutencao_skill.py --estado-desejado estado.csv --dry-run
 #
 # Flags úteis:
 #   --ativar-inativo          (tenta ativar se estiver inativo)
@@ -20,12 +22,25 @@
 #   --selecionar-skills       (deixa escolher 1,2,5 dentro do grupo; senão aplica TODAS)
 
 import os
+import sys
+import csv
+import json
 import argparse
-import requests
+import itertools
+import contextlib
+import signal
+import select
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from array import array
+from functools import lru_cache
 from typing import Optional
 
 from flask import Flask, jsonify, request
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
 
 # opcional: se tiver python-dotenv instalado
 try:
@@ -37,8 +52,19 @@ except Exception:
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+import sf_http
+import sf_log
+import perfil
+import sf_trace
+import sf_replay
+import memo
 from sf_auth import get_salesforce_token, get_auth_headers
-from sf_query import get_all_query_results
+from sf_query import get_all_query_results, soql_subrequest, execute_composite, get_composite_query_records
+from sf_bulk import run_ingest_job
+from jobs import JobQueue, QueueFull, make_store
+from coalescer import WriteCoalescer
+from singleflight import READS, headers_key
+from name_index import open_index
 
 API_VERSION = "v65.0"
 
@@ -110,6 +136,46 @@ GROUPS_MAP = {
 
 GROUP_ORDER = ["Ativação", "Manutenção Corretiva", "Manutenção Preventiva", "Outros", "Mudança", "Retirada"]
 
+# limites das chamadas em lote (IN da SOQL / sObject Collections)
+SOQL_IN_CHUNK = 200
+COLLECTION_CHUNK = 200
+
+# a partir desse nº de operações (remoções + adições) a execução em lote usa o Bulk API 2.0
+# (0 = nunca). Pode ser trocado por --bulk-acima.
+BULK_THRESHOLD = int(os.getenv("SF_BULK_THRESHOLD", "2000"))
+
+# índice local de nomes (sem acento/caixa) usado no lugar do LIKE remoto em execuções com vários técnicos.
+# Fica em cache nesse arquivo e é atualizado incrementalmente (SystemModstamp). Vazio = só em memória.
+NAME_INDEX_FILE = os.getenv("SF_NAME_INDEX", "ensure_skill_nomes.json")
+NAME_INDEX = None
+NAME_INDEX_LOCK = threading.Lock()
+# execução em lote com nomes: o índice só é montado na 1ª vez que um nome não bate exato
+NAME_INDEX_LAZY = False
+
+# quantos lotes (IN da SOQL / sObject Collections) podem rodar ao mesmo tempo.
+# O limitador adaptativo do sf_http segura a concorrência real se a org reclamar.
+# Pode ser trocado por --paralelo.
+PARALLEL = int(os.getenv("SF_PARALELO", "1"))
+
+# consultas grandes (links em lote, índice de nomes) decodificadas em colunas em vez de 1 dict por
+# registro: sem `attributes`, Ids internados, linhas com .get(). Pode ser ligado por --colunar.
+COLUMNAR = os.getenv("SF_COLUNAR", "") in ("1", "true", "sim")
+
+# --pipeline: quantos identificadores recentes ficam lembrados para pular repetidos (~100 B cada).
+# Repetido mais longe que isso é processado de novo (idempotente: sai OK sem mudança). 0 = sem limite.
+PIPELINE_DEDUP = int(os.getenv("SF_PIPELINE_JANELA", "100000"))
+
+# consultas repetidas dentro de 1 execução do CLI / 1 requisição da API reaproveitam o resultado
+# por até esse tempo (s); escritas invalidam o que tocam. 0 = desliga. Pode ser trocado por --memo-ttl.
+MEMO_TTL = float(os.getenv("SF_MEMO_TTL", "300"))
+
+# API: janela (ms) em que escritas de requisições simultâneas são juntadas num lote só (0 = desliga)
+COALESCE_MS = float(os.getenv("SF_COALESCER_MS", "5"))
+
+# API: prazo (ms) de cada requisição quando o cliente não manda X-Deadline-Ms; teto para o que ele mandar
+API_DEADLINE_MS = float(os.getenv("SF_API_PRAZO_MS", "30000"))
+API_DEADLINE_MAX_MS = 120000.0
+
 # =========================
 # CORES (ANSI)
 # =========================
@@ -135,6 +201,7 @@ def bold(text: str, enabled=True) -> str:
 # =========================
 # UI "PRO" (BOX / LAYOUT)
 # =========================
+@lru_cache(maxsize=1)
 def term_width(default=88) -> int:
     try:
         import shutil
@@ -206,10 +273,27 @@ def normalize_records(res):
         return res.get("records", [])
     return []
 
-def soql(instance_url, headers, query: str):
-    res = get_all_query_results(instance_url=instance_url, auth_headers=headers, query=query)
-    return normalize_records(res)
+def soql(instance_url, headers, query: str, columnar: bool = False):
+    res = get_all_query_results(instance_url=instance_url, auth_headers=headers, query=query, columnar=columnar)
+    return res if columnar else normalize_records(res)
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def map_chunks(fn, items, size):
+    """Aplica fn em cada lote de items (até PARALLEL lotes ao mesmo tempo) e devolve os resultados na ordem."""
+    parts = list(chunked(items, size))
+    if PARALLEL <= 1 or len(parts) <= 1:
+        return [fn(part) for part in parts]
+    with ThreadPoolExecutor(max_workers=min(PARALLEL, len(parts)), thread_name_prefix="lote") as pool:
+        # cada lote roda no contexto de quem chamou (o prazo da requisição vale nas threads)
+        return [f.result() for f in [sf_http.run_in_context(pool, fn, part) for part in parts]]
+
+def soql_in_list(values) -> str:
+    return ", ".join(f"'{escape_soql(v)}'" for v in values)
 
+@perfil.fase("login")
 def sf_login_or_die():
     missing = []
     for k, v in [("SF_CLIENT_ID", SF_CLIENT_ID), ("SF_CLIENT_SECRET", SF_CLIENT_SECRET),
@@ -237,16 +321,34 @@ def sf_login_or_die():
     instance_url = token_data.get("instance_url") or SF_DOMAIN
     return instance_url, headers
 
+# login da API: 1 por processo, compartilhado entre as threads e renovado
+# por TTL ou quando o Salesforce responder 401
+API_TOKEN_TTL = int(os.getenv("SF_TOKEN_TTL", "1800"))
+API_LOGIN = {"value": None, "at": 0.0}
+API_LOGIN_LOCK = threading.Lock()
+
 def sf_login_for_api():
-    try:
-        return sf_login_or_die()
-    except SystemExit as e:
-        raise RuntimeError(str(e))
+    with API_LOGIN_LOCK:
+        if API_LOGIN["value"] and time.monotonic() - API_LOGIN["at"] < API_TOKEN_TTL:
+            return API_LOGIN["value"]
+        try:
+            value = sf_login_or_die()
+        except SystemExit as e:
+            raise RuntimeError(str(e))
+        API_LOGIN.update(value=value, at=time.monotonic())
+        return value
+
+def invalidate_api_login():
+    with API_LOGIN_LOCK:
+        API_LOGIN["value"] = None
+
+sf_http.on_unauthorized(invalidate_api_login)
 
 
 # =========================
 # SKILLS / GRUPOS (RESOLVE MasterLabel -> SkillId)
 # =========================
+@perfil.fase("skills")
 def list_all_skills(instance_url, headers, limit=2000):
     q = f"""
         SELECT Id, MasterLabel, DeveloperName
@@ -295,9 +397,16 @@ def get_skill_label_from_link(link: dict) -> str:
         return s.get("MasterLabel") or s.get("DeveloperName") or "(sem nome)"
     return link.get("Skill.MasterLabel") or link.get("Skill.DeveloperName") or "(sem nome)"
 
+def is_service_resource_id(identifier: str) -> bool:
+    return identifier.startswith("0Hn") and len(identifier) in (15, 18)
+
+def sr_from_record(r: dict, identifier: str) -> dict:
+    return {"id": r["Id"], "name": r.get("Name") or identifier, "is_active": bool(r.get("IsActive"))}
+
+@perfil.fase("resolucao")
 def resolve_service_resource(instance_url, headers, identifier: str) -> dict:
     # Id direto
-    if identifier.startswith("0Hn") and len(identifier) in (15, 18):
+    if is_service_resource_id(identifier):
         q = f"""
             SELECT Id, Name, IsActive
             FROM ServiceResource
@@ -320,6 +429,10 @@ def resolve_service_resource(instance_url, headers, identifier: str) -> dict:
     """
     recs = soql(instance_url, headers, q)
 
+    if not recs and (NAME_INDEX is not None or NAME_INDEX_LAZY):
+        # execução em lote: índice local no lugar do LIKE (sem round trip, ignora acento e sugere parecidos)
+        return get_name_index(instance_url, headers).resolve(identifier)
+
     if not recs:
         # fallback LIKE
         q2 = f"""
@@ -403,10 +516,9 @@ def resolve_service_resource_by_email(instance_url, headers, email: str) -> Opti
 
     return unique_candidates[0]
 
-def get_group_skill_ids(instance_url, headers, group_name: str):
+def group_skills_from_catalog(all_skills, group_name: str):
     if group_name not in GROUPS_MAP:
         raise ValueError(f"Grupo inválido: {group_name}")
-    all_skills = list_all_skills(instance_url, headers, limit=2000)
     label_to_id = build_label_to_id(all_skills)
     groups_resolved, missing = build_groups_resolved(label_to_id)
     group_skills = groups_resolved.get(group_name, [])
@@ -418,32 +530,77 @@ def get_group_skill_ids(instance_url, headers, group_name: str):
         )
     return group_skills, missing.get(group_name, [])
 
-def add_group_to_technician(instance_url, headers, sr_id: str, group_name: str, skill_level=None) -> bool:
-    group_skills, _ = get_group_skill_ids(instance_url, headers, group_name)
+def get_group_skill_ids(instance_url, headers, group_name: str):
+    if group_name not in GROUPS_MAP:
+        raise ValueError(f"Grupo inválido: {group_name}")
+    all_skills = list_all_skills(instance_url, headers, limit=2000)
+    return group_skills_from_catalog(all_skills, group_name)
+
+def raise_on_batch_failure(outcome, what: str):
+    fails = [msg for success, msg in outcome if not success]
+    if fails:
+        raise RuntimeError(f"{what} ({len(fails)} falha(s)): {fails[0]}")
+
+def coalesce_key(kind: str, instance_url, headers, skill_level=None) -> tuple:
+    return (kind, instance_url, tuple(sorted(headers.items())), skill_level)
+
+@sf_trace.traced("coalescedor.lote")
+def write_coalesced(key: tuple, items: list) -> list:
+    """flush do WriteCoalescer da API: 1 lote de várias requisições -> sObject Collections."""
+    kind, instance_url, headers, skill_level = key
+    sf_trace.current().set(tipo=kind, registros=len(items))
+    if kind == "criar":
+        return create_service_resource_skills_batch(instance_url, dict(headers), items, skill_level=skill_level)
+    return delete_service_resource_skills_batch(instance_url, dict(headers), items)
+
+def add_group_to_technician(instance_url, headers, sr_id: str, group_name: str, skill_level=None,
+                            current_links=None, all_skills=None, writes=None) -> bool:
+    """
+    current_links/all_skills: passe se já carregados (ex.: load_technician_context) para não consultar de novo.
+    writes: WriteCoalescer (API) para juntar a escrita com a de outras requisições simultâneas.
+    """
+    if all_skills is None:
+        group_skills, _ = get_group_skill_ids(instance_url, headers, group_name)
+    else:
+        group_skills, _ = group_skills_from_catalog(all_skills, group_name)
     desired_ids = {s["id"] for s in group_skills}
-    current_links = list_current_skill_links(instance_url, headers, sr_id)
+    if current_links is None:
+        current_links = list_current_skill_links(instance_url, headers, sr_id)
     current_ids = {l.get("SkillId") for l in current_links if l.get("SkillId")}
     to_add = sorted(desired_ids - current_ids)
-    for skill_id in to_add:
-        create_service_resource_skill(instance_url, headers, sr_id, skill_id, skill_level=skill_level)
+    if to_add:
+        items = [(sr_id, sid) for sid in to_add]
+        if writes is None:
+            outcome = create_service_resource_skills_batch(instance_url, headers, items, skill_level=skill_level)
+        else:
+            outcome = writes.submit(coalesce_key("criar", instance_url, headers, skill_level), items)
+        raise_on_batch_failure(outcome, "Falha ao adicionar skill")
     return True
 
-def remove_group_from_technician(instance_url, headers, sr_id: str, group_name: str) -> bool:
-    group_skills, _ = get_group_skill_ids(instance_url, headers, group_name)
+def remove_group_from_technician(instance_url, headers, sr_id: str, group_name: str,
+                                 current_links=None, all_skills=None, writes=None) -> bool:
+    if all_skills is None:
+        group_skills, _ = get_group_skill_ids(instance_url, headers, group_name)
+    else:
+        group_skills, _ = group_skills_from_catalog(all_skills, group_name)
     desired_ids = {s["id"] for s in group_skills}
-    current_links = list_current_skill_links(instance_url, headers, sr_id)
+    if current_links is None:
+        current_links = list_current_skill_links(instance_url, headers, sr_id)
     current_by_skillid = {l.get("SkillId"): l.get("Id") for l in current_links if l.get("SkillId") and l.get("Id")}
     to_remove = sorted(desired_ids.intersection(set(current_by_skillid.keys())))
-    for skill_id in to_remove:
-        delete_service_resource_skill(instance_url, headers, current_by_skillid[skill_id])
+    if to_remove:
+        link_ids = [current_by_skillid[sid] for sid in to_remove]
+        if writes is None:
+            outcome = delete_service_resource_skills_batch(instance_url, headers, link_ids)
+        else:
+            outcome = writes.submit(coalesce_key("remover", instance_url, headers), link_ids)
+        raise_on_batch_failure(outcome, "Falha ao remover")
     return True
 
-def consult_technician(instance_url, headers, sr_id: str):
-    current_links = list_current_skill_links(instance_url, headers, sr_id)
+def summarize_technician(current_links, all_skills):
     current_skill_ids = {l.get("SkillId") for l in current_links if l.get("SkillId")}
     current_skill_labels = sorted({get_skill_label_from_link(l) for l in current_links})
 
-    all_skills = list_all_skills(instance_url, headers, limit=2000)
     label_to_id = build_label_to_id(all_skills)
     groups_resolved, _ = build_groups_resolved(label_to_id)
 
@@ -475,29 +632,236 @@ def consult_technician(instance_url, headers, sr_id: str):
         "grupos": groups_status,
     }
 
+def consult_technician(instance_url, headers, sr_id: str):
+    current_links = list_current_skill_links(instance_url, headers, sr_id)
+    all_skills = list_all_skills(instance_url, headers, limit=2000)
+    return summarize_technician(current_links, all_skills)
+
+@sf_trace.traced("contexto")
+def load_technician_context(instance_url, headers, email: str, with_links=True, with_catalog=True) -> dict:
+    """
+    Numa única chamada Composite: ServiceResource pelo e-mail do User relacionado
+    (+ links de skill do técnico e catálogo de Skill, se pedidos).
+    Retorna {"sr": sr | None, "links": [...], "all_skills": [...]}.
+    Mesmas regras do resolve_service_resource_by_email (ValueError se ambíguo).
+    Requisições simultâneas para o mesmo e-mail compartilham a mesma Composite (single-flight).
+    """
+    key = ("contexto", instance_url, headers_key(headers), email.strip().lower(), with_links, with_catalog)
+    return dict(memo.remember(key, lambda: READS.do(key, fetch_technician_context, instance_url, headers, email,
+                                                    with_links, with_catalog),
+                              objects=("ServiceResource", "User", "ServiceResourceSkill", "Skill")))
+
+def fetch_technician_context(instance_url, headers, email: str, with_links=True, with_catalog=True) -> dict:
+    """load_technician_context sem single-flight (sempre vai ao Salesforce)."""
+    safe_email = escape_soql(email.strip())
+    ctx = {"sr": None, "links": [], "all_skills": []}
+    if not safe_email:
+        return ctx
+
+    subrequests = [
+        soql_subrequest("tecnico", f"""
+            SELECT Id, Name, IsActive, RelatedRecordId, RelatedRecord.Email
+            FROM ServiceResource
+            WHERE RelatedRecord.Email = '{safe_email}'
+            ORDER BY LastModifiedDate DESC
+            LIMIT 10
+        """, API_VERSION),
+    ]
+    if with_links:
+        subrequests.append(soql_subrequest("links", """
+            SELECT Id, SkillId, Skill.MasterLabel, Skill.DeveloperName
+            FROM ServiceResourceSkill
+            WHERE ServiceResourceId = '@{tecnico.records[0].Id}'
+            ORDER BY Skill.MasterLabel
+        """, API_VERSION))
+    if with_catalog:
+        subrequests.append(soql_subrequest("skills", """
+            SELECT Id, MasterLabel, DeveloperName
+            FROM Skill
+            WHERE IsDeleted = false
+            ORDER BY MasterLabel
+            LIMIT 2000
+        """, API_VERSION))
+
+    res = execute_composite(instance_url, headers, subrequests, api_version=API_VERSION)
+    if res is None:
+        raise RuntimeError("Falha na chamada Composite ao Salesforce")
+
+    srs = get_composite_query_records(instance_url, headers, res.get("tecnico"))
+    if srs is None:
+        raise RuntimeError(f"Falha ao consultar técnico: {res.get('tecnico')}")
+    if with_catalog:
+        all_skills = get_composite_query_records(instance_url, headers, res.get("skills"))
+        if all_skills is None:
+            raise RuntimeError(f"Falha ao carregar catálogo de Skill: {res.get('skills')}")
+        ctx["all_skills"] = all_skills
+
+    unique_by_id = {}
+    for sr in srs:
+        if sr.get("Id"):
+            unique_by_id.setdefault(sr["Id"], sr)
+    if not unique_by_id:
+        return ctx
+    if len(unique_by_id) > 1:
+        ids = ", ".join(unique_by_id)
+        raise ValueError(f"E-mail ambíguo: mais de um técnico encontrado ({ids})")
+
+    sr = next(iter(unique_by_id.values()))
+    related = sr.get("RelatedRecord") if isinstance(sr.get("RelatedRecord"), dict) else {}
+    ctx["sr"] = {
+        "id": sr["Id"],
+        "name": sr.get("Name") or email,
+        "is_active": bool(sr.get("IsActive")),
+        "email": related.get("Email") or email,
+    }
+    if with_links:
+        links = get_composite_query_records(instance_url, headers, res.get("links"))
+        if links is None:
+            raise RuntimeError(f"Falha ao carregar skills do técnico: {res.get('links')}")
+        ctx["links"] = links
+    return ctx
+
+@perfil.fase("links")
 def list_current_skill_links(instance_url, headers, sr_id: str):
     q = f"""
-        SELECT Id, SkillId, Skill.MasterLabel, Skill.DeveloperName
+        SELECT Id, SkillId, Skill.MasterLabel, Skill.DeveloperName, SystemModstamp
         FROM ServiceResourceSkill
         WHERE ServiceResourceId = '{sr_id}'
         ORDER BY Skill.MasterLabel
     """
     return soql(instance_url, headers, q)
 
+def use_name_index(identifiers: list) -> None:
+    """Lote com nomes: quem não bater exato resolve no índice local (montado na 1ª falta, não antes)."""
+    global NAME_INDEX_LAZY
+    NAME_INDEX_LAZY = len(identifiers) > 1 and any(not is_service_resource_id(x) for x in identifiers)
+
+@perfil.fase("indice")
+def get_name_index(instance_url, headers):
+    """Índice de nomes do processo: carrega o cache e atualiza incrementalmente na 1ª chamada."""
+    global NAME_INDEX
+    if NAME_INDEX is None:
+        with NAME_INDEX_LOCK:
+            if NAME_INDEX is None:
+                NAME_INDEX = open_index(instance_url, headers, API_VERSION, NAME_INDEX_FILE or None, columnar=COLUMNAR)
+    return NAME_INDEX
+
+@perfil.fase("resolucao")
+def resolve_service_resources_bulk(instance_url, headers, identifiers: list[str]) -> dict:
+    """
+    Resolve vários técnicos de uma vez (queries IN de até SOQL_IN_CHUNK itens).
+    Retorna {identifier: sr | Exception}. Nome sem match exato é resolvido no
+    índice local de nomes (sem acento/caixa; sem LIKE remoto).
+    """
+    out = {}
+    ids = [x for x in identifiers if is_service_resource_id(x)]
+    names = [x for x in identifiers if not is_service_resource_id(x)]
+
+    by_id15 = {}
+    for part in chunked(ids, SOQL_IN_CHUNK):
+        q = f"""
+            SELECT Id, Name, IsActive
+            FROM ServiceResource
+            WHERE Id IN ({soql_in_list(part)})
+        """
+        for r in soql(instance_url, headers, q):
+            by_id15[r["Id"][:15]] = r
+    for ident in ids:
+        r = by_id15.get(ident[:15])
+        if r:
+            out[ident] = sr_from_record(r, ident)
+        else:
+            out[ident] = ValueError(f"ServiceResource não encontrado para Id={ident}")
+
+    # Name = '...' na SOQL não diferencia maiúsculas/minúsculas
+    by_name = {}
+    for part in chunked(names, SOQL_IN_CHUNK):
+        q = f"""
+            SELECT Id, Name, IsActive
+            FROM ServiceResource
+            WHERE Name IN ({soql_in_list(part)})
+            ORDER BY LastModifiedDate DESC
+        """
+        for r in soql(instance_url, headers, q):
+            by_name.setdefault((r.get("Name") or "").lower(), []).append(r)
+    for ident in names:
+        recs = by_name.get(ident.lower(), [])
+        if len(recs) > 1:
+            ids_txt = ", ".join([r.get("Id") for r in recs if r.get("Id")])
+            out[ident] = ValueError(f"Nome duplicado. Use o Id 0Hn... | encontrados: {ids_txt}")
+        elif recs:
+            out[ident] = sr_from_record(recs[0], ident)
+        else:
+            try:
+                out[ident] = get_name_index(instance_url, headers).resolve(ident)
+            except Exception as e:
+                out[ident] = e
+    return out
+
+@perfil.fase("links")
+def list_current_skill_links_bulk(instance_url, headers, sr_ids: list[str]) -> dict:
+    """Carrega os ServiceResourceSkill de vários técnicos. Retorna {sr_id: [links]}."""
+    out = {sr_id: [] for sr_id in sr_ids}
+
+    def load(part):
+        q = f"""
+            SELECT Id, ServiceResourceId, SkillId, Skill.MasterLabel, Skill.DeveloperName, SystemModstamp
+            FROM ServiceResourceSkill
+            WHERE ServiceResourceId IN ({soql_in_list(part)})
+            ORDER BY Skill.MasterLabel
+        """
+        return soql(instance_url, headers, q, columnar=COLUMNAR)
+
+    for links in map_chunks(load, list(out), SOQL_IN_CHUNK):
+        for l in links:
+            out.setdefault(l.get("ServiceResourceId"), []).append(l)
+    return out
+
+@perfil.fase("links")
+def link_fingerprints_bulk(instance_url, headers, sr_ids: list[str]) -> dict:
+    """
+    {sr_id: (nº de links, maior SystemModstamp)} com 1 query agregada por lote de
+    SOQL_IN_CHUNK técnicos (1 linha por técnico, sem trazer os links).
+    Técnico sem link não aparece: vale (0, "").
+    """
+    def load(part):
+        q = f"""
+            SELECT ServiceResourceId, COUNT(Id) n, MAX(SystemModstamp) m
+            FROM ServiceResourceSkill
+            WHERE ServiceResourceId IN ({soql_in_list(part)})
+            GROUP BY ServiceResourceId
+        """
+        return soql(instance_url, headers, q)
+
+    out = {}
+    for rows in map_chunks(load, list(dict.fromkeys(sr_ids)), SOQL_IN_CHUNK):
+        for r in rows:
+            out[r.get("ServiceResourceId")] = (int(r.get("n") or 0), r.get("m") or "")
+    return out
+
+@sf_trace.traced("sf.ativar_tecnico", "client")
+@memo.invalidates("ServiceResource", lambda instance_url, headers, sr_id: [sr_id])
 def patch_activate_service_resource(instance_url, headers, sr_id: str):
+    sf_trace.current().set({"sr.id": sr_id})
     url = f"{instance_url}/services/data/{API_VERSION}/sobjects/ServiceResource/{sr_id}"
     payload = {"IsActive": True}
-    r = requests.patch(url, headers={**headers, "Content-Type": "application/json"}, json=payload, timeout=60)
+    r = sf_http.request("PATCH", url, headers={**headers, "Content-Type": "application/json"}, json=payload, timeout=60)
     if r.status_code >= 400:
         raise RuntimeError(f"Não consegui ativar ({r.status_code}): {r.text}")
 
+@sf_trace.traced("sf.remover_skill", "client")
+@memo.invalidates("ServiceResourceSkill", lambda instance_url, headers, link_id: [link_id])
 def delete_service_resource_skill(instance_url, headers, link_id: str):
+    sf_trace.current().set({"link.id": link_id})
     url = f"{instance_url}/services/data/{API_VERSION}/sobjects/ServiceResourceSkill/{link_id}"
-    r = requests.delete(url, headers=headers, timeout=60)
+    r = sf_http.request("DELETE", url, headers=headers, timeout=60)
     if r.status_code >= 400:
         raise RuntimeError(f"Falha ao remover (link {link_id}) ({r.status_code}): {r.text}")
 
+@sf_trace.traced("sf.criar_skill", "client")
+@memo.invalidates("ServiceResourceSkill", lambda instance_url, headers, sr_id, skill_id, skill_level=None: [sr_id])
 def create_service_resource_skill(instance_url, headers, sr_id: str, skill_id: str, skill_level=None):
+    sf_trace.current().set({"sr.id": sr_id, "skill.id": skill_id})
     url = f"{instance_url}/services/data/{API_VERSION}/sobjects/ServiceResourceSkill"
     now_iso = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
 
@@ -509,28 +873,236 @@ def create_service_resource_skill(instance_url, headers, sr_id: str, skill_id: s
     if skill_level is not None:
         payload["SkillLevel"] = int(skill_level)
 
-    r = requests.post(url, headers={**headers, "Content-Type": "application/json"}, json=payload, timeout=60)
+    r = sf_http.request("POST", url, headers={**headers, "Content-Type": "application/json"}, json=payload, timeout=60)
     if r.status_code >= 400:
         raise RuntimeError(f"Falha ao adicionar skill ({r.status_code}): {r.text}")
     return r.json().get("id")
 
+def collection_results(r, n: int, what: str) -> list:
+    """Converte a resposta do sObject Collections em [(ok, id_ou_erro), ...]."""
+    if r.status_code >= 400:
+        return [(False, f"{what} ({r.status_code}): {r.text}")] * n
+    out = []
+    for item in r.json():
+        if item.get("success"):
+            out.append((True, item.get("id")))
+        else:
+            msgs = "; ".join(f"{e.get('statusCode')}: {e.get('message')}" for e in item.get("errors") or [])
+            out.append((False, msgs or "erro desconhecido"))
+    return out
+
+def traced_outcome(results: list) -> list:
+    """Anota no span atual quantos registros foram enviados e quantos falharam."""
+    sf_trace.current().set(registros=len(results), falhas=sum(1 for success, _ in results if not success))
+    return results
+
+def retry_locked(results: list, items: list, send) -> list:
+    """
+    Reenvia 1 vez (em série) os registros que falharam com UNABLE_TO_LOCK_ROW
+    (lotes paralelos disputando o mesmo técnico). send(items) -> [(ok, id_ou_erro), ...].
+    """
+    locked = [i for i, (success, info) in enumerate(results) if not success and "UNABLE_TO_LOCK_ROW" in str(info)]
+    if not locked:
+        return results
+    for part in chunked(locked, COLLECTION_CHUNK):
+        for i, outcome in zip(part, send([items[i] for i in part])):
+            results[i] = outcome
+    return results
+
+@sf_trace.traced("sf.criar_skills", "client")
+@memo.invalidates("ServiceResourceSkill", lambda instance_url, headers, items, skill_level=None: [sr for sr, _ in items])
+def create_service_resource_skills_batch(instance_url, headers, items: list, skill_level=None) -> list:
+    """
+    Cria vários ServiceResourceSkill via sObject Collections (COLLECTION_CHUNK por chamada).
+    items = [(sr_id, skill_id), ...] -> [(ok, id_ou_erro), ...] na mesma ordem.
+    """
+    url = f"{instance_url}/services/data/{API_VERSION}/composite/sobjects"
+    now_iso = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    def send(part):
+        records = []
+        for sr_id, skill_id in part:
+            rec = {
+                "attributes": {"type": "ServiceResourceSkill"},
+                "ServiceResourceId": sr_id,
+                "SkillId": skill_id,
+                "EffectiveStartDate": now_iso,
+            }
+            if skill_level is not None:
+                rec["SkillLevel"] = int(skill_level)
+            records.append(rec)
+        try:
+            r = sf_http.request("POST", url, headers={**headers, "Content-Type": "application/json"},
+                                json={"allOrNone": False, "records": records}, timeout=60)
+            return collection_results(r, len(part), "Falha ao adicionar skills")
+        except sf_http.DeadlineExceeded:
+            raise
+        except Exception as e:
+            return [(False, str(e))] * len(part)
+
+    results = [outcome for part in map_chunks(send, items, COLLECTION_CHUNK) for outcome in part]
+    return traced_outcome(retry_locked(results, items, send))
+
+@sf_trace.traced("sf.remover_skills", "client")
+@memo.invalidates("ServiceResourceSkill", lambda instance_url, headers, link_ids: link_ids)
+def delete_service_resource_skills_batch(instance_url, headers, link_ids: list) -> list:
+    """Remove vários ServiceResourceSkill via sObject Collections. Retorna [(ok, id_ou_erro), ...]."""
+    url = f"{instance_url}/services/data/{API_VERSION}/composite/sobjects"
+
+    def send(part):
+        try:
+            r = sf_http.request("DELETE", url, headers=headers, params={"ids": ",".join(part), "allOrNone": "false"}, timeout=60)
+            return collection_results(r, len(part), "Falha ao remover skills")
+        except sf_http.DeadlineExceeded:
+            raise
+        except Exception as e:
+            return [(False, str(e))] * len(part)
+
+    results = [outcome for part in map_chunks(send, link_ids, COLLECTION_CHUNK) for outcome in part]
+    return traced_outcome(retry_locked(results, link_ids, send))
+
+def bulk_outcome(job: dict, keys: list, key_of) -> list:
+    """Mapeia successfulResults/failedResults do job de volta na ordem de keys: [(ok, id_ou_erro), ...]."""
+    status = {}
+    for row in job["successful"]:
+        status[key_of(row)] = (True, row.get("sf__Id"))
+    for row in job["failed"]:
+        status[key_of(row)] = (False, row.get("sf__Error") or "falha")
+    fallback = (False, job["error"] or "registro não processado pelo job")
+    return [status.get(k, fallback) for k in keys]
+
+@sf_trace.traced("sf.bulk.criar_skills", "client")
+@memo.invalidates("ServiceResourceSkill", lambda instance_url, headers, items, skill_level=None: [sr for sr, _ in items])
+def create_service_resource_skills_bulk(instance_url, headers, items: list, skill_level=None) -> list:
+    """Mesmo contrato do create_service_resource_skills_batch, via job de insert do Bulk API 2.0."""
+    now_iso = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    fields = ["ServiceResourceId", "SkillId", "EffectiveStartDate"]
+    if skill_level is not None:
+        fields.append("SkillLevel")
+    rows = [
+        {"ServiceResourceId": sr_id, "SkillId": skill_id, "EffectiveStartDate": now_iso,
+         "SkillLevel": None if skill_level is None else int(skill_level)}
+        for sr_id, skill_id in items
+    ]
+    job = run_ingest_job(instance_url, headers, "ServiceResourceSkill", "insert", rows, fields, api_version=API_VERSION)
+    return traced_outcome(bulk_outcome(job, list(items), lambda row: (row.get("ServiceResourceId"), row.get("SkillId"))))
+
+@sf_trace.traced("sf.bulk.remover_skills", "client")
+@memo.invalidates("ServiceResourceSkill", lambda instance_url, headers, link_ids: link_ids)
+def delete_service_resource_skills_bulk(instance_url, headers, link_ids: list) -> list:
+    """Mesmo contrato do delete_service_resource_skills_batch, via job de delete do Bulk API 2.0."""
+    job = run_ingest_job(instance_url, headers, "ServiceResourceSkill", "delete",
+                         [{"Id": l} for l in link_ids], ["Id"], api_version=API_VERSION)
+    return traced_outcome(bulk_outcome(job, list(link_ids), lambda row: row.get("Id")))
+
 
 # =========================
 # UI / INPUT
 # =========================
-def ask(prompt: str) -> str:
-    return input(prompt).strip()
-
-def read_identifiers_from_file(path: str) -> list[str]:
-    out = []
-    with open(path, "r", encoding="utf-8") as f:
+@perfil.fase("prompt")
+def ask(prompt: str, stream=None) -> str:
+    sf_log.flush()
+    if stream is None:
+        return input(prompt).strip()
+    # saída de máquina no stdout: a pergunta vai para outro stream (stderr)
+    stream.write(prompt)
+    stream.flush()
+    return input().strip()
+
+def iter_identifiers_from_file(path: str):
+    """Lê 1 nome/ID por linha sob demanda ("-" = stdin). Ignora vazias e comentários (#)."""
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
         for line in f:
             line = line.strip()
             if not line or line.startswith("#"):
                 continue
-            out.append(line)
-    return out
+            yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+@perfil.fase("entrada")
+def read_identifiers_from_file(path: str) -> list[str]:
+    return list(iter_identifiers_from_file(path))
+
+def normalize_group_name(value: str) -> str:
+    """Aceita nome ou número (ordem do GROUP_ORDER). Retorna o nome do grupo ou ""."""
+    v = (value or "").strip()
+    if v.isdigit():
+        idx = int(v)
+        if 1 <= idx <= len(GROUP_ORDER):
+            return GROUP_ORDER[idx - 1]
+        return ""
+    for g in GROUP_ORDER:
+        if g.lower() == v.lower():
+            return g
+    return ""
+
+@perfil.fase("entrada")
+def read_desired_state(path: str, default_mode=None) -> list[dict]:
+    """
+    Lê o arquivo de estado desejado (.csv ou .json) e consolida por técnico.
+
+    CSV (separador , ou ;):   tecnico,grupos,modo
+                              DOUGLAS RODRIGO LUCIO MAIA,Retirada|Mudança,3
+    JSON: [{"tecnico": "0Hn...", "grupos": ["Retirada", "Mudança"], "modo": "3"}, ...]
+          (ou {"0Hn...": {"grupos": [...], "modo": "3"}, ...})
+
+    Retorna [{"identifier", "groups": [...], "mode"}] na ordem do arquivo.
+    """
+    rows = []
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = [{"tecnico": k, **(v if isinstance(v, dict) else {"grupos": v})} for k, v in data.items()]
+        for item in data:
+            grupos = item.get("grupos") or item.get("grupo") or []
+            if isinstance(grupos, str):
+                grupos = grupos.split("|")
+            rows.append((str(item.get("tecnico") or ""), grupos, item.get("modo")))
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;")
+            except csv.Error:
+                dialect = csv.excel
+            for row in csv.DictReader(f, dialect=dialect):
+                row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+                if not row.get("tecnico") or row["tecnico"].startswith("#"):
+                    continue
+                rows.append((row["tecnico"], row.get("grupos", "").split("|"), row.get("modo")))
+
+    by_ident = {}
+    for ident, grupos, modo in rows:
+        ident = ident.strip()
+        if not ident:
+            continue
+        modo = str(modo or default_mode or "").strip()
+        if modo not in ("1", "2", "3"):
+            raise SystemExit(f"❌ Modo inválido/ausente para '{ident}'. Use 1, 2 ou 3 (coluna modo ou --modo).")
+        groups = []
+        for g in grupos:
+            if not str(g).strip():
+                continue
+            name = normalize_group_name(str(g))
+            if not name:
+                raise SystemExit(f"❌ Grupo inválido para '{ident}': {g}. Use --listar-grupos para ver os válidos.")
+            groups.append(name)
+
+        entry = by_ident.setdefault(ident, {"identifier": ident, "groups": [], "mode": modo})
+        if entry["mode"] != modo:
+            raise SystemExit(f"❌ Modos conflitantes para '{ident}': {entry['mode']} e {modo}.")
+        for g in groups:
+            if g not in entry["groups"]:
+                entry["groups"].append(g)
 
+    return list(by_ident.values())
+
+@perfil.fase("prompt")
 def choose_group_interactive(groups_resolved, missing, color=True) -> str:
     print("\n" + bold("GRUPOS DISPONÍVEIS (SEU MAPA):", color))
     for i, g in enumerate(GROUP_ORDER, 1):
@@ -542,19 +1114,9 @@ def choose_group_interactive(groups_resolved, missing, color=True) -> str:
         print(f" {i}) {bold(g, color)} -> {ok_count} aplicável(is){extra}")
 
     v = ask("\nEscolha o grupo (número ou nome): ")
-    if not v:
-        return ""
-    if v.isdigit():
-        idx = int(v)
-        if 1 <= idx <= len(GROUP_ORDER):
-            return GROUP_ORDER[idx - 1]
-        return ""
-    v_norm = v.strip().lower()
-    for g in GROUP_ORDER:
-        if g.lower() == v_norm:
-            return g
-    return ""
+    return normalize_group_name(v)
 
+@perfil.fase("prompt")
 def choose_mode(color=True) -> str:
     print("\n" + bold("Como tratar as skills atuais?", color))
     print(" 1) NÃO remover nada (só adiciona o que faltar do grupo)")
@@ -563,6 +1125,7 @@ def choose_mode(color=True) -> str:
     m = ask("Escolha 1, 2 ou 3 [1]: ")
     return (m.strip() or "1")
 
+@perfil.fase("prompt")
 def choose_subset_once_if_enabled(group_name: str, resolved_list: list[dict], enable: bool, color=True) -> list[dict]:
     """
     Se enable=False: retorna TODAS as skills do grupo (resolved_list).
@@ -622,48 +1185,220 @@ def listar_grupos(sem_cor=False):
 # =========================
 # PLANEJAMENTO / EXECUÇÃO
 # =========================
-def plan_one(instance_url, headers, identifier: str, ativar_inativo: bool):
-    try:
-        sr = resolve_service_resource(instance_url, headers, identifier)
-    except Exception as e:
-        return {"status": "ERROR", "identifier": identifier, "msg": str(e)}
+@perfil.fase("ativacao")
+def ensure_active(instance_url, headers, identifier: str, sr: dict, ativar_inativo: bool):
+    """Retorna (sr, None) se o técnico está apto, ou (sr, plano SKIP)."""
+    sr_id, sr_name = sr["id"], sr["name"]
 
-    sr_id, sr_name, is_active = sr["id"], sr["name"], sr["is_active"]
-
-    if not is_active and ativar_inativo:
+    if not sr["is_active"] and ativar_inativo:
         try:
             patch_activate_service_resource(instance_url, headers, sr_id)
             sr = resolve_service_resource(instance_url, headers, sr_id)
-            is_active = sr["is_active"]
         except Exception as e:
-            return {"status": "SKIP", "identifier": identifier, "sr_id": sr_id, "sr_name": sr_name, "msg": f"inativo e falhou ao ativar: {e}"}
+            return sr, {"status": "SKIP", "identifier": identifier, "sr_id": sr_id, "sr_name": sr_name, "msg": f"inativo e falhou ao ativar: {e}"}
 
-    if not is_active:
-        return {"status": "SKIP", "identifier": identifier, "sr_id": sr_id, "sr_name": sr_name, "msg": "técnico INATIVO (org bloqueia skill)"}
+    if not sr["is_active"]:
+        return sr, {"status": "SKIP", "identifier": identifier, "sr_id": sr_id, "sr_name": sr_name, "msg": "técnico INATIVO (org bloqueia skill)"}
 
-    current_links = list_current_skill_links(instance_url, headers, sr_id)
-    current_by_skillid = {}
-    current_ids = set()
-    current_names = []
+    return sr, None
+
+# =========================
+# PLANO COMPACTO (10k+ técnicos na memória)
+# =========================
+# Cada Skill Id/nome é guardado 1 vez só (catálogo interno); o plano de cada
+# técnico guarda índices nesse catálogo (array) + os Ids dos links numa string.
+# O catálogo é do processo (a API reaproveita entre requisições): cresce até o nº de
+# Skills distintas já vistas na org, não com o nº de técnicos/requisições. Os índices
+# cabem em array('H') até 65.535 skills; acima disso o plano passa para array('I').
+SKILL_INDEX = {}   # skill_id -> índice
+SKILL_IDS = []     # índice -> skill_id
+SKILL_LABELS = []  # índice -> nome (MasterLabel)
+SKILL_LOCK = threading.Lock()
+SKILL_INDEX_MAX_H = 0xFFFF
+
+def intern_skill(skill_id: str, label: str) -> int:
+    idx = SKILL_INDEX.get(skill_id)
+    if idx is None:
+        with SKILL_LOCK:
+            idx = SKILL_INDEX.get(skill_id)
+            if idx is None:
+                idx = len(SKILL_IDS)
+                SKILL_IDS.append(sys.intern(skill_id))
+                SKILL_LABELS.append(sys.intern(label))
+                SKILL_INDEX[SKILL_IDS[idx]] = idx
+    elif label != SKILL_LABELS[idx] and label != "(sem nome)":
+        SKILL_LABELS[idx] = sys.intern(label)  # skill renomeada na org: vale o nome mais novo
+    return idx
+
+class TechPlan:
+    """
+    Plano OK de 1 técnico, só com o que prévia/execução usam.
+    Continua acessível como dict (plan["sr_id"], plan.get("msg")...), então o resto
+    do código e a saída jsonl/csv não mudam; current_ids/current_by_skillid/
+    current_names/current_links são montados na hora, a partir do array.
+    """
+    __slots__ = ("identifier", "sr_id", "sr_name", "skills", "link_ids", "extra_names", "modstamp")
+    status = "OK"
+    KEYS = ("status", "identifier", "sr_id", "sr_name", "current_links", "current_by_skillid", "current_ids", "current_names")
+
+    def __init__(self, identifier: str, sr_id: str, sr_name: str, skills, link_ids: str, extra_names=None, modstamp=""):
+        self.identifier = identifier
+        self.sr_id = sr_id
+        self.sr_name = sr_name
+        self.skills = skills            # array('H'/'I') de índices no catálogo, na ordem dos links
+        self.link_ids = link_ids        # Ids dos links separados por vírgula (mesma ordem)
+        self.extra_names = extra_names  # links sem SkillId/Id (raro): só o nome, para a prévia
+        self.modstamp = modstamp        # maior SystemModstamp dos links lidos (checagem do --executar-plano)
+
+    @property
+    def n_links(self) -> int:
+        return len(self.skills) + len(self.extra_names or ())
+
+    @property
+    def current_ids(self) -> set:
+        return {SKILL_IDS[i] for i in self.skills}
+
+    @property
+    def current_by_skillid(self) -> dict:
+        ids = self.link_ids.split(",") if self.link_ids else []
+        return {SKILL_IDS[i]: lid for i, lid in zip(self.skills, ids)}
+
+    @property
+    def current_names(self) -> list:
+        return [SKILL_LABELS[i] for i in self.skills] + list(self.extra_names or ())
+
+    @property
+    def current_skill_names(self) -> dict:
+        """skill_id -> nome das skills atuais (para mostrar o que vai ser removido)."""
+        return {SKILL_IDS[i]: SKILL_LABELS[i] for i in self.skills}
+
+    @property
+    def current_links(self) -> list:
+        ids = self.link_ids.split(",") if self.link_ids else []
+        return [{"Id": lid, "SkillId": SKILL_IDS[i], "Skill": {"MasterLabel": SKILL_LABELS[i]}}
+                for i, lid in zip(self.skills, ids)]
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+def build_plan(identifier: str, sr: dict, current_links: list) -> TechPlan:
+    skills = array("H")
+    link_ids = []
+    extra_names = []
+    modstamp = ""
 
     for l in current_links:
+        stamp = l.get("SystemModstamp") or ""
+        if stamp > modstamp:
+            modstamp = stamp
         sid = l.get("SkillId")
         lid = l.get("Id")
         if sid and lid:
-            current_by_skillid[sid] = lid
-            current_ids.add(sid)
-        current_names.append(get_skill_label_from_link(l))
+            idx = intern_skill(sid, get_skill_label_from_link(l))
+            if idx > SKILL_INDEX_MAX_H and skills.typecode == "H":
+                skills = array("I", skills)
+            skills.append(idx)
+            link_ids.append(lid)
+        else:
+            extra_names.append(get_skill_label_from_link(l))
+
+    return TechPlan(identifier, sr["id"], sr["name"], skills, ",".join(link_ids), tuple(extra_names) or None, modstamp)
+
+def plan_one(instance_url, headers, identifier: str, ativar_inativo: bool, prefetched=None):
+    """prefetched: (sr ou exceção, links ou None) já lidos pelo Prefetch; o que faltar é lido aqui."""
+    sr, current_links = prefetched or (None, None)
+    if sr is None:
+        try:
+            sr = resolve_service_resource(instance_url, headers, identifier)
+        except Exception as e:
+            sr = e
+    if isinstance(sr, Exception):
+        return {"status": "ERROR", "identifier": identifier, "msg": str(sr)}
 
-    return {
-        "status": "OK",
-        "identifier": identifier,
-        "sr_id": sr_id,
-        "sr_name": sr_name,
-        "current_links": current_links,
-        "current_by_skillid": current_by_skillid,
-        "current_ids": current_ids,
-        "current_names": current_names,
-    }
+    sr, skip = ensure_active(instance_url, headers, identifier, sr, ativar_inativo)
+    if skip:
+        return skip
+
+    if current_links is None:
+        current_links = list_current_skill_links(instance_url, headers, sr["id"])
+    return build_plan(identifier, sr, current_links)
+
+class Prefetch:
+    """
+    CLI interativo: logo depois do login, resolve os técnicos e carrega os links em
+    segundo plano enquanto o usuário escolhe grupo, modo e skills (nada disso depende
+    da escolha). Só leituras: ativar inativo (--ativar-inativo) continua no plan_one,
+    depois das perguntas. Os logs INFO dessas threads ficam quietos até close().
+
+    take(identifier) -> (sr ou exceção, links ou None) para o plan_one.
+    """
+
+    def __init__(self, instance_url, headers, identifiers: list, workers: int = 4):
+        self.instance_url = instance_url
+        self.headers = headers
+        sf_log.quiet_threads("prefetch")
+        self.pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(identifiers))), thread_name_prefix="prefetch")
+        self.futures = {ident: sf_http.run_in_context(self.pool, self.load, ident) for ident in identifiers}
+
+    def load(self, identifier: str):
+        try:
+            sr = resolve_service_resource(self.instance_url, self.headers, identifier)
+        except Exception as e:
+            return e, None
+        if not sr["is_active"]:
+            return sr, None  # pode ser ativado depois: links lidos no plan_one
+        try:
+            return sr, list_current_skill_links(self.instance_url, self.headers, sr["id"])
+        except Exception:
+            return sr, None
+
+    def take(self, identifier: str):
+        future = self.futures.pop(identifier, None)
+        if future is None or future.cancelled():
+            return None
+        return future.result()
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.futures.clear()
+        sf_log.quiet_threads("prefetch", enabled=False)
+
+def plan_many(instance_url, headers, identifiers: list[str], ativar_inativo: bool) -> list[dict]:
+    """
+    Mesmo resultado do plan_one para cada identificador, mas resolvendo técnicos
+    e carregando os links em lote. Técnico repetido (nome e Id do mesmo SR) vira ERROR.
+    """
+    resolved = resolve_service_resources_bulk(instance_url, headers, identifiers)
+
+    plans = {}
+    active = {}
+    for ident in identifiers:
+        sr = resolved.get(ident)
+        if isinstance(sr, Exception):
+            plans[ident] = {"status": "ERROR", "identifier": ident, "msg": str(sr)}
+            continue
+        if sr["id"] in active:
+            plans[ident] = {"status": "ERROR", "identifier": ident, "msg": f"técnico repetido (mesmo ServiceResource de '{active[sr['id']][0]}')"}
+            continue
+        sr, skip = ensure_active(instance_url, headers, ident, sr, ativar_inativo)
+        if skip:
+            plans[ident] = skip
+            continue
+        active[sr["id"]] = (ident, sr)
+
+    links_by_sr = list_current_skill_links_bulk(instance_url, headers, list(active))
+    for sr_id, (ident, sr) in active.items():
+        plans[ident] = build_plan(ident, sr, links_by_sr.get(sr_id, []))
+
+    return [plans[ident] for ident in identifiers]
 
 def compute_changes(mode: str, current_ids: set, desired_ids: set):
     if mode == "1":
@@ -690,11 +1425,7 @@ def print_preview(plan, group_name, mode, desired_id_to_label, color=True):
     to_remove, to_add = compute_changes(mode, plan["current_ids"], desired_ids)
 
     # map skillId->nome atual (pra remover com nome)
-    current_skillid_to_name = {}
-    for l in plan["current_links"]:
-        sid = l.get("SkillId")
-        if sid:
-            current_skillid_to_name[sid] = get_skill_label_from_link(l)
+    current_skillid_to_name = plan.current_skill_names
 
     mode_txt = {
         "1": "MODO 1 (não remove, só adiciona)",
@@ -711,11 +1442,12 @@ def print_preview(plan, group_name, mode, desired_id_to_label, color=True):
     box(title, lines, enabled=color, accent_code="96")
     hr(enabled=color)
 
-    print(bold(f"Skills atuais ({len(plan['current_names'])}):", color))
-    if not plan["current_names"]:
+    current_names = plan.current_names
+    print(bold(f"Skills atuais ({len(current_names)}):", color))
+    if not current_names:
         print("  - (nenhuma)")
     else:
-        for n in plan["current_names"]:
+        for n in current_names:
             print("  - " + ok(n, color))
 
     print(bold(f"\nVai remover ({len(to_remove)}):", color))
@@ -732,7 +1464,8 @@ def print_preview(plan, group_name, mode, desired_id_to_label, color=True):
         for sid in sorted(to_add):
             print("  - " + warn(desired_id_to_label.get(sid, sid), color))
 
-def execute(plan, instance_url, headers, mode, desired_id_to_label, skill_level):
+@perfil.fase("escrita")
+def execute(plan, instance_url, headers, mode, desired_id_to_label, skill_level, journal=None):
     if plan["status"] != "OK":
         return {"removed_ok": 0, "removed_fail": 0, "added_ok": 0, "added_fail": 0}
 
@@ -742,106 +1475,596 @@ def execute(plan, instance_url, headers, mode, desired_id_to_label, skill_level)
     removed_ok = removed_fail = 0
     added_ok = added_fail = 0
 
+    current_by_skillid = plan["current_by_skillid"]
     for sid in sorted(to_remove):
-        link_id = plan["current_by_skillid"].get(sid)
+        link_id = current_by_skillid.get(sid)
         if not link_id:
             continue
         try:
             delete_service_resource_skill(instance_url, headers, link_id)
             removed_ok += 1
-        except Exception:
+            journal_write(journal, "op", identifier=plan["identifier"], sr_id=plan["sr_id"], op="remover", skill_id=sid, ok=True)
+        except Exception as e:
             removed_fail += 1
+            journal_write(journal, "op", identifier=plan["identifier"], sr_id=plan["sr_id"], op="remover", skill_id=sid, ok=False, msg=str(e))
 
     for sid in sorted(to_add):
         try:
             create_service_resource_skill(instance_url, headers, plan["sr_id"], sid, skill_level=skill_level)
             added_ok += 1
-        except Exception:
+            journal_write(journal, "op", identifier=plan["identifier"], sr_id=plan["sr_id"], op="adicionar", skill_id=sid, ok=True)
+        except Exception as e:
             added_fail += 1
+            journal_write(journal, "op", identifier=plan["identifier"], sr_id=plan["sr_id"], op="adicionar", skill_id=sid, ok=False, msg=str(e))
 
     return {"removed_ok": removed_ok, "removed_fail": removed_fail, "added_ok": added_ok, "added_fail": added_fail}
 
-def create_api_app():
-    app = Flask(__name__)
+def plan_writes(items):
+    """
+    items = [(plan, mode, desired_ids), ...]
+    Retorna (deletes, inserts) do diff combinado: [(sr_id, link_id)], [(sr_id, skill_id)].
+    """
+    deletes = []
+    inserts = []
+    for plan, mode, desired_ids in items:
+        if plan["status"] != "OK":
+            continue
+        to_remove, to_add = compute_changes(mode, plan["current_ids"], desired_ids)
+        current_by_skillid = plan["current_by_skillid"] if to_remove else {}
+        for sid in sorted(to_remove):
+            link_id = current_by_skillid.get(sid)
+            if link_id:
+                deletes.append((plan["sr_id"], link_id))
+        for sid in sorted(to_add):
+            inserts.append((plan["sr_id"], sid))
+    return deletes, inserts
+
+def pick_backend(items, bulk_threshold) -> str:
+    """'bulk' (Bulk API 2.0) se o diff combinado passar do limite, senão 'rest' (sObject Collections)."""
+    if not bulk_threshold:
+        return "rest"
+    deletes, inserts = plan_writes(items)
+    return "bulk" if len(deletes) + len(inserts) >= bulk_threshold else "rest"
+
+@perfil.fase("escrita")
+def execute_batch(items, instance_url, headers, skill_level, backend="rest") -> dict:
+    """
+    items = [(plan, mode, desired_ids), ...]
+    Junta as remoções/adições de todos os técnicos num diff único e aplica em lote
+    (remoções primeiro, depois adições) pelo backend escolhido:
+      rest -> sObject Collections (200 por chamada) | bulk -> jobs do Bulk API 2.0
+    Retorna {sr_id: {"removed_ok", "removed_fail", "added_ok", "added_fail"}}.
+    """
+    if backend == "bulk":
+        delete_fn, create_fn = delete_service_resource_skills_bulk, create_service_resource_skills_bulk
+    else:
+        delete_fn, create_fn = delete_service_resource_skills_batch, create_service_resource_skills_batch
 
-    @app.after_request
-    def add_cors_headers(resp):
-        resp.headers["Access-Control-Allow-Origin"] = "*"
-        resp.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-        resp.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-        return resp
+    results = {
+        plan["sr_id"]: {"removed_ok": 0, "removed_fail": 0, "added_ok": 0, "added_fail": 0}
+        for plan, _, _ in items if plan["status"] == "OK"
+    }
+    deletes, inserts = plan_writes(items)
 
-    @app.route("/api/<path:_path>", methods=["OPTIONS"])
-    def api_options(_path):
-        return ("", 204)
+    if deletes:
+        outcome = delete_fn(instance_url, headers, [l for _, l in deletes])
+        for (sr_id, _), (success, _) in zip(deletes, outcome):
+            results[sr_id]["removed_ok" if success else "removed_fail"] += 1
 
-    @app.get("/api/health")
-    def health():
-        return jsonify({"ok": True})
+    if inserts:
+        outcome = create_fn(instance_url, headers, inserts, skill_level=skill_level)
+        for (sr_id, _), (success, _) in zip(inserts, outcome):
+            results[sr_id]["added_ok" if success else "added_fail"] += 1
 
-    @app.post("/api/tecnico/existe")
-    def tecnico_existe():
-        body = request.get_json(silent=True) or {}
-        email = (body.get("email") or "").strip()
-        if not email:
-            return jsonify({"result": False, "error": "Campo 'email' é obrigatório"}), 400
-        try:
-            instance_url, headers = sf_login_for_api()
-            sr = resolve_service_resource_by_email(instance_url, headers, email)
-            return jsonify({"result": bool(sr)})
-        except Exception as e:
-            return jsonify({"result": False, "error": str(e)}), 500
+    return results
 
-    @app.post("/api/grupo/adicionar")
-    def grupo_adicionar():
-        body = request.get_json(silent=True) or {}
-        email = (body.get("email") or "").strip()
-        grupo = (body.get("grupo") or "").strip()
-        skill_level = body.get("skill_level")
-        if not email or not grupo:
-            return jsonify({"result": False, "error": "Campos 'email' e 'grupo' são obrigatórios"}), 400
-        try:
-            instance_url, headers = sf_login_for_api()
-            sr = resolve_service_resource_by_email(instance_url, headers, email)
-            if not sr:
-                return jsonify({"result": False, "error": "Técnico não encontrado"}), 404
-            add_group_to_technician(instance_url, headers, sr["id"], grupo, skill_level=skill_level)
-            return jsonify({"result": True})
-        except Exception as e:
-            return jsonify({"result": False, "error": str(e)}), 500
+def count_status(plans) -> dict:
+    counts = {"OK": 0, "SKIP": 0, "ERROR": 0}
+    for p in plans:
+        counts[p["status"]] += 1
+    return counts
 
-    @app.post("/api/grupo/remover")
-    def grupo_remover():
-        body = request.get_json(silent=True) or {}
-        email = (body.get("email") or "").strip()
-        grupo = (body.get("grupo") or "").strip()
-        if not email or not grupo:
-            return jsonify({"result": False, "error": "Campos 'email' e 'grupo' são obrigatórios"}), 400
-        try:
-            instance_url, headers = sf_login_for_api()
-            sr = resolve_service_resource_by_email(instance_url, headers, email)
-            if not sr:
-                return jsonify({"result": False, "error": "Técnico não encontrado"}), 404
-            remove_group_from_technician(instance_url, headers, sr["id"], grupo)
-            return jsonify({"result": True})
-        except Exception as e:
-            return jsonify({"result": False, "error": str(e)}), 500
+def print_summary(counts: dict, dry_run: bool, color=True):
+    hr(enabled=color)
+    box(
+        "📊 RESUMO GERAL",
+        [
+            f"{badge('OK', 'ok', color)} elegíveis: {counts['OK']}",
+            f"{badge('SKIP', 'warn', color)}: {counts['SKIP']}",
+            f"{badge('ERRO', 'err', color)}: {counts['ERROR']}",
+            f"Dry-run: {'SIM' if dry_run else 'NÃO'}",
+        ],
+        enabled=color,
+        accent_code="95",
+    )
 
-    @app.get("/api/tecnico/consultar")
-    def tecnico_consultar():
-        email = (request.args.get("email") or "").strip()
-        if not email:
-            return jsonify({"result": False, "error": "Query param 'email' é obrigatório"}), 400
-        try:
-            instance_url, headers = sf_login_for_api()
-            sr = resolve_service_resource_by_email(instance_url, headers, email)
-            if not sr:
-                return jsonify({"result": False, "found": False})
-            consulta = consult_technician(instance_url, headers, sr["id"])
-            skills_nomes = consulta.get("skills", [])
-            return jsonify(
-                {
-                    "result": True,
+def print_result_line(plan, r, color=True):
+    print(ok(
+        f"✅ {plan['sr_name']} ({plan['sr_id']}) | removidas ok={r['removed_ok']} falhas={r['removed_fail']} | adicionadas ok={r['added_ok']} falhas={r['added_fail']}",
+        color
+    ))
+
+def print_final(results, color=True):
+    hr(enabled=color)
+    box(
+        "🏁 FINAL",
+        [
+            f"Remoções: ok={sum(r['removed_ok'] for r in results)} | falhas={sum(r['removed_fail'] for r in results)}",
+            f"Adições:  ok={sum(r['added_ok'] for r in results)} | falhas={sum(r['added_fail'] for r in results)}",
+        ],
+        enabled=color,
+        accent_code="95",
+    )
+    print(ok("\n✅ Concluído.", color))
+    print("\n" + bold(ok("🔥 TA MUITO FODA. ✔️", color), color))
+
+# =========================
+# SAÍDA (PRO interativa / jsonl / csv / resumo)
+# =========================
+OUTPUT_FIELDS = [
+    "tipo", "status", "identifier", "sr_id", "sr_name", "grupo", "modo", "atuais", "remover", "adicionar",
+    "removed_ok", "removed_fail", "added_ok", "added_fail", "ok", "skip", "erro", "dry_run", "msg",
+]
+
+class PrettyOutput:
+    """UI "PRO" (uso interativo): box, cores e prévia completa por técnico."""
+    machine = False
+
+    def __init__(self, color=True):
+        self.color = color
+
+    @perfil.fase("render")
+    def info(self, text: str):
+        print(text)
+
+    @perfil.fase("render")
+    def plan(self, plan, group_name, mode, desired_id_to_label):
+        print_preview(plan, group_name, mode, desired_id_to_label, color=self.color)
+
+    @perfil.fase("render")
+    def summary(self, counts: dict, dry_run: bool):
+        print_summary(counts, dry_run, color=self.color)
+
+    @perfil.fase("render")
+    def result(self, plan, r):
+        print_result_line(plan, r, self.color)
+
+    @perfil.fase("render")
+    def final(self, results):
+        print_final(results, self.color)
+
+    def close(self):
+        pass
+
+class MachineOutput:
+    """
+    Saída para lotes grandes / pipelines: 1 registro compacto por plano e por resultado,
+    num writer com buffer grande (sem box, sem cor, sem term_width por linha).
+      jsonl  -> 1 JSON por linha
+      csv    -> colunas OUTPUT_FIELDS (listas separadas por |)
+      resumo -> só os registros 'resumo' e 'final' (JSONL)
+    Mensagens de progresso vão para o stderr.
+    """
+    machine = True
+
+    def __init__(self, fmt: str, path: Optional[str] = None, buffer_size: int = 1 << 20):
+        self.fmt = fmt
+        self.path = path
+        if path:
+            self.f = open(path, "w", encoding="utf-8", newline="", buffering=buffer_size)
+        else:
+            self.f = open(sys.stdout.fileno(), "w", encoding="utf-8", newline="", buffering=buffer_size, closefd=False)
+        self.csv = None
+        if fmt == "csv":
+            self.csv = csv.DictWriter(self.f, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+            self.csv.writeheader()
+
+    def emit(self, rec: dict):
+        if self.csv:
+            self.csv.writerow({k: "|".join(v) if isinstance(v, list) else v for k, v in rec.items()})
+        else:
+            self.f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    @perfil.fase("render")
+    def info(self, text: str):
+        print(text, file=sys.stderr)
+
+    @perfil.fase("render")
+    def plan(self, plan, group_name, mode, desired_id_to_label):
+        if self.fmt == "resumo":
+            return
+        rec = {
+            "tipo": "plano",
+            "status": plan["status"],
+            "identifier": plan["identifier"],
+            "sr_id": plan.get("sr_id"),
+            "sr_name": plan.get("sr_name"),
+            "grupo": group_name,
+            "modo": mode,
+        }
+        if plan["status"] == "OK":
+            to_remove, to_add = compute_changes(mode, plan["current_ids"], set(desired_id_to_label))
+            names = plan.current_skill_names
+            rec["atuais"] = len(plan.skills) + len(plan.extra_names or ())
+            rec["remover"] = [names.get(sid, sid) for sid in sorted(to_remove)]
+            rec["adicionar"] = [desired_id_to_label.get(sid, sid) for sid in sorted(to_add)]
+        else:
+            rec["msg"] = plan.get("msg")
+        self.emit(rec)
+
+    @perfil.fase("render")
+    def summary(self, counts: dict, dry_run: bool):
+        self.emit({"tipo": "resumo", "ok": counts["OK"], "skip": counts["SKIP"], "erro": counts["ERROR"], "dry_run": bool(dry_run)})
+
+    @perfil.fase("render")
+    def result(self, plan, r):
+        if self.fmt == "resumo":
+            return
+        self.emit({"tipo": "resultado", "identifier": plan["identifier"], "sr_id": plan["sr_id"], "sr_name": plan["sr_name"], **r})
+
+    @perfil.fase("render")
+    def final(self, results):
+        self.emit({"tipo": "final", **{k: sum(r[k] for r in results) for k in ("removed_ok", "removed_fail", "added_ok", "added_fail")}})
+
+    def close(self):
+        self.f.flush()
+        if self.path:
+            self.f.close()
+
+def use_color(args) -> bool:
+    """Cor só na saída "pro": nas de máquina as mensagens vão para o stderr, que costuma virar log."""
+    return not args.sem_cor and args.saida == "pro"
+
+def make_output(args, color=True):
+    if args.saida == "pro":
+        return PrettyOutput(color)
+    return MachineOutput(args.saida, args.saida_arquivo)
+
+# =========================
+# JOURNAL (checkpoint p/ --retomar)
+# =========================
+JOURNAL_DEFAULT = "ensure_skill_journal.jsonl"
+
+def journal_open(path: str):
+    return open(path, "a", encoding="utf-8")
+
+@perfil.fase("journal")
+def journal_write(f, tipo: str, **fields):
+    """Append de 1 registro (JSONL) com flush+fsync: sobrevive a queda de rede, Ctrl-C ou crash."""
+    if f is None:
+        return
+    rec = {"tipo": tipo, "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"), **fields}
+    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+def load_journal_run(path: str) -> Optional[dict]:
+    """
+    Lê o journal e devolve a ÚLTIMA execução registrada:
+      {"inicio": registro 'inicio', "finished": {identifier, ...}}
+    'finished' = técnicos com registro 'fim' (todas as operações ok).
+    """
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # última linha cortada pelo crash
+            if rec.get("tipo") == "inicio":
+                last = {"inicio": rec, "finished": set()}
+            elif last and rec.get("tipo") == "fim":
+                last["finished"].add(rec.get("identifier"))
+    return last
+
+def journal_finish(journal, plan, r):
+    if r["removed_fail"] or r["added_fail"]:
+        return  # fica pendente: o --retomar re-planeja e tenta de novo
+    journal_write(journal, "fim", identifier=plan["identifier"], sr_id=plan["sr_id"])
+
+# =========================
+# PLANO SALVO (--salvar-plano / --executar-plano)
+# =========================
+PLAN_FILE_VERSION = 1
+
+def save_plan_file(path: str, instance_url: str, group_name: str, mode: str, desired_id_to_label: dict,
+                   skill_level, plans: list):
+    """
+    Grava a prévia (--dry-run --salvar-plano) para aplicar depois com --executar-plano.
+    Cada técnico OK leva os links lidos, a "impressão digital" deles (nº de links +
+    maior SystemModstamp) e o que vai ser removido/adicionado (Skill Ids).
+    """
+    desired_ids = set(desired_id_to_label)
+    tecnicos, ignorados = [], []
+    for p in plans:
+        if p["status"] != "OK":
+            ignorados.append({"identifier": p["identifier"], "status": p["status"], "msg": p.get("msg", "")})
+            continue
+        to_remove, to_add = compute_changes(mode, p["current_ids"], desired_ids)
+        tecnicos.append({
+            "identifier": p["identifier"],
+            "sr_id": p["sr_id"],
+            "sr_name": p["sr_name"],
+            "links": [[l["Id"], l["SkillId"], l["Skill"]["MasterLabel"]] for l in p["current_links"]],
+            "n_links": p.n_links,
+            "modstamp": p.modstamp,
+            "remover": sorted(to_remove),
+            "adicionar": sorted(to_add),
+        })
+    data = {
+        "versao": PLAN_FILE_VERSION,
+        "criado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "instance_url": instance_url,
+        "grupo": group_name,
+        "modo": mode,
+        "skills": desired_id_to_label,
+        "skill_level": skill_level,
+        "tecnicos": tecnicos,
+        "ignorados": ignorados,
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+def load_plan_file(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ Não consegui ler o plano {path}: {e}")
+    if data.get("versao") != PLAN_FILE_VERSION:
+        raise SystemExit(f"❌ Plano {path} em formato desconhecido (versão {data.get('versao')}). Gere de novo com --dry-run --salvar-plano.")
+    return data
+
+def plan_from_saved(t: dict) -> TechPlan:
+    links = [{"Id": lid, "SkillId": sid, "Skill": {"MasterLabel": label}} for lid, sid, label in t["links"]]
+    plan = build_plan(t["identifier"], {"id": t["sr_id"], "name": t["sr_name"]}, links)
+    plan.modstamp = t["modstamp"]
+    return plan
+
+class TecnicoNaoEncontrado(Exception):
+    """Nenhum ServiceResource com o e-mail pedido (a API responde 404)."""
+
+def apply_group_change(email, grupo, acao, skill_level=None, writes=None):
+    """Adiciona/remove um grupo de 1 técnico (por e-mail). Usado pela API síncrona e pelos jobs."""
+    instance_url, headers = sf_login_for_api()
+    ctx = load_technician_context(instance_url, headers, email)
+    sr = ctx["sr"]
+    if not sr:
+        raise TecnicoNaoEncontrado("Técnico não encontrado")
+    if acao == "adicionar":
+        add_group_to_technician(instance_url, headers, sr["id"], grupo, skill_level=skill_level,
+                                current_links=ctx["links"], all_skills=ctx["all_skills"], writes=writes)
+    else:
+        remove_group_from_technician(instance_url, headers, sr["id"], grupo,
+                                     current_links=ctx["links"], all_skills=ctx["all_skills"], writes=writes)
+    return {"tecnico": sr["id"], "nome": sr["name"]}
+
+class DeadlineMiddleware:
+    """
+    WSGI: cada requisição roda com um prazo (X-Deadline-Ms do cliente, senão o padrão,
+    limitado a API_DEADLINE_MAX_MS). Login, contexto, catálogo, paginação e escritas
+    usam o que sobra como timeout; acabou, a requisição responde 504 na hora.
+    """
+
+    def __init__(self, app, default_ms: float = API_DEADLINE_MS, max_ms: float = API_DEADLINE_MAX_MS):
+        self.app = app
+        self.default_ms = default_ms
+        self.max_ms = max_ms
+
+    def budget_ms(self, environ) -> float:
+        try:
+            ms = float(environ.get("HTTP_X_DEADLINE_MS") or 0)
+        except ValueError:
+            ms = 0
+        if ms <= 0:
+            ms = self.default_ms
+        return min(ms, self.max_ms)
+
+    def __call__(self, environ, start_response):
+        ms = self.budget_ms(environ)
+        if ms <= 0:
+            return self.app(environ, start_response)
+        sf_trace.current().set(prazo_ms=ms)
+        with sf_http.deadline(ms / 1000.0):
+            return self.app(environ, start_response)
+
+class MemoMiddleware:
+    """
+    WSGI: cada requisição tem o seu escopo de memo (memo.scope): consultas repetidas
+    dentro dela (resolução, catálogo, links) vão ao Salesforce 1 vez só. Nada passa
+    de uma requisição para outra; escritas invalidam o que tocam.
+    """
+
+    def __init__(self, app, ttl: float = MEMO_TTL):
+        self.app = app
+        self.ttl = ttl
+
+    def __call__(self, environ, start_response):
+        if self.ttl <= 0:
+            return self.app(environ, start_response)
+        with memo.scope(self.ttl):
+            return self.app(environ, start_response)
+
+class TraceMiddleware:
+    """
+    WSGI: cada requisição vira o span raiz (server) do seu trace, com método, caminho e
+    status; login, consultas, páginas e escritas feitas por ela aparecem como filhos.
+    Um traceparent (W3C) do cliente vira o pai, para juntar com o trace de quem chamou.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        if sf_trace.ACTIVE is None:
+            return self.app(environ, start_response)
+        method = environ.get("REQUEST_METHOD", "")
+        path = environ.get("PATH_INFO", "")
+        remote = sf_trace.parse_traceparent(environ.get("HTTP_TRACEPARENT"))
+        with sf_trace.span(f"{method} {path}", "server", {"http.method": method, "http.target": path},
+                           remote=remote) as span:
+            def traced_start_response(status, headers, exc_info=None):
+                code = int(status.split(" ", 1)[0])
+                span.set({"http.status_code": code})
+                if code >= 500:
+                    span.error(status)
+                return start_response(status, headers, exc_info)
+            return self.app(environ, traced_start_response)
+
+def deadline_response(e):
+    return jsonify({"result": False, "error": f"Prazo da requisição esgotado: {e}"}), 504
+
+def create_api_app(job_queue=None, writes=None, deadline_ms=None, memo_ttl=None):
+    app = Flask(__name__)
+    app.wsgi_app = MemoMiddleware(app.wsgi_app, MEMO_TTL if memo_ttl is None else memo_ttl)
+    app.wsgi_app = TraceMiddleware(DeadlineMiddleware(app.wsgi_app, API_DEADLINE_MS if deadline_ms is None else deadline_ms))
+    if job_queue is None and os.getenv("SF_JOBS_DB"):
+        # sem servidor fixo (ex.: Vercel) só há fila com SQLite; senão o modo assíncrono fica desligado
+        job_queue = JobQueue(make_store(os.getenv("SF_JOBS_DB")), workers=int(os.getenv("SF_JOB_WORKERS", "4")))
+    if writes is None:
+        writes = WriteCoalescer(write_coalesced, max_wait=COALESCE_MS / 1000.0, max_items=COLLECTION_CHUNK,
+                                budget=sf_http.remaining, detach=sf_http.detached)
+    app.job_queue = job_queue
+    app.writes = writes
+
+    @app.after_request
+    def add_cors_headers(resp):
+        resp.headers["Access-Control-Allow-Origin"] = "*"
+        resp.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Deadline-Ms, traceparent"
+        resp.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        return resp
+
+    @app.route("/api/<path:_path>", methods=["OPTIONS"])
+    def api_options(_path):
+        return ("", 204)
+
+    @app.get("/api/health")
+    def health():
+        return jsonify({"ok": True, "limitador": sf_http.limiter_stats(), "coalescedor": writes.stats(),
+                        "leituras": READS.stats(),
+                        "hedge": sf_http.hedge_stats(), "trace": sf_trace.stats(),
+                        "cassete": sf_replay.stats(), "memo": memo.stats(),
+                        "assincrono": job_queue is not None})
+
+    @app.post("/api/tecnico/existe")
+    def tecnico_existe():
+        body = request.get_json(silent=True) or {}
+        email = (body.get("email") or "").strip()
+        if not email:
+            return jsonify({"result": False, "error": "Campo 'email' é obrigatório"}), 400
+        try:
+            instance_url, headers = sf_login_for_api()
+            ctx = load_technician_context(instance_url, headers, email, with_links=False, with_catalog=False)
+            return jsonify({"result": bool(ctx["sr"])})
+        except TimeoutError as e:
+            return deadline_response(e)
+        except Exception as e:
+            return jsonify({"result": False, "error": str(e)}), 500
+
+    def group_job_item(body):
+        email = (body.get("email") or "").strip()
+        grupo = (body.get("grupo") or "").strip()
+        if not email or not grupo:
+            raise ValueError("Campos 'email' e 'grupo' são obrigatórios")
+        if grupo not in GROUPS_MAP:
+            raise ValueError(f"Grupo inválido: {grupo}")
+        return {"email": email, "grupo": grupo, "skill_level": body.get("skill_level")}
+
+    def async_disabled():
+        return jsonify({"result": False, "error": "Modo assíncrono desligado neste servidor "
+                        "(precisa do servidor --api ou de SF_JOBS_DB); mande sem 'assincrono'"}), 501
+
+    def enqueue(tipo, items, acao=None):
+        if job_queue is None:
+            return async_disabled()
+        run_item = (lambda item: apply_group_change(item["email"], item["grupo"], acao or item["acao"],
+                                                    item.get("skill_level"), writes=writes))
+        try:
+            job_id = job_queue.submit(tipo, items, run_item)
+        except QueueFull as e:
+            return jsonify({"result": False, "error": str(e)}), 503
+        return jsonify({"result": True, "job_id": job_id, "status": f"/api/jobs/{job_id}"}), 202
+
+    def group_endpoint(acao):
+        body = request.get_json(silent=True) or {}
+        try:
+            item = group_job_item(body)
+        except ValueError as e:
+            return jsonify({"result": False, "error": str(e)}), 400
+        if body.get("assincrono"):
+            return enqueue(f"grupo/{acao}", [item], acao)
+        try:
+            apply_group_change(item["email"], item["grupo"], acao, item["skill_level"], writes=writes)
+            return jsonify({"result": True})
+        except TecnicoNaoEncontrado as e:
+            return jsonify({"result": False, "error": str(e)}), 404
+        except TimeoutError as e:
+            return deadline_response(e)
+        except Exception as e:
+            return jsonify({"result": False, "error": str(e)}), 500
+
+    @app.post("/api/grupo/adicionar")
+    def grupo_adicionar():
+        return group_endpoint("adicionar")
+
+    @app.post("/api/grupo/remover")
+    def grupo_remover():
+        return group_endpoint("remover")
+
+    @app.post("/api/grupo/lote")
+    def grupo_lote():
+        if job_queue is None:
+            return async_disabled()
+        body = request.get_json(silent=True) or {}
+        itens = body.get("itens")
+        if not isinstance(itens, list) or not itens:
+            return jsonify({"result": False, "error": "Campo 'itens' (lista) é obrigatório"}), 400
+        items = []
+        try:
+            for i, raw in enumerate(itens, start=1):
+                if not isinstance(raw, dict):
+                    raise ValueError(f"Item {i}: esperado objeto")
+                acao = (raw.get("acao") or body.get("acao") or "").strip()
+                if acao not in ("adicionar", "remover"):
+                    raise ValueError(f"Item {i}: 'acao' deve ser 'adicionar' ou 'remover'")
+                try:
+                    item = group_job_item({"skill_level": body.get("skill_level"), **raw})
+                except ValueError as e:
+                    raise ValueError(f"Item {i}: {e}")
+                items.append({**item, "acao": acao})
+        except ValueError as e:
+            return jsonify({"result": False, "error": str(e)}), 400
+        return enqueue("grupo/lote", items)
+
+    @app.get("/api/jobs/<job_id>")
+    def job_status(job_id):
+        if job_queue is None:
+            return async_disabled()
+        job = job_queue.get(job_id)
+        if not job:
+            return jsonify({"result": False, "error": "Job não encontrado"}), 404
+        return jsonify({"result": True, "job": job})
+
+    @app.get("/api/tecnico/consultar")
+    def tecnico_consultar():
+        email = (request.args.get("email") or "").strip()
+        if not email:
+            return jsonify({"result": False, "error": "Query param 'email' é obrigatório"}), 400
+        try:
+            instance_url, headers = sf_login_for_api()
+            ctx = load_technician_context(instance_url, headers, email)
+            sr = ctx["sr"]
+            if not sr:
+                return jsonify({"result": False, "found": False})
+            consulta = summarize_technician(ctx["links"], ctx["all_skills"])
+            skills_nomes = consulta.get("skills", [])
+            return jsonify(
+                {
+                    "result": True,
                     "found": True,
                     "tecnico": {
                         "id": sr["id"],
@@ -852,24 +2075,192 @@ def create_api_app():
                     "skills": skills_nomes,
                 }
             )
+        except TimeoutError as e:
+            return deadline_response(e)
         except Exception as e:
             return jsonify({"result": False, "error": str(e)}), 500
 
     return app
 
-def run_rest_api(host: str, port: int):
-    app = create_api_app()
-    app.run(host=host, port=port, debug=False)
+class KeepAliveHandler(WSGIRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # com conexões na fila, quanto a keep-alive pode ficar ociosa antes de liberar a thread
+    idle_grace = 0.05
 
+    def handle_one_request(self):
+        super().handle_one_request()
+        if not self.close_connection and self.server.waiting():
+            ready, _, _ = select.select([self.connection], [], [], self.idle_grace)
+            if not ready:
+                self.close_connection = True
 
-def main(args):
-    color = not args.sem_cor
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    Servidor WSGI do werkzeug com pool FIXO de threads (o dev server cria 1 thread por conexão).
+    Conexões keep-alive (HTTP/1.1) ficam abertas até `keepalive` segundos ociosas, mas só
+    enquanto ninguém espera: com fila, a conexão que fica ociosa por idle_grace depois da
+    resposta é fechada e a thread passa para a próxima. Mais de `queue` conexões esperando
+    thread: a nova recebe 503 na hora.
+    """
+    multithread = True
+
+    def __init__(self, host, port, app, threads=8, keepalive=5.0, backlog=128, queue=None, fd=None):
+        handler = type("KeepAliveHandler", (KeepAliveHandler,), {"timeout": keepalive})
+        self.request_queue_size = backlog
+        super().__init__(host, port, app, handler=handler, fd=fd)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="api")
+        self.max_queue = queue or 4 * threads
+        self.queued = 0
+        self.shed = 0
+        self.queue_lock = threading.Lock()
+
+    def waiting(self) -> bool:
+        return self.queued > 0
+
+    def process_request(self, request, client_address):
+        with self.queue_lock:
+            full = self.queued >= self.max_queue
+            if full:
+                self.shed += 1
+            else:
+                self.queued += 1
+        if full:
+            self.reject(request)
+            return
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def reject(self, request):
+        """503 sem passar pelo pool (a thread que aceita conexões não pode ficar presa aqui)."""
+        body = b'{"result": false, "error": "Servidor ocupado, tente de novo"}'
+        try:
+            request.setblocking(False)
+            try:
+                request.recv(65536)  # lê o que já chegou: fechar com dados não lidos vira RST no cliente
+            except OSError:
+                pass
+            request.settimeout(1.0)
+            request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+                            b"Retry-After: 1\r\nConnection: close\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def process_request_thread(self, request, client_address):
+        with self.queue_lock:
+            self.queued -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self):
+        """Para de aceitar conexões e espera as requisições em andamento terminarem."""
+        self.server_close()
+        self.pool.shutdown(wait=True)
+        if self.shed:
+            print(f"[{os.getpid()}] {self.shed} conexão(ões) recusada(s) com 503 (fila cheia)", file=sys.stderr)
+
+def warm_up_api():
+    """Estado quente por worker: pool HTTP novo (nada herdado do fork) + login antecipado."""
+    sf_http.reset_session()
+    try:
+        sf_login_for_api()
+    except Exception as e:
+        print(warn(f"⚠ Aquecimento: login falhou ({e}); tenta de novo na 1ª requisição.", True), file=sys.stderr)
 
-    big_header(
-        app_name="ENSURE MANUTENÇÃO SKILL",
-        subtitle="Aplicador de Skills (ServiceResourceSkill) - Desktop Salesforce",
-        enabled=color,
-    )
+def serve_worker(app, host, port, threads, keepalive, backlog, queue=None, fd=None):
+    server = PooledWSGIServer(host, port, app, threads=threads, keepalive=keepalive, backlog=backlog, queue=queue, fd=fd)
+    warm_up_api()
+
+    def stop(signum, frame):
+        # shutdown() espera o serve_forever sair: não pode rodar na mesma thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"[{os.getpid()}] API em http://{host}:{port} | threads={threads} keep-alive={keepalive}s "
+          f"fila={server.max_queue}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.drain()
+        app.job_queue.shutdown(wait=True)
+        print(f"[{os.getpid()}] encerrado", file=sys.stderr)
+        sf_log.shutdown()
+
+def run_rest_api(host: str, port: int, producao=False, threads=8, processos=1, keepalive=5.0, backlog=128, fila=None,
+                 jobs_db=None, job_workers=4, coalesce_ms=COALESCE_MS, deadline_ms=API_DEADLINE_MS, memo_ttl=MEMO_TTL):
+    jobs_db = jobs_db or os.getenv("SF_JOBS_DB")
+    if producao and processos > 1 and not jobs_db:
+        print(warn("⚠ Jobs em memória com --processos > 1: o status só é visto pelo processo que criou o job. "
+                   "Use --jobs-db jobs.db.", True), file=sys.stderr)
+    app = create_api_app(JobQueue(make_store(jobs_db), workers=job_workers),
+                         WriteCoalescer(write_coalesced, max_wait=coalesce_ms / 1000.0, max_items=COLLECTION_CHUNK,
+                                        budget=sf_http.remaining, detach=sf_http.detached),
+                         deadline_ms=deadline_ms, memo_ttl=memo_ttl)
+    if not producao:
+        app.run(host=host, port=port, debug=False)
+        return
+
+    sf_http.configure(pool_size=max(threads, 10))
+
+    if processos <= 1 or not hasattr(os, "fork"):
+        if processos > 1:
+            print(warn("⚠ --processos > 1 exige fork (Linux/macOS); usando 1 processo.", True), file=sys.stderr)
+        serve_worker(app, host, port, threads, keepalive, backlog, fila)
+        return
+
+    # pre-fork: o pai abre o socket e os filhos aceitam conexões no mesmo fd
+    sock = socket.create_server((host, port), backlog=backlog, reuse_port=False)
+    children = []
+    for _ in range(processos):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serve_worker(app, host, port, threads, keepalive, backlog, fila, fd=sock.fileno())
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for pid in children:
+        while True:
+            try:
+                os.waitpid(pid, 0)
+                break
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+    sock.close()
+
+
+def main(args):
+    color = use_color(args)
+    out = make_output(args, color)
+    try:
+        run_main(args, out, color)
+    finally:
+        out.close()
+
+def run_main(args, out, color):
+    if not out.machine:
+        big_header(
+            app_name="ENSURE MANUTENÇÃO SKILL",
+            subtitle="Aplicador de Skills (ServiceResourceSkill) - Desktop Salesforce",
+            enabled=color,
+        )
 
     # montar lista de técnicos
     identifiers = []
@@ -891,24 +2282,49 @@ def main(args):
         dedup.append(x)
     identifiers = dedup
 
+    # --retomar: continua a última execução do journal (mesmo grupo/modo/skills)
+    resume = None
+    if args.retomar:
+        resume = load_journal_run(args.journal)
+        if not resume:
+            raise SystemExit(f"❌ Nada para retomar: journal vazio/inexistente ({args.journal}).")
+        if not identifiers:
+            identifiers = list(resume["inicio"].get("identifiers") or [])
+        # grupo/modo vêm do journal: um --grupo/--modo diferente na linha de comando não pode ser ignorado
+        if ((args.grupo and normalize_group_name(args.grupo) != resume["inicio"]["grupo"])
+                or (args.modo and args.modo != resume["inicio"]["modo"])):
+            raise SystemExit("❌ O journal é de outra execução (grupo/modo diferentes).")
+
     if not identifiers:
         raise SystemExit("❌ Nenhum técnico informado. Use --id-ou-nome, --ids-ou-nomes ou --arquivo.")
 
+    if out.machine and not resume and not (args.grupo and args.modo):
+        raise SystemExit("❌ --saida jsonl/csv/resumo não pergunta nada: informe --grupo e --modo.")
+
     instance_url, headers = sf_login_or_die()
+    use_name_index(identifiers)
+
+    # vai perguntar algo: resolução e links dos técnicos já começam em segundo plano
+    prefetch = None
+    if not out.machine and not resume and not (args.grupo and args.modo and not args.selecionar_skills):
+        prefetch = Prefetch(instance_url, headers, identifiers, workers=max(4, PARALLEL))
+    try:
+        plan_prompts_and_apply(args, out, color, instance_url, headers, identifiers, resume, prefetch)
+    finally:
+        if prefetch is not None:
+            prefetch.close()
 
+def plan_prompts_and_apply(args, out, color, instance_url, headers, identifiers, resume, prefetch):
     # carrega skills 1x (pra resolver MasterLabel -> Id)
     all_skills = list_all_skills(instance_url, headers, limit=2000)
     label_to_id = build_label_to_id(all_skills)
     groups_resolved, missing = build_groups_resolved(label_to_id)
 
     # resolve grupo
-    group_name = args.grupo
+    group_name = resume["inicio"]["grupo"] if resume else args.grupo
     if group_name:
         # aceita número
-        if group_name.isdigit():
-            idx = int(group_name)
-            if 1 <= idx <= len(GROUP_ORDER):
-                group_name = GROUP_ORDER[idx - 1]
+        group_name = normalize_group_name(group_name)
         if group_name not in GROUPS_MAP:
             raise SystemExit("❌ Grupo inválido. Use --listar-grupos para ver os válidos.")
     else:
@@ -921,92 +2337,381 @@ def main(args):
 
     # mostra também as do mapa que não bateram com MasterLabel da org
     if missing.get(group_name):
-        print("\n" + warn("⚠ Atenção: essas skills estão no seu GROUPS_MAP, mas NÃO existem na org (MasterLabel diferente).", color))
+        out.info("\n" + warn("⚠ Atenção: essas skills estão no seu GROUPS_MAP, mas NÃO existem na org (MasterLabel diferente).", color))
         for m in missing[group_name]:
-            print("  - " + warn(m, color))
+            out.info("  - " + warn(m, color))
 
-    chosen_resolved = choose_subset_once_if_enabled(
-        group_name=group_name,
-        resolved_list=resolved_list,
-        enable=args.selecionar_skills,
-        color=color
-    )
+    if resume:
+        chosen_resolved = [x for x in resolved_list if x["id"] in set(resume["inicio"]["skills"])]
+    elif out.machine:
+        chosen_resolved = resolved_list
+    else:
+        chosen_resolved = choose_subset_once_if_enabled(
+            group_name=group_name,
+            resolved_list=resolved_list,
+            enable=args.selecionar_skills,
+            color=color
+        )
     if not chosen_resolved:
         raise SystemExit("❌ Nenhuma skill aplicável encontrada para esse grupo (todas faltando na org?).")
 
     desired_id_to_label = {x["id"]: x["label"] for x in chosen_resolved}
 
     # modo
-    mode = args.modo or choose_mode(color=color)
+    mode = resume["inicio"]["modo"] if resume else (args.modo or choose_mode(color=color))
     if mode not in ("1", "2", "3"):
         raise SystemExit("❌ Modo inválido. Use 1, 2 ou 3.")
 
-    print("\n" + bold(f"📌 Ação: aplicar '{group_name}' em {len(identifiers)} técnico(s).", color))
-    print(bold("Gerando prévia por técnico...", color))
+    if resume:
+        done = [x for x in identifiers if x in resume["finished"]]
+        identifiers = [x for x in identifiers if x not in resume["finished"]]
+        out.info("\n" + ok(f"↩️  Retomando '{group_name}' (modo {mode}): {len(done)} técnico(s) já concluído(s), faltam {len(identifiers)}.", color))
+        if not identifiers:
+            out.info(ok("\n✅ Nada pendente no journal.", color))
+            return
+
+    out.info("\n" + bold(f"📌 Ação: aplicar '{group_name}' em {len(identifiers)} técnico(s).", color))
+    out.info(bold("Gerando prévia por técnico...", color))
 
     plans = []
     for ident in identifiers:
-        p = plan_one(instance_url, headers, ident, ativar_inativo=args.ativar_inativo)
+        p = plan_one(instance_url, headers, ident, ativar_inativo=args.ativar_inativo,
+                     prefetched=prefetch.take(ident) if prefetch else None)
         plans.append(p)
-        print_preview(p, group_name, mode, desired_id_to_label, color=color)
+        out.plan(p, group_name, mode, desired_id_to_label)
 
     ok_plans = [p for p in plans if p["status"] == "OK"]
-    skip_plans = [p for p in plans if p["status"] == "SKIP"]
-    err_plans = [p for p in plans if p["status"] == "ERROR"]
+    out.summary(count_status(plans), args.dry_run)
 
-    hr(enabled=color)
-    box(
-        "📊 RESUMO GERAL",
-        [
-            f"{badge('OK', 'ok', color)} elegíveis: {len(ok_plans)}",
-            f"{badge('SKIP', 'warn', color)}: {len(skip_plans)}",
-            f"{badge('ERRO', 'err', color)}: {len(err_plans)}",
-            f"Dry-run: {'SIM' if args.dry_run else 'NÃO'}",
-        ],
-        enabled=color,
-        accent_code="95",
-    )
+    if args.dry_run:
+        if args.salvar_plano:
+            save_plan_file(args.salvar_plano, instance_url, group_name, mode, desired_id_to_label, args.skill_level, plans)
+            out.info(ok(f"\n💾 Plano salvo em {args.salvar_plano}: aplique com --executar-plano {args.salvar_plano}", color))
+        out.info(warn("\n[DRY-RUN] Nada foi alterado no Salesforce (só prévia).", color))
+        return
+
+    apply_plans(args, out, color, instance_url, headers, ok_plans, group_name, mode, desired_id_to_label,
+                identifiers, args.skill_level, resume=resume)
+
+def apply_plans(args, out, color, instance_url, headers, ok_plans, group_name, mode, desired_id_to_label,
+                identifiers, skill_level, resume=None, confirmed=False):
+    """Confirmação (SIM), journal e execução (REST ou Bulk) dos planos OK."""
+    if not ok_plans:
+        out.info(warn("\nNada para aplicar (ninguém elegível).", color))
+        return
+
+    if not confirmed:
+        confirm = ask(f"\nDigite SIM para EXECUTAR em {len(ok_plans)} técnico(s): ",
+                      stream=sys.stderr if out.machine else None).strip().lower()
+        if confirm != "sim":
+            out.info(err("❌ Cancelado.", color))
+            return
+
+    journal = journal_open(args.journal)
+    if not resume:
+        journal_write(journal, "inicio", grupo=group_name, modo=mode, skills=sorted(desired_id_to_label), identifiers=identifiers)
+
+    results = []
+    try:
+        items = [(p, mode, set(desired_id_to_label)) for p in ok_plans]
+        for p, _, desired_ids in items:
+            to_remove, to_add = compute_changes(mode, p["current_ids"], desired_ids)
+            journal_write(journal, "plano", identifier=p["identifier"], sr_id=p["sr_id"],
+                          to_remove=sorted(to_remove), to_add=sorted(to_add))
+
+        if pick_backend(items, args.bulk_acima) == "bulk":
+            out.info("\n" + bold("🚀 Executando via Bulk API 2.0...", color))
+            by_sr = execute_batch(items, instance_url, headers, skill_level, backend="bulk")
+            for p in ok_plans:
+                r = by_sr[p["sr_id"]]
+                results.append(r)
+                journal_write(journal, "lote", identifier=p["identifier"], sr_id=p["sr_id"], **r)
+                journal_finish(journal, p, r)
+                out.result(p, r)
+        else:
+            out.info("\n" + bold("🚀 Executando...", color))
+            for p in ok_plans:
+                r = execute(p, instance_url, headers, mode, desired_id_to_label, skill_level, journal=journal)
+                results.append(r)
+                journal_finish(journal, p, r)
+                out.result(p, r)
+    except KeyboardInterrupt:
+        out.info(err(f"\n⛔ Interrompido. O progresso está no journal: rode de novo com --retomar ({args.journal}).", color))
+        raise SystemExit(130)
+    finally:
+        journal.close()
+
+    out.final(results)
+
+def main_executar_plano(args):
+    """
+    Aplica um plano salvo com --dry-run --salvar-plano sem refazer a resolução nem
+    reler os links: 1 query agregada confere, por técnico, se os links mudaram desde
+    o plano (nº de links + maior SystemModstamp); só quem mudou é re-planejado.
+    """
+    color = use_color(args)
+    out = make_output(args, color)
+    try:
+        run_saved_plan(args, out, color)
+    finally:
+        out.close()
+
+def run_saved_plan(args, out, color):
+    saved = load_plan_file(args.executar_plano)
+    instance_url, headers = sf_login_or_die()
+    if saved.get("instance_url") != instance_url:
+        raise SystemExit(f"❌ O plano foi gerado em outra org ({saved.get('instance_url')}); esta é {instance_url}.")
+
+    group_name, mode = saved["grupo"], saved["modo"]
+    desired_id_to_label = saved["skills"]
+    tecnicos = saved["tecnicos"]
+    skill_level = args.skill_level if args.skill_level is not None else saved.get("skill_level")
+    out.info("\n" + bold(f"📄 Plano de {saved['criado_em']}: '{group_name}' (modo {mode}) em {len(tecnicos)} técnico(s).", color))
+    if saved.get("ignorados"):
+        out.info(warn(f"   ({len(saved['ignorados'])} técnico(s) já estavam SKIP/ERRO na prévia e ficam de fora)", color))
+    if not tecnicos:
+        out.info(warn("\nNada para aplicar (ninguém elegível).", color))
+        return
+
+    current = link_fingerprints_bulk(instance_url, headers, [t["sr_id"] for t in tecnicos])
+    stale = [t for t in tecnicos if current.get(t["sr_id"], (0, "")) != (t["n_links"], t["modstamp"])]
+    replanned = {}
+    if stale:
+        out.info(warn(f"🔎 {len(stale)} técnico(s) mudaram desde o plano: re-planejando só esses "
+                      f"({len(tecnicos) - len(stale)} sem mudança).", color))
+        for t, p in zip(stale, plan_many(instance_url, headers, [t["sr_id"] for t in stale], args.ativar_inativo)):
+            if isinstance(p, TechPlan):
+                p.identifier = t["identifier"]
+            else:
+                p["identifier"] = t["identifier"]
+            replanned[t["sr_id"]] = p
+    else:
+        out.info(ok(f"🔎 Nenhum técnico mudou desde o plano ({len(tecnicos)} conferido(s)).", color))
+
+    plans = []
+    for t in tecnicos:
+        p = replanned.get(t["sr_id"]) or plan_from_saved(t)
+        plans.append(p)
+        if t["sr_id"] in replanned:
+            out.plan(p, group_name, mode, desired_id_to_label)
+
+    ok_plans = [p for p in plans if p["status"] == "OK"]
+    out.summary(count_status(plans), args.dry_run)
+    if args.dry_run:
+        out.info(warn("\n[DRY-RUN] Nada foi alterado no Salesforce (só conferência do plano).", color))
+        return
+
+    apply_plans(args, out, color, instance_url, headers, ok_plans, group_name, mode, desired_id_to_label,
+                [t["identifier"] for t in tecnicos], skill_level, confirmed=args.sim)
+
+def iter_chunks(iterable, size: int):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_pipeline_identifiers(args, skip=()):
+    """
+    Identificadores de --id-ou-nome/--ids-ou-nomes/--arquivo (ou stdin), sem os de skip
+    (journal) e sem repetir dentro da janela dos PIPELINE_DEDUP mais recentes.
+    """
+    skip = set(skip)
+    seen = {}  # dict como LRU: a ordem de inserção é a da última vez que o identificador apareceu
+    sources = [[args.id_ou_nome] if args.id_ou_nome else [], args.ids_ou_nomes or []]
+    if args.arquivo:
+        sources.append(iter_identifiers_from_file(args.arquivo))
+    elif not args.id_ou_nome and not args.ids_ou_nomes:
+        sources.append(iter_identifiers_from_file("-"))
+    for x in itertools.chain.from_iterable(sources):
+        x = x.strip()
+        if not x or x in skip:
+            continue
+        if x in seen:
+            seen[x] = seen.pop(x)
+            continue
+        seen[x] = None
+        if PIPELINE_DEDUP and len(seen) > PIPELINE_DEDUP:
+            del seen[next(iter(seen))]
+        yield x
+
+def main_pipeline(args):
+    """
+    Modo streaming: lê os técnicos aos poucos (arquivo ou stdin) e, a cada lote de
+    --lote técnicos, resolve + planeja + grava antes de ler o próximo.
+    Memória limitada ao lote e as primeiras escritas saem em segundos.
+    """
+    color = use_color(args)
+    out = make_output(args, color)
+    try:
+        run_pipeline(args, out, color)
+    finally:
+        out.close()
+
+def run_pipeline(args, out, color):
+    if not (args.grupo and args.modo):
+        raise SystemExit("❌ --pipeline não pergunta nada: informe --grupo e --modo.")
+    if not args.dry_run and not args.sim:
+        raise SystemExit("❌ --pipeline não pede confirmação por técnico: use --sim para executar (ou --dry-run).")
+
+    group_name = normalize_group_name(args.grupo)
+    if group_name not in GROUPS_MAP:
+        raise SystemExit("❌ Grupo inválido. Use --listar-grupos para ver os válidos.")
+    mode = args.modo
+    if mode not in ("1", "2", "3"):
+        raise SystemExit("❌ Modo inválido. Use 1, 2 ou 3.")
+
+    resume = None
+    if args.retomar:
+        resume = load_journal_run(args.journal)
+        if not resume:
+            raise SystemExit(f"❌ Nada para retomar: journal vazio/inexistente ({args.journal}).")
+        if (resume["inicio"]["grupo"], resume["inicio"]["modo"]) != (group_name, mode):
+            raise SystemExit("❌ O journal é de outra execução (grupo/modo diferentes).")
+
+    instance_url, headers = sf_login_or_die()
+
+    all_skills = list_all_skills(instance_url, headers, limit=2000)
+    groups_resolved, missing = build_groups_resolved(build_label_to_id(all_skills))
+    desired_id_to_label = {x["id"]: x["label"] for x in groups_resolved.get(group_name, [])}
+    if resume:
+        desired_id_to_label = {k: v for k, v in desired_id_to_label.items() if k in set(resume["inicio"]["skills"])}
+    if not desired_id_to_label:
+        raise SystemExit("❌ Nenhuma skill aplicável encontrada para esse grupo (todas faltando na org?).")
+    desired_ids = set(desired_id_to_label)
+
+    if missing.get(group_name):
+        out.info(warn(f"⚠ Skills do grupo que NÃO existem na org: {', '.join(missing[group_name])}", color))
+    out.info(bold(f"📌 Pipeline: '{group_name}' modo {mode} | lotes de {args.lote} | {'DRY-RUN' if args.dry_run else 'EXECUTANDO'}", color))
+
+    journal = None
+    if not args.dry_run:
+        journal = journal_open(args.journal)
+        if not resume:
+            journal_write(journal, "inicio", grupo=group_name, modo=mode, skills=sorted(desired_ids), identifiers=None)
+
+    counts = {"OK": 0, "SKIP": 0, "ERROR": 0}
+    totals = {"removed_ok": 0, "removed_fail": 0, "added_ok": 0, "added_fail": 0}
+    skip = resume["finished"] if resume else ()
+    try:
+        for n, chunk in enumerate(iter_chunks(iter_pipeline_identifiers(args, skip), args.lote), 1):
+            plans = plan_many(instance_url, headers, chunk, ativar_inativo=args.ativar_inativo)
+            for p in plans:
+                counts[p["status"]] += 1
+                out.plan(p, group_name, mode, desired_id_to_label)
+
+            items = [(p, mode, desired_ids) for p in plans if p["status"] == "OK"]
+            if items and not args.dry_run:
+                for p, _, _ in items:
+                    to_remove, to_add = compute_changes(mode, p["current_ids"], desired_ids)
+                    journal_write(journal, "plano", identifier=p["identifier"], sr_id=p["sr_id"],
+                                  to_remove=sorted(to_remove), to_add=sorted(to_add))
+                by_sr = execute_batch(items, instance_url, headers, args.skill_level,
+                                      backend=pick_backend(items, args.bulk_acima))
+                for p, _, _ in items:
+                    r = by_sr[p["sr_id"]]
+                    for k in totals:
+                        totals[k] += r[k]
+                    journal_write(journal, "lote", identifier=p["identifier"], sr_id=p["sr_id"], **r)
+                    journal_finish(journal, p, r)
+                    out.result(p, r)
+            out.info(c(f"… lote {n}: {sum(counts.values())} técnico(s) processados", "90", color))
+    except KeyboardInterrupt:
+        out.info(err(f"\n⛔ Interrompido. Rode de novo com --retomar ({args.journal}).", color))
+        raise SystemExit(130)
+    finally:
+        if journal:
+            journal.close()
+
+    out.summary(counts, args.dry_run)
+    if not args.dry_run:
+        out.final([totals])
+
+def main_estado_desejado(args):
+    """
+    Reconciliação declarativa: cada técnico do arquivo recebe seus grupos/modo.
+    Resolve e carrega tudo em lote, calcula um diff único e aplica numa execução em lote.
+    """
+    color = use_color(args)
+    out = make_output(args, color)
+    try:
+        run_estado_desejado(args, out, color)
+    finally:
+        out.close()
+
+def run_estado_desejado(args, out, color):
+    if not out.machine:
+        big_header(
+            app_name="ENSURE MANUTENÇÃO SKILL",
+            subtitle="Estado desejado (vários técnicos / grupos) - Desktop Salesforce",
+            enabled=color,
+        )
+
+    entries = read_desired_state(args.estado_desejado, default_mode=args.modo)
+    if not entries:
+        raise SystemExit("❌ Nenhum técnico no arquivo de estado desejado.")
+
+    instance_url, headers = sf_login_or_die()
+
+    all_skills = list_all_skills(instance_url, headers, limit=2000)
+    label_to_id = build_label_to_id(all_skills)
+    groups_resolved, missing = build_groups_resolved(label_to_id)
+
+    used_groups = [g for g in GROUP_ORDER if any(g in e["groups"] for e in entries)]
+    for g in used_groups:
+        if missing.get(g):
+            out.info("\n" + warn(f"⚠ Grupo '{g}': skills do GROUPS_MAP que NÃO existem na org (MasterLabel diferente):", color))
+            for m in missing[g]:
+                out.info("  - " + warn(m, color))
+
+    out.info("\n" + bold(f"📌 Ação: reconciliar {len(entries)} técnico(s) com o estado desejado.", color))
+    out.info(bold("Resolvendo técnicos e carregando skills em lote...", color))
+
+    plans = plan_many(instance_url, headers, [e["identifier"] for e in entries], ativar_inativo=args.ativar_inativo)
+
+    items = []
+    for e, p in zip(entries, plans):
+        desired_id_to_label = {s["id"]: s["label"] for g in e["groups"] for s in groups_resolved.get(g, [])}
+        if p["status"] == "OK" and not desired_id_to_label:
+            p = {"status": "ERROR", "identifier": e["identifier"], "msg": "nenhuma skill aplicável nos grupos informados"}
+        out.plan(p, " + ".join(e["groups"]) or "(nenhum)", e["mode"], desired_id_to_label)
+        items.append((p, e["mode"], set(desired_id_to_label)))
+
+    ok_plans = [p for p, _, _ in items if p["status"] == "OK"]
+    out.summary(count_status([p for p, _, _ in items]), args.dry_run)
 
     if args.dry_run:
-        print(warn("\n[DRY-RUN] Nada foi alterado no Salesforce (só prévia).", color))
+        out.info(warn("\n[DRY-RUN] Nada foi alterado no Salesforce (só prévia).", color))
         return
 
     if not ok_plans:
-        print(warn("\nNada para aplicar (ninguém elegível).", color))
+        out.info(warn("\nNada para aplicar (ninguém elegível).", color))
         return
 
-    confirm = ask(f"\nDigite SIM para EXECUTAR em {len(ok_plans)} técnico(s): ").strip().lower()
+    confirm = ask(f"\nDigite SIM para EXECUTAR em {len(ok_plans)} técnico(s): ",
+                  stream=sys.stderr if out.machine else None).strip().lower()
     if confirm != "sim":
-        print(err("❌ Cancelado.", color))
+        out.info(err("❌ Cancelado.", color))
         return
 
-    total_removed_ok = total_removed_fail = 0
-    total_added_ok = total_added_fail = 0
-
-    print("\n" + bold("🚀 Executando...", color))
+    backend = pick_backend(items, args.bulk_acima)
+    out.info("\n" + bold(f"🚀 Executando em lote ({'Bulk API 2.0' if backend == 'bulk' else 'sObject Collections'})...", color))
+    by_sr = execute_batch(items, instance_url, headers, args.skill_level, backend=backend)
     for p in ok_plans:
-        r = execute(p, instance_url, headers, mode, desired_id_to_label, args.skill_level)
-        total_removed_ok += r["removed_ok"]
-        total_removed_fail += r["removed_fail"]
-        total_added_ok += r["added_ok"]
-        total_added_fail += r["added_fail"]
-
-        print(ok(
-            f"✅ {p['sr_name']} ({p['sr_id']}) | removidas ok={r['removed_ok']} falhas={r['removed_fail']} | adicionadas ok={r['added_ok']} falhas={r['added_fail']}",
-            color
-        ))
-    hr(enabled=color)
-    box(
-        "🏁 FINAL",
-        [
-            f"Remoções: ok={total_removed_ok} | falhas={total_removed_fail}",
-            f"Adições:  ok={total_added_ok} | falhas={total_added_fail}",
-        ],
-        enabled=color,
-        accent_code="95",
-    )
-    print(ok("\n✅ Concluído.", color))
-    print("\n" + bold(ok("🔥 TA MUITO FODA. ✔️", color), color))
+        out.result(p, by_sr[p["sr_id"]])
+    out.final(list(by_sr.values()))
+
+
+def positive_int(value: str) -> int:
+    """type= do argparse para tamanhos (--lote): inteiro >= 1."""
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"inteiro inválido: {value!r}")
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"precisa ser >= 1 (veio {n})")
+    return n
 
 
 if __name__ == "__main__":
@@ -1014,10 +2719,26 @@ if __name__ == "__main__":
     ap.add_argument("--api", action="store_true", help="Inicia a API REST")
     ap.add_argument("--host", default="0.0.0.0", help="Host da API REST")
     ap.add_argument("--port", type=int, default=5000, help="Porta da API REST")
+    ap.add_argument("--producao", action="store_true", help="API com pool de threads/processos (em vez do servidor de desenvolvimento)")
+    ap.add_argument("--threads", type=int, default=8, help="Threads por processo no --producao (padrão: 8)")
+    ap.add_argument("--processos", type=int, default=1, help="Processos (pre-fork, Linux/macOS) no --producao (padrão: 1)")
+    ap.add_argument("--keepalive", type=float, default=5.0, help="Segundos que uma conexão keep-alive ociosa fica aberta (padrão: 5)")
+    ap.add_argument("--fila", type=int, default=int(os.getenv("SF_API_FILA", "0")),
+                    help="Conexões esperando thread por processo no --producao; acima disso responde 503 "
+                         "(padrão: 4 x --threads; ou SF_API_FILA)")
+    ap.add_argument("--jobs-db", default=None, help="Arquivo SQLite dos jobs assíncronos da API (padrão: memória; ou SF_JOBS_DB)")
+    ap.add_argument("--job-workers", type=int, default=int(os.getenv("SF_JOB_WORKERS", "4")),
+                    help="Workers da fila de jobs assíncronos por processo (padrão: 4)")
+    ap.add_argument("--coalescer-ms", type=float, default=COALESCE_MS,
+                    help=f"API: junta escritas de requisições simultâneas por até N ms num lote só (0 = desliga). Padrão: {COALESCE_MS:g}")
+    ap.add_argument("--prazo-ms", type=float, default=API_DEADLINE_MS,
+                    help=f"API: prazo de cada requisição quando o cliente não manda X-Deadline-Ms (0 = sem prazo). "
+                         f"Padrão: {API_DEADLINE_MS:g} (ou SF_API_PRAZO_MS)")
 
     ap.add_argument("--id-ou-nome", required=False, help="Um ServiceResource Id (0Hn...) ou Nome do técnico")
     ap.add_argument("--ids-ou-nomes", nargs="+", required=False, help="Vários nomes/IDs (separados por espaço)")
-    ap.add_argument("--arquivo", required=False, help="Arquivo .txt com 1 nome/ID por linha")
+    ap.add_argument("--arquivo", required=False, help="Arquivo .txt com 1 nome/ID por linha ('-' = stdin)")
+    ap.add_argument("--estado-desejado", required=False, help="Arquivo .csv/.json com técnico -> grupos (+ modo) para reconciliar em lote")
 
     ap.add_argument("--grupo", required=False, help="Grupo (nome ou número). Ex: 'Retirada' ou '6'")
     ap.add_argument("--modo", required=False, help="1, 2 ou 3 (remoção). Se não passar, pergunta.")
@@ -1025,22 +2746,135 @@ if __name__ == "__main__":
 
     ap.add_argument("--ativar-inativo", action="store_true", help="Tenta ativar técnico se estiver inativo (senão, pula)")
     ap.add_argument("--dry-run", action="store_true", help="Só mostra a prévia, não executa nada")
-
+    ap.add_argument("--journal", default=JOURNAL_DEFAULT, help=f"Journal (JSONL) de planos/escritas feitas. Padrão: {JOURNAL_DEFAULT}")
+    ap.add_argument("--salvar-plano", default=None,
+                    help="Com --dry-run: grava a prévia nesse arquivo (JSON) para aplicar depois com --executar-plano")
+    ap.add_argument("--executar-plano", default=None,
+                    help="Aplica um plano salvo (--salvar-plano) sem re-planejar; só técnicos que mudaram desde o plano são re-planejados")
+    ap.add_argument("--retomar", action="store_true", help="Retoma a última execução do journal (pula técnicos já concluídos)")
+    ap.add_argument("--pipeline", action="store_true",
+                    help="Modo streaming: processa os técnicos em lotes (arquivo ou stdin) sem carregar tudo antes")
+    ap.add_argument("--lote", type=positive_int, default=200, help="Tamanho do lote no --pipeline (padrão: 200)")
+    ap.add_argument("--sim", action="store_true", help="Confirma a execução de antemão (obrigatório no --pipeline sem --dry-run)")
+    ap.add_argument("--bulk-acima", type=int, default=BULK_THRESHOLD,
+                    help=f"Usa Bulk API 2.0 quando remoções+adições >= N (0 = nunca). Padrão: {BULK_THRESHOLD}")
+
+    ap.add_argument("--indice-nomes", default=NAME_INDEX_FILE,
+                    help=f"Cache do índice local de nomes (SF_NAME_INDEX). Vazio = não grava arquivo. Padrão: {NAME_INDEX_FILE}")
+    ap.add_argument("--paralelo", type=int, default=PARALLEL,
+                    help=f"Lotes (consultas IN / sObject Collections) em paralelo. O limitador adaptativo ajusta a "
+                         f"concorrência real conforme a org responde. Padrão: {PARALLEL}")
+    ap.add_argument("--hedge", action="store_true",
+                    help="Leituras com hedge: se a consulta passar do percentil de latência, manda uma cópia e usa a "
+                         "primeira resposta (ou SF_HEDGE=1)")
+    ap.add_argument("--hedge-percentil", type=float, default=None, help="Percentil da latência que dispara a cópia (padrão: 95)")
+    ap.add_argument("--hedge-orcamento", type=float, default=None,
+                    help="Fração máxima de cópias extras sobre as leituras (padrão: 0.05 = 5%%)")
+    ap.add_argument("--max-concorrencia", type=int, default=None,
+                    help="Teto de requisições simultâneas ao Salesforce (janela máxima do limitador; padrão: 64)")
+
+    ap.add_argument("--perfil", action="store_true",
+                    help="Mede tempo, chamadas e bytes por fase e por operação do Salesforce (tabela no stderr ao final)")
+    ap.add_argument("--perfil-json", default=None, help="Grava o relatório do --perfil em JSON nesse arquivo (liga o --perfil)")
+    ap.add_argument("--perfil-cprofile", default=None, help="Também roda o cProfile e grava as estatísticas nesse arquivo (.prof)")
+    ap.add_argument("--perfil-memoria", action="store_true", help="Também mede memória com tracemalloc (atual, pico e top linhas)")
+
+    ap.add_argument("--trace", default=os.getenv("SF_TRACE") or None,
+                    help="Grava spans (login, consultas, páginas, escritas e cada endpoint da API) em OTLP/JSON, "
+                         "1 trace por linha, nesse arquivo ('-' = stdout; ou SF_TRACE)")
+    ap.add_argument("--gravar", default=None,
+                    help="Grava o tráfego com o Salesforce (sem token/senha; e-mails e nomes viram pseudônimos) "
+                         "nesse cassete .jsonl para reproduzir depois com --reproduzir")
+    ap.add_argument("--reproduzir", default=None,
+                    help="Responde as chamadas ao Salesforce com um cassete gravado (--gravar), sem rede")
+    ap.add_argument("--reproduzir-escala", type=float, default=1.0,
+                    help="Multiplica as latências gravadas na reprodução (0 = sem espera). Padrão: 1")
+    ap.add_argument("--log-json", action="store_true", help="Logs em JSON (1 por linha, com duração/registros) no stderr (ou SF_LOG_JSON=1)")
+    ap.add_argument("--log-nivel", default=None, help="Nível dos logs: DEBUG (inclui o texto de cada SOQL), INFO, WARNING... (ou SF_LOG_NIVEL)")
     ap.add_argument("--sem-cor", action="store_true", help="Desativa cores no terminal")
+    ap.add_argument("--saida", choices=["pro", "jsonl", "csv", "resumo"], default="pro",
+                    help="pro = UI interativa (padrão) | jsonl/csv = 1 registro por plano/resultado | resumo = só totais")
+    ap.add_argument("--saida-arquivo", default=None, help="Grava a saída jsonl/csv/resumo nesse arquivo (padrão: stdout)")
     ap.add_argument("--listar-grupos", action="store_true", help="Só lista os grupos e sai")
+    ap.add_argument("--memo-ttl", type=float, default=MEMO_TTL,
+                    help=f"Segundos que uma consulta repetida na mesma execução (ou requisição da API) reaproveita o "
+                         f"resultado; escritas invalidam o que tocam. 0 = desliga. Padrão: {MEMO_TTL:g} (ou SF_MEMO_TTL)")
+    ap.add_argument("--colunar", action="store_true",
+                    help="Links em lote e índice de nomes decodificados em colunas (menos memória por registro; "
+                         "ou SF_COLUNAR=1)")
     ap.add_argument("--selecionar-skills", action="store_true", help="Permite escolher subconjunto dentro do grupo (senão aplica todas)")
 
     args = ap.parse_args()
+    if args.log_json or args.log_nivel:
+        sf_log.setup(level=args.log_nivel, json_format=args.log_json or None, force=True)
+    PARALLEL = max(1, args.paralelo)
+    COLUMNAR = COLUMNAR or args.colunar
+    NAME_INDEX_FILE = args.indice_nomes
+    if args.max_concorrencia:
+        sf_http.configure(max_concurrency=args.max_concorrencia)
+    if args.hedge or args.hedge_percentil or args.hedge_orcamento:
+        sf_http.configure_hedge(enabled=True, percentile=args.hedge_percentil, budget=args.hedge_orcamento)
+    if args.trace == "-" and not args.api and args.saida != "pro" and not args.saida_arquivo:
+        raise SystemExit("❌ --trace - escreve no stdout, junto com a saída --saida "
+                         f"{args.saida}: use --saida-arquivo ARQ ou --trace ARQ.jsonl.")
+    if args.trace:
+        sf_trace.start(args.trace)
+    if args.gravar and args.reproduzir:
+        raise SystemExit("❌ Use --gravar OU --reproduzir.")
+    if args.gravar or args.reproduzir:
+        # cache do índice de nomes mudaria as consultas entre gravação e reprodução
+        NAME_INDEX_FILE = ""
+    if args.gravar:
+        sf_replay.start_recording(args.gravar)
+    if args.reproduzir:
+        sf_replay.start_replay(args.reproduzir, scale=args.reproduzir_escala)
+        # credenciais não vão para o cassete: qualquer valor serve na reprodução
+        SF_DOMAIN = SF_DOMAIN or "https://login.replay.invalid"
+        SF_CLIENT_ID = SF_CLIENT_ID or "replay"
+        SF_CLIENT_SECRET = SF_CLIENT_SECRET or "replay"
+        SF_USERNAME = SF_USERNAME or "replay"
+        SF_PASSWORD = SF_PASSWORD or "replay"
 
     if args.api:
-        run_rest_api(args.host, args.port)
+        run_rest_api(args.host, args.port, producao=args.producao, threads=args.threads,
+                     processos=args.processos, keepalive=args.keepalive, fila=args.fila,
+                     jobs_db=args.jobs_db, job_workers=args.job_workers, coalesce_ms=args.coalescer_ms,
+                     deadline_ms=args.prazo_ms, memo_ttl=args.memo_ttl)
         raise SystemExit(0)
 
     if args.listar_grupos:
         listar_grupos(sem_cor=args.sem_cor)
         raise SystemExit(0)
 
-    main(args)
+    if args.selecionar_skills and (args.saida != "pro" or args.pipeline or args.estado_desejado or args.executar_plano):
+        raise SystemExit("❌ --selecionar-skills pergunta quais skills aplicar: use só com --saida pro "
+                         "(sem --pipeline/--estado-desejado/--executar-plano).")
+
+    if args.salvar_plano and (not args.dry_run or args.pipeline or args.estado_desejado or args.executar_plano):
+        raise SystemExit("❌ --salvar-plano grava a prévia: use com --dry-run (sem --pipeline/--estado-desejado/--executar-plano).")
+
+    prof = None
+    if args.perfil or args.perfil_json or args.perfil_cprofile or args.perfil_memoria:
+        prof = perfil.start(cprofile_path=args.perfil_cprofile, memoria=args.perfil_memoria)
+    comando = ("executar-plano" if args.executar_plano else "estado-desejado" if args.estado_desejado
+               else "pipeline" if args.pipeline else "aplicar")
+    try:
+        with sf_trace.span(f"cli {comando}", attrs={"dry_run": bool(args.dry_run), "paralelo": PARALLEL}), \
+                (memo.scope(args.memo_ttl) if args.memo_ttl > 0 else contextlib.nullcontext()):
+            if args.executar_plano:
+                main_executar_plano(args)
+            elif args.estado_desejado:
+                main_estado_desejado(args)
+            elif args.pipeline:
+                main_pipeline(args)
+            else:
+                main(args)
+    finally:
+        if prof:
+            perfil.finish(prof, json_path=args.perfil_json)
+        sf_trace.stop()
+        if sf_replay.ACTIVE is not None:
+            print(sf_replay.format_stats(sf_replay.stats()), file=sys.stderr)
 
 
 
@@ -1196,5 +3030,400 @@ if __name__ == "__main__":
 #
 # OBS: isso é 1 vez e vale para TODOS os técnicos do arquivo.
 #
+# -------------------------
+# 13) ESTADO DESEJADO (vários técnicos, grupos diferentes, 1 execução)
+# -------------------------
+# Em vez de rodar 1 vez por grupo, descreva o estado final num .csv ou .json.
+# Resolve técnicos e skills em lote, calcula um diff único e aplica tudo
+# em lote (sObject Collections, até 200 registros por chamada).
+#
+# estado.csv (separador , ou ; — vários grupos separados por |):
+#   tecnico,grupos,modo
+#   DOUGLAS RODRIGO LUCIO MAIA,Retirada|Mudança,3
+#   0HnV20000003W1lKAE,Ativação,1
+#
+# estado.json:
+#   [{"tecnico": "0HnV20000003W1lKAE", "grupos": ["Retirada", "Mudança"], "modo": "3"}]
+#
+# Se a coluna modo estiver vazia, vale o --modo. O mesmo técnico em várias
+# linhas tem os grupos somados (modos diferentes para ele = erro).
+#
+# python ensure_manutencao_skill.py --estado-desejado estado.csv --dry-run
+# python ensure_manutencao_skill.py --estado-desejado estado.csv --modo 3
+#
+# -------------------------
+# 14) ROLLOUTS GIGANTES (Bulk API 2.0)
+# -------------------------
+# Quando o total de remoções + adições passa de --bulk-acima (padrão 2000,
+# ou SF_BULK_THRESHOLD no .env), a execução vira jobs do Bulk API 2.0
+# (CSV de delete e de insert). O script espera os jobs terminarem e mostra
+# o resultado por técnico (sucessos/falhas vindos do próprio job).
+#
+# python ensure_manutencao_skill.py --estado-desejado estado.csv --bulk-acima 5000
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --modo 3 --bulk-acima 0   (nunca usa Bulk)
+#
+# -------------------------
+# 15) CAIU NO MEIO? RETOMAR (--retomar)
+# -------------------------
+# Toda execução real grava um journal (ensure_skill_journal.jsonl, ou --journal)
+# com o plano de cada técnico e cada remoção/adição feita. Se a rede cair,
+# der Ctrl-C ou o PC travar, rode de novo com --retomar: grupo, modo e skills
+# vêm do journal, técnicos já concluídos são pulados e só os pendentes são
+# re-planejados (técnico com falha fica pendente e é tentado de novo).
+# --grupo/--modo junto com --retomar só são aceitos se forem os do journal.
+#
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --retomar
+# python ensure_manutencao_skill.py --retomar        (usa a lista gravada no journal)
+#
+# -------------------------
+# 16) SAÍDA PARA MÁQUINA (--saida jsonl | csv | resumo)
+# -------------------------
+# Para milhares de técnicos a UI PRO (box por técnico) vira gargalo e não dá
+# pra processar. Com --saida sai 1 registro compacto por plano/resultado,
+# com buffer (o progresso vai pro stderr, sem cor). Exige --grupo e --modo;
+# --selecionar-skills não vale aqui (não há pergunta).
+#
+#   jsonl  -> {"tipo":"plano",...} / {"tipo":"resultado",...} / resumo / final
+#   csv    -> mesmas informações em colunas (listas separadas por |)
+#   resumo -> só os totais (lotes gigantes)
+#
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --modo 3 --dry-run --saida jsonl > plano.jsonl
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --modo 3 --saida csv --saida-arquivo resultado.csv
+#
+# -------------------------
+# 17) ENTRADAS GIGANTES (--pipeline)
+# -------------------------
+# Lê os técnicos aos poucos (arquivo ou stdin) e, a cada --lote (padrão 200),
+# resolve, planeja e grava antes de ler o próximo lote: memória fica limitada
+# e as primeiras escritas saem em segundos mesmo com 100k linhas.
+# Não há prévia geral nem pergunta: confirme de antemão com --sim.
+# O journal também vale aqui (--retomar pula os já concluídos).
+# Repetidos na entrada são pulados dentro de uma janela dos últimos 100k
+# identificadores (SF_PIPELINE_JANELA; 0 = sem limite, ~100 bytes por identificador).
+#
+# python ensure_manutencao_skill.py --pipeline --arquivo tecnicos.txt --grupo 6 --modo 3 --sim --saida jsonl > log.jsonl
+# type tecnicos.txt | python ensure_manutencao_skill.py --pipeline --grupo 6 --modo 1 --sim --saida resumo
+#
+# -------------------------
+# 18) API EM PRODUÇÃO (--producao)
+# -------------------------
+# Sem --producao a API usa o servidor de desenvolvimento do Flask.
+# Com --producao: pool fixo de --threads por processo (padrão 8), keep-alive
+# HTTP/1.1 de --keepalive segundos, --processos N (Linux: pre-fork, todos
+# escutam a mesma porta; no Windows fica 1 processo) e desligamento gracioso
+# (SIGTERM/Ctrl-C: para de aceitar conexões e termina as requisições em curso).
+# Cada processo faz login 1 vez e reaproveita o token (cache com validade,
+# renovado sozinho em 401) e o pool de conexões keep-alive com o Salesforce.
+#
+# python ensure_manutencao_skill.py --api --producao --port 5000 --threads 16
+# python ensure_manutencao_skill.py --api --producao --processos 4 --threads 16
+#
+# Fila: cada processo aceita até --fila conexões esperando thread (padrão 4 x --threads,
+# ou SF_API_FILA); passou disso, a conexão nova recebe 503 com Retry-After: 1 na hora,
+# em vez de esperar numa fila sem fim. Com fila, a keep-alive que fica ociosa depois
+# da resposta solta a thread (fecha a conexão) para quem está esperando.
+#
+# Medido (benchmarks/fake_salesforce.py, 1000 técnicos, 50 ms por chamada, máquina
+# de 1 vCPU com fake + API + cliente juntos, --threads 16, GET /api/tecnico/consultar,
+# clientes keep-alive em laço fechado que respeitam o Retry-After):
+#   32 clientes:                 ~105 req/s, p50 ~300 ms, p99 ~420 ms, sem 503
+#   128 clientes, fila sem fim (versão anterior): ~103 req/s, p50 ~1,3 s, p99 ~1,5 s
+#   128 clientes, --fila 64:     ~103 req/s, p50 ~780 ms, p99 ~960 ms, ~47 503/s
+#   128 clientes, --fila 16:     ~78 req/s,  p50 ~410 ms, p99 ~660 ms, ~90 503/s
+# Nessa máquina o limite é a CPU compartilhada, não o servidor: a fila só troca espera
+# longa por 503 rápido. Numa org real o teto por processo fica em torno de threads /
+# latência do Salesforce (16 threads / 0,25 s ≈ 64 req/s), então escale com --threads
+# e --processos, e ajuste --fila para a espera máxima aceitável (fila / vazão).
+#
+# python benchmarks/fake_salesforce.py --tecnicos 1000 --latencia-ms 50
+#
+# Para comparar antes/depois de uma mudança (vazão, p50/p95/p99, erros e
+# chamadas ao Salesforce por requisição, com mix e taxa configuráveis):
+# python benchmarks/loadtest_api.py --rps 50 --servidor-args "--producao --threads 16" --json antes.json
+# python benchmarks/loadtest_api.py --rps 50 --servidor-args "--producao --threads 16" --comparar antes.json
+#
+# -------------------------
+# 19) API ASSÍNCRONA (jobs)
+# -------------------------
+# Troca de grupo demorada estoura timeout do cliente/serverless? Mande
+# "assincrono": true e a API responde na hora (202) com o id do job; a fila
+# (--job-workers por processo, padrão 4) executa em segundo plano.
+#
+#   POST /api/grupo/adicionar  {"email": "...", "grupo": "Retirada", "assincrono": true}
+#   POST /api/grupo/remover    {"email": "...", "grupo": "Retirada", "assincrono": true}
+#   POST /api/grupo/lote       {"itens": [{"email": "...", "grupo": "Retirada", "acao": "adicionar"},
+#                                         {"email": "...", "grupo": "Mudança", "acao": "remover"}]}
+#   GET  /api/jobs/<id>        -> estado (pendente/executando/concluido/falhou/interrompido),
+#                                 concluidos, falhas e o estado de cada técnico
+#
+# Sem --jobs-db os jobs ficam em memória (somem ao reiniciar). Com --jobs-db
+# jobs.db (ou SF_JOBS_DB) vão para um SQLite: sobrevivem a reinícios e o status é
+# visto por todos os processos. Cada job guarda o pid/máquina do processo que o executa;
+# ao subir, só os jobs (e itens) de processos que já morreram viram "interrompido" —
+# um worker novo não mexe nos jobs dos irmãos que ainda estão rodando.
+# Fila cheia responde 503. O modo assíncrono (assincrono=true, /api/grupo/lote,
+# /api/jobs) só liga com servidor fixo (--api) ou SF_JOBS_DB; sem isso (ex.: Vercel,
+# onde o processo morre depois da resposta) responde 501 — use o modo síncrono.
+# GET /api/health mostra "assincrono": true/false.
+#
+# python ensure_manutencao_skill.py --api --producao --processos 4 --jobs-db jobs.db
+#
+# -------------------------
+# 20) PARALELISMO ADAPTATIVO (--paralelo)
+# -------------------------
+# --paralelo N (ou SF_PARALELO) roda até N lotes ao mesmo tempo (consultas IN
+# de links e sObject Collections de remoção/adição). Não precisa acertar o N
+# da org: toda chamada passa por um limitador AIMD no sf_http que
+#   - aumenta a janela de requisições simultâneas enquanto tudo vai bem;
+#   - corta pela metade em 429/503/REQUEST_LIMIT_EXCEEDED e repete a chamada
+#     (escritas só são repetidas no limite de concorrência, recusado antes de
+#     processar: um 503 depois do insert feito duplicaria registros);
+#   - corta 25% em UNABLE_TO_LOCK_ROW (registros travados são reenviados 1 vez);
+#   - corta 10% se a latência de leitura disparar em relação à mínima DAQUELA
+#     operação (fila do lado do Salesforce); escritas, Bulk e login não contam;
+#   - erro de conexão/SSL não mexe na janela.
+# --max-concorrencia fixa o teto da janela (padrão 64). A janela atual aparece
+# em GET /api/health ("limitador").
+#
+# python ensure_manutencao_skill.py --pipeline --arquivo tecnicos.txt --grupo 6 --modo 3 --sim --paralelo 8
+#
+# -------------------------
+# 21) ONDE FOI O TEMPO? (--perfil)
+# -------------------------
+# Ao final imprime (no stderr) o tempo de parede de cada fase — login, skills,
+# entrada, resolucao, ativacao, links, escrita, journal, render e prompt (tempo
+# esperando você digitar) — com nº de chamadas ao Salesforce e bytes enviados/
+# recebidos, e uma tabela por operação (GET query, POST collections, POST composite...).
+# O tempo de cada fase é exclusivo (fase dentro de fase não conta duas vezes).
+#
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --modo 3 --dry-run --perfil
+# python ensure_manutencao_skill.py --pipeline --arquivo tecnicos.txt --grupo 6 --modo 3 --sim --perfil-json perfil.json
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --dry-run --perfil-cprofile run.prof --perfil-memoria
+#
+# (--perfil-json / --perfil-cprofile / --perfil-memoria já ligam o --perfil;
+#  o .prof abre com: python -m pstats run.prof  ou  snakeviz run.prof)
+#
+# -------------------------
+# 22) ÍNDICE LOCAL DE NOMES (--indice-nomes)
+# -------------------------
+# Em lotes com vários técnicos por nome, quem não bate exato na query IN é
+# resolvido num índice local (sem acento e sem caixa) em vez de um LIKE por nome:
+#   "Jose da Silva" acha "JOSÉ DA SILVA"; nome ambíguo lista os candidatos na hora;
+#   erro de digitação devolve os mais parecidos (ex.: "JOSE DA SLIVA" -> parecidos:
+#   JOSÉ DA SILVA (0Hn..., 86%)). Parecido NÃO é aplicado: use o nome certo ou o Id.
+# O índice só é montado quando o 1º nome não bate exato (lote todo certo = 0 custo).
+# Fica em ensure_skill_nomes.json (ou --indice-nomes / SF_NAME_INDEX) e a cada
+# execução só baixa o que mudou (SystemModstamp) e o que foi apagado (queryAll,
+# IsDeleted = true; some do índice); a cada 24h é refeito do zero.
+#
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --modo 3 --dry-run
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --dry-run --indice-nomes /tmp/nomes.json
+#
+# -------------------------
+# 23) ESCRITAS JUNTADAS NA API (--coalescer-ms)
+# -------------------------
+# Em rajadas de /api/grupo/adicionar|remover (e nos jobs), as inserções/remoções de
+# skills de requisições simultâneas esperam até --coalescer-ms (padrão 5 ms, ou
+# SF_COALESCER_MS) e saem num único sObject Collections (até 200 registros); cada
+# requisição recebe o resultado dos seus registros. O mesmo técnico+skill pedido por
+# duas requisições ao mesmo tempo vira 1 registro só. 0 desliga.
+# O lote roda com prazo próprio (SF_PRAZO_COMPARTILHADO, padrão 120 s), não no de quem
+# o abriu; cada requisição espera o lote no seu prazo. Atenção: a requisição que dá 504
+# esperando o lote não cancela a escrita — ela pode ter sido gravada mesmo assim.
+# GET /api/health mostra "coalescedor" (lotes, registros, média por lote).
+#
+# python ensure_manutencao_skill.py --api --producao --threads 32 --coalescer-ms 5
+#
+# Medido (loadtest_api, mix adicionar=50,remover=50 a 80 req/s, fake 50 ms):
+# chamadas de escrita 815 -> 567 (-30%), p95 3,5 s -> 2,7 s (-21%).
+#
+# -------------------------
+# 24) LEITURAS IGUAIS AO MESMO TEMPO (single-flight)
+# -------------------------
+# Se duas requisições pedem a mesma coisa no mesmo instante (mesmo e-mail no
+# consultar/existe, mesma SOQL, catálogo de Skill), só a primeira vai ao Salesforce;
+# as outras esperam e recebem a mesma resposta. Não é cache: terminou a chamada,
+# a próxima leitura busca de novo. Sempre ligado; GET /api/health mostra "leituras"
+# (chamadas feitas x compartilhadas). Se a leitura cai no prazo de quem a fez, quem
+# esperava e ainda tem prazo tenta de novo em vez de receber o 504 do outro.
+#
+# Medido (loadtest_api, consultar=70,existe=30 a 100 req/s sobre 20 técnicos):
+# chamadas ao Salesforce 1,00 -> 0,81 por requisição (-19%), latência igual.
+#
+# -------------------------
+# 25) LOGS (--log-json / --log-nivel)
+# -------------------------
+# Os logs vão para uma fila e uma thread própria formata e escreve no stderr (a
+# requisição não espera o disco/terminal). Cada consulta gera 1 linha "Consulta
+# completa" com registros, páginas, duração e a SOQL; no máximo SF_LOG_POR_SEGUNDO
+# (padrão 5) por segundo — as demais são contadas e a próxima linha leva suprimidos=N.
+# Erros nunca são descartados. O texto de cada SOQL/página sai só em DEBUG.
+#
+# python ensure_manutencao_skill.py --api --producao --log-json
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --dry-run --log-nivel DEBUG
+# SF_LOG_JSON=1 SF_LOG_NIVEL=WARNING python ensure_manutencao_skill.py --api --producao
+#
+# Custo por consulta na thread que loga (8 threads): 64 us -> 3 us.
+#
+# -------------------------
+# 26) PRÉVIA APROVADA -> EXECUÇÃO (--salvar-plano / --executar-plano)
+# -------------------------
+# 1) Gere a prévia e salve o plano (técnico, links lidos, o que sai e o que entra):
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --modo 3 --dry-run --salvar-plano plano.json
+#
+# 2) Depois da aprovação, aplique o arquivo (sem resolver nomes nem reler links):
+# python ensure_manutencao_skill.py --executar-plano plano.json
+# python ensure_manutencao_skill.py --executar-plano plano.json --sim --saida jsonl
+#
+# Antes de escrever, 1 query agregada (por 200 técnicos) compara nº de links e o
+# maior SystemModstamp de cada técnico com o do plano. Quem mudou nesse meio tempo
+# é re-planejado (e a nova prévia aparece); os demais não custam nenhuma leitura.
+# --executar-plano ... --dry-run só faz essa conferência. Técnicos SKIP/ERRO na
+# prévia ficam de fora. O plano só vale para a org em que foi gerado.
+#
+# -------------------------
+# 27) LEITURAS COM HEDGE (--hedge)
+# -------------------------
+# Para a cauda de latência das leituras (consultar/existe na API, SOQL, queryMore):
+# se a resposta não chegou no p95 (--hedge-percentil) das últimas leituras do mesmo
+# tipo, manda uma cópia e usa a primeira que responder. As cópias ficam limitadas a
+# --hedge-orcamento (padrão 0.05 = 5% das leituras). Escritas nunca são repetidas.
+# 5xx/429 de uma cópia não ganha a corrida: espera a outra (se as 2 falham, vale a resposta).
+# Leitura sem histórico ou sem orçamento roda direto na thread da requisição; as que
+# podem ganhar cópia rodam num pool fixo de primárias (threads reaproveitadas, sem criar
+# thread por leitura) e as cópias num pool separado. Pool de primárias cheio = a leitura
+# roda na thread da requisição, sem cópia ("sem_thread" no health).
+# GET /api/health mostra "hedge" (taxa de cópias, quantas o hedge venceu, limiar).
+#
+# python ensure_manutencao_skill.py --api --producao --threads 32 --hedge
+# SF_HEDGE=1 SF_HEDGE_PERCENTIL=90 SF_HEDGE_ORCAMENTO=0.1 python ensure_manutencao_skill.py --api --producao
+#
+# Medido (loadtest_api, consultar/existe a 40 req/s, fake 50 ms com 3% das respostas
+# +600 ms): p99 707 ms -> 231 ms (-67%) com +4% de chamadas; o hedge venceu 73% das vezes.
+# python benchmarks/loadtest_api.py --mix consultar=60,existe=40 --rps 40 --cauda-pct 3 --cauda-ms 600 --servidor-args "--producao --hedge"
+#
+# -------------------------
+# 28) PRAZO POR REQUISIÇÃO NA API (X-Deadline-Ms / --prazo-ms)
+# -------------------------
+# Cada requisição da API tem um prazo: o cabeçalho X-Deadline-Ms do cliente ou
+# --prazo-ms (padrão 30000, ou SF_API_PRAZO_MS; teto de 120000). O prazo vale para
+# tudo que a requisição faz (login, contexto/catálogo, paginação, escritas, lotes
+# em paralelo): cada chamada ao Salesforce usa o tempo que sobra como timeout, não
+# há retry/backoff que passe do prazo, e quem espera uma leitura igual ou um lote de
+# escrita de outra requisição desiste no prazo. Esgotou: 504 na hora, com o motivo.
+# Escrita já enviada não é desfeita: o 504 não garante que nada foi gravado.
+# Jobs assíncronos (assincrono=true / lote) não têm prazo. Cancelamento pelo prazo
+# não conta como sinal de sobrecarga no limitador ("prazo" em /api/health).
+#
+# curl -H "X-Deadline-Ms: 800" "http://127.0.0.1:5000/api/tecnico/consultar?email=fulano@empresa.com"
+# python ensure_manutencao_skill.py --api --producao --prazo-ms 10000
+#
+# Medido (fake com todas as respostas +2 s): X-Deadline-Ms 500 -> 504 em 0,52 s
+# (antes: 200 depois de 2,05 s); seguidor de leitura igual com 400 ms -> 504 em 0,40 s.
+#
+# -------------------------
+# 29) RASTREAMENTO (--trace)
+# -------------------------
+# Grava a sequência de idas ao Salesforce de cada requisição da API (ou da execução
+# inteira no modo linha de comando) como spans pai/filho no formato OTLP/JSON, 1 trace
+# por linha (o mesmo do file exporter do OpenTelemetry Collector):
+#   POST /api/grupo/adicionar -> contexto -> sf.composite -> sf.http
+#                             -> coalescedor.lote -> sf.criar_skills -> sf.http
+# Atributos: forma da SOQL (literais viram ?), objeto, registros, páginas, falhas,
+# status HTTP, prazo. Cada sf.http é 1 chamada real (retries e cópias do hedge
+# aparecem separadas). Um traceparent (W3C) enviado à API vira o pai do trace.
+# Trace grande (o CLI inteiro é 1 trace) sai em linhas de até SF_TRACE_LOTE spans
+# (padrão 500), todas com o mesmo traceId: a memória não cresce com o tamanho da lista.
+#
+# python ensure_manutencao_skill.py --api --producao --trace traces.jsonl
+# SF_TRACE=- python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --modo 1 --dry-run --saida resumo --saida-arquivo resumo.json
+#
+# '-' (stdout) com --saida jsonl/csv/resumo só vale com --saida-arquivo (senão as linhas
+# do trace se misturariam à saída de máquina) — sem ele o CLI recusa.
+#
+# Desligado, cada função instrumentada custa ~0,3 µs; ligado, ~15 µs por span.
+#
+# -------------------------
+# 30) GRAVAR E REPRODUZIR O TRÁFEGO (--gravar / --reproduzir)
+# -------------------------
+# --gravar ARQ guarda cada chamada ao Salesforce (CLI ou API) num "cassete" .jsonl:
+# requisição (sem host), status, corpo da resposta e duração. Token, senha e segredos
+# viram ***; e-mails, nomes e literais da SOQL viram pseudônimos estáveis (hash com
+# um sal secreto). O sal NÃO vai no cassete: fica em ARQ.sal (permissão 600) ou vem
+# de SF_REPLAY_SAL. Quem só tem o .jsonl não consegue testar e-mails/nomes contra os
+# pseudônimos; para reproduzir é preciso também o sal (sem ele, ou com outro, o
+# --reproduzir recusa) — passe o ARQ.sal só para quem pode ver os dados.
+# --reproduzir ARQ responde as mesmas chamadas com o cassete, sem rede e sem
+# credenciais, na latência gravada (--reproduzir-escala 0.5 = metade,
+# 0 = sem espera). Com --perfil dá para comparar chamadas e tempo entre versões:
+#
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --modo 1 --dry-run --saida resumo --gravar prod.jsonl
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --modo 1 --dry-run --saida resumo --reproduzir prod.jsonl --perfil
+# python ensure_manutencao_skill.py --api --producao --reproduzir api.jsonl      (e o loadtest_api com --sf-url qualquer)
+#
+# No final sai "servidas / repetidas / fora do cassete / não usadas": chamada nova
+# que não foi gravada recebe 501 REPLAY_MISS (aparece em "fora"); chamada repetida
+# além do gravado reusa a última resposta. Use a MESMA entrada (nomes/e-mails) da
+# gravação. Gravando ou reproduzindo, o índice de nomes não usa o arquivo de cache
+# (ele mudaria as consultas). Na reprodução, o Name/Email que a própria consulta
+# cita (Name IN ('...'), e-mail do técnico) volta ao valor digitado, então o
+# resolvedor em lote casa os nomes como na gravação; os demais continuam
+# pseudônimos (sugestões de nomes parecidos mostram pseudônimos).
+# Ida e volta contra o Salesforce de mentira (gravação x reprodução, mesmos planos):
+#
+# python benchmarks/check_replay.py
+#
+# -------------------------
+# 31) MICROBENCHMARKS DOS CAMINHOS QUENTES (benchmarks/bench_hotpaths.py)
+# -------------------------
+# Mede o CPU fora da rede (catálogo -> grupos, rótulos dos links, build_plan,
+# compute_changes, box/print_preview) com 10k técnicos e 2.000 skills sintéticos.
+# A base fica em benchmarks/bench_hotpaths_base.json; antes de aceitar uma
+# otimização (ou para ver se algo piorou), compare na MESMA máquina:
+#
+# python benchmarks/bench_hotpaths.py --json minha_base.json
+# python benchmarks/bench_hotpaths.py --comparar minha_base.json
+# python benchmarks/bench_hotpaths.py --casos build_plan,compute_changes --comparar minha_base.json --falhar
+#
+# -------------------------
+# 32) CONSULTAS EM COLUNAS (--colunar)
+# -------------------------
+# Com --colunar (ou SF_COLUNAR=1) a carga dos links em lote e a do índice de nomes
+# decodificam cada página direto em colunas (columnar.Columns): 1 lista por campo,
+# sem o `attributes` de cada registro, Skill.MasterLabel como coluna própria e Ids
+# e labels internados. As linhas continuam respondendo .get()/[] como os dicts.
+# Na org inteira cai de ~1,6 KB para ~60 B por link, com decodificação ~1,5x mais
+# lenta (o tempo de rede não muda). Para medir na sua máquina:
+#
+# python ensure_manutencao_skill.py --arquivo tecnicos.txt --grupo 6 --modo 1 --dry-run --colunar --perfil-memoria
+# python benchmarks/bench_columnar.py --tecnicos 50000
+#
+# -------------------------
+# 33) CONSULTAS REPETIDAS (--memo-ttl)
+# -------------------------
+# Cada execução do CLI (e cada requisição da API) abre um escopo de memo: a mesma
+# SOQL (texto normalizado) ou o mesmo contexto por e-mail é lido do Salesforce 1
+# vez só e reaproveitado até --memo-ttl segundos (padrão 300; SF_MEMO_TTL). Ativar
+# técnico e criar/remover ServiceResourceSkill (1 a 1, em lote ou Bulk) invalidam
+# as consultas daquele sObject que citam os Ids tocados (ou que não filtram por Id),
+# em todos os escopos abertos do processo. Resultados com mais de 2.000 registros
+# não são guardados, nem leitura que falhou (consulta ou lote do queryMore com erro):
+# a próxima igual vai ao Salesforce de novo. Mudança feita fora (outra pessoa/ferramenta) aparece depois do
+# TTL; para sempre ler de novo:
+#
+# python ensure_manutencao_skill.py --memo-ttl 0
+#
+# Acertos/faltas/invalidações aparecem em /api/health ("memo").
+#
+# -------------------------
+# 34) LEITURA ANTECIPADA NO MODO INTERATIVO
+# -------------------------
+# Quando o CLI vai perguntar grupo, modo ou skills (--selecionar-skills), logo depois
+# do login ele já resolve os técnicos e carrega os links em segundo plano (threads
+# "prefetch", até max(4, --paralelo) ao mesmo tempo): enquanto a pessoa responde, a
+# prévia vai ficando pronta e aparece quase na hora depois do modo. Só leituras:
+# ativar inativo (--ativar-inativo) continua depois das perguntas. Os logs INFO
+# dessas threads não aparecem (para não cair no meio da pergunta); avisos sim.
+# Com --grupo e --modo (sem --selecionar-skills) nada é perguntado e nada muda.
+#
 # ============================================================
-
@@ -0,0 +1,282 @@
+import os
+import json
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# Configuração do logging
+logger = logging.getLogger("salesforce_api")
+
+# Estados de um job e de cada item dele
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+FALHOU = "falhou"
+INTERROMPIDO = "interrompido"
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def process_alive(pid: int) -> bool:
+    """O processo `pid` desta máquina ainda existe? (sem sinal no Windows: só o próprio conta)"""
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # existe, mas é de outro usuário
+    return True
+
+class QueueFull(Exception):
+    """A fila já tem o máximo de jobs pendentes/executando."""
+
+# =========================
+# PERSISTÊNCIA (troque o store sem mexer na fila)
+# =========================
+class MemoryJobStore:
+    """Jobs em memória do processo (somem ao reiniciar; cada processo vê só os seus)."""
+
+    def __init__(self, max_jobs: int = 10000):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.max_jobs = max_jobs
+        self.lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self.lock:
+            if len(self.jobs) >= self.max_jobs:
+                # descarta o job terminado mais antigo
+                for job_id, old in self.jobs.items():
+                    if old["estado"] not in (PENDENTE, EXECUTANDO):
+                        del self.jobs[job_id]
+                        break
+            self.jobs[job["id"]] = json.loads(json.dumps(job))
+
+    def update(self, job_id: str, **fields) -> None:
+        with self.lock:
+            self.jobs[job_id].update(fields)
+
+    def update_item(self, job_id: str, index: int, **fields) -> None:
+        with self.lock:
+            self.jobs[job_id]["itens"][index].update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+class SQLiteJobStore:
+    """
+    Jobs num arquivo SQLite: sobrevivem a reinícios e são vistos por todos os
+    processos (--processos N). Cada processo abre a própria conexão (seguro após fork).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn: Optional[sqlite3.Connection] = None
+        self.pid: Optional[int] = None
+
+    def connect(self) -> sqlite3.Connection:
+        if self.conn is None or self.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, dados TEXT NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_itens (job_id TEXT NOT NULL, idx INTEGER NOT NULL, "
+                "dados TEXT NOT NULL, PRIMARY KEY (job_id, idx))"
+            )
+            self.conn, self.pid = conn, os.getpid()
+        return self.conn
+
+    def create(self, job: Dict[str, Any]) -> None:
+        head = {k: v for k, v in job.items() if k != "itens"}
+        with self.lock:
+            conn = self.connect()
+            conn.execute("BEGIN")
+            conn.execute("INSERT INTO jobs (id, dados) VALUES (?, ?)", (job["id"], json.dumps(head, ensure_ascii=False)))
+            conn.executemany(
+                "INSERT INTO job_itens (job_id, idx, dados) VALUES (?, ?, ?)",
+                [(job["id"], i, json.dumps(item, ensure_ascii=False)) for i, item in enumerate(job["itens"])],
+            )
+            conn.execute("COMMIT")
+
+    def update(self, job_id: str, **fields) -> None:
+        with self.lock:
+            conn = self.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT dados FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            head = json.loads(row[0])
+            head.update(fields)
+            conn.execute("UPDATE jobs SET dados = ? WHERE id = ?", (json.dumps(head, ensure_ascii=False), job_id))
+            conn.execute("COMMIT")
+
+    def update_item(self, job_id: str, index: int, **fields) -> None:
+        with self.lock:
+            conn = self.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT dados FROM job_itens WHERE job_id = ? AND idx = ?", (job_id, index)).fetchone()
+            item = json.loads(row[0])
+            item.update(fields)
+            conn.execute("UPDATE job_itens SET dados = ? WHERE job_id = ? AND idx = ?",
+                         (json.dumps(item, ensure_ascii=False), job_id, index))
+            conn.execute("COMMIT")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            conn = self.connect()
+            row = conn.execute("SELECT dados FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if not row:
+                return None
+            job = json.loads(row[0])
+            job["itens"] = [json.loads(r[0]) for r in conn.execute(
+                "SELECT dados FROM job_itens WHERE job_id = ? ORDER BY idx", (job_id,))]
+            return job
+
+    def mark_interrupted(self) -> int:
+        """
+        Jobs pendentes/executando cujo processo dono (pid nesta máquina) já morreu viram
+        'interrompido', e os itens que não terminaram também. Jobs de processos vivos
+        (outros workers, outro servidor no mesmo arquivo) e de outra máquina não mudam.
+        """
+        host = socket.gethostname()
+        with self.lock:
+            conn = self.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            count = 0
+            for job_id, dados in conn.execute("SELECT id, dados FROM jobs").fetchall():
+                head = json.loads(dados)
+                if head.get("estado") not in (PENDENTE, EXECUTANDO):
+                    continue
+                if head.get("host", host) != host or (head.get("pid") and process_alive(head["pid"])):
+                    continue
+                ended = now_iso()
+                head.update({"estado": INTERROMPIDO, "terminado_em": ended})
+                conn.execute("UPDATE jobs SET dados = ? WHERE id = ?", (json.dumps(head, ensure_ascii=False), job_id))
+                for idx, item_dados in conn.execute(
+                        "SELECT idx, dados FROM job_itens WHERE job_id = ?", (job_id,)).fetchall():
+                    item = json.loads(item_dados)
+                    if item.get("estado") in (PENDENTE, EXECUTANDO):
+                        item["estado"] = INTERROMPIDO
+                        conn.execute("UPDATE job_itens SET dados = ? WHERE job_id = ? AND idx = ?",
+                                     (json.dumps(item, ensure_ascii=False), job_id, idx))
+                count += 1
+            conn.execute("COMMIT")
+            return count
+
+def make_store(path: Optional[str] = None):
+    """
+    Escolhe o backend de persistência.
+
+    Args:
+        path: Arquivo SQLite (ex.: jobs.db). Vazio/None = memória.
+
+    Returns:
+        MemoryJobStore ou SQLiteJobStore
+    """
+    if not path:
+        return MemoryJobStore()
+    store = SQLiteJobStore(path)
+    interrupted = store.mark_interrupted()
+    if interrupted:
+        logger.warning(f"{interrupted} job(s) de uma execução anterior marcados como '{INTERROMPIDO}'")
+    return store
+
+# =========================
+# FILA (pool limitado de workers no próprio processo)
+# =========================
+class JobQueue:
+    """
+    Fila de jobs com pool FIXO de workers e limite de jobs em aberto.
+    O executor nasce na primeira submissão (threads não sobrevivem a fork).
+    """
+
+    def __init__(self, store, workers: int = 4, max_pending: int = 100):
+        self.store = store
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.pid: Optional[int] = None
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        if self.executor is None or self.pid != os.getpid():
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            self.pid = os.getpid()
+        return self.executor
+
+    def submit(self, tipo: str, items: List[Dict[str, Any]], run_item: Callable[[Dict[str, Any]], Any]) -> str:
+        """
+        Registra um job e agenda a execução. Retorna na hora.
+
+        Args:
+            tipo: Nome do job (ex.: grupo/adicionar, grupo/lote)
+            items: 1 dicionário por técnico (vai para o status como está)
+            run_item: Função chamada para cada item; exceção = item com falha
+
+        Returns:
+            Id do job
+        """
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise QueueFull(f"Fila cheia ({self.max_pending} jobs em aberto)")
+            self.pending += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            self.store.create({
+                "id": job_id, "tipo": tipo, "estado": PENDENTE, "criado_em": now_iso(),
+                "pid": os.getpid(), "host": socket.gethostname(),
+                "iniciado_em": None, "terminado_em": None,
+                "total": len(items), "concluidos": 0, "falhas": 0,
+                "itens": [{**item, "estado": PENDENTE, "erro": None} for item in items],
+            })
+            self.get_executor().submit(self.run, job_id, items, run_item)
+        except Exception:
+            with self.lock:
+                self.pending -= 1
+            raise
+        return job_id
+
+    def run(self, job_id: str, items: List[Dict[str, Any]], run_item: Callable[[Dict[str, Any]], Any]) -> None:
+        done = failed = 0
+        try:
+            self.store.update(job_id, estado=EXECUTANDO, iniciado_em=now_iso())
+            for index, item in enumerate(items):
+                self.store.update_item(job_id, index, estado=EXECUTANDO)
+                try:
+                    result = run_item(item)
+                    done += 1
+                    self.store.update_item(job_id, index, estado=CONCLUIDO, resultado=result)
+                except Exception as e:
+                    failed += 1
+                    self.store.update_item(job_id, index, estado=FALHOU, erro=str(e))
+                self.store.update(job_id, concluidos=done, falhas=failed)
+            self.store.update(job_id, estado=FALHOU if failed and not done else CONCLUIDO, terminado_em=now_iso())
+        except Exception as e:
+            logger.error(f"Erro no job {job_id}: {str(e)}")
+            try:
+                self.store.update(job_id, estado=FALHOU, erro=str(e), terminado_em=now_iso())
+            except Exception:
+                pass
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Espera os jobs em andamento terminarem (desligamento gracioso)."""
+        if self.executor is not None and self.pid == os.getpid():
+            self.executor.shutdown(wait=wait)
@@ -0,0 +1,194 @@
+import re
+import time
+import weakref
+import threading
+import contextvars
+from collections.abc import Sequence
+from functools import wraps
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, Optional
+
+# Escopo aberto no contexto atual (None = sem memo: toda leitura vai ao Salesforce);
+# herdado pelas threads que copiam o contexto (map_chunks, hedge)
+SCOPE: contextvars.ContextVar = contextvars.ContextVar("sf_memo", default=None)
+
+# Resultado maior que isso não é guardado (cargas em lote já são compactadas e usadas 1 vez)
+MAX_RECORDS = 2000
+
+# Entradas por escopo; cheio, sai a mais antiga
+MAX_ENTRIES = 4096
+
+FROM_OBJECTS = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+ID_LITERAL = re.compile(r"'([a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?)'")
+
+# Escopos vivos: uma escrita invalida em todos (outras requisições em voo também leem a org)
+LIVE = weakref.WeakSet()
+LIVE_LOCK = threading.Lock()
+
+COUNTERS = {"acertos": 0, "faltas": 0, "invalidadas": 0, "escopos": 0}
+COUNTERS_LOCK = threading.Lock()
+
+def count(name: str, n: int = 1) -> None:
+    with COUNTERS_LOCK:
+        COUNTERS[name] += n
+
+def short_id(sf_id: str) -> str:
+    """Id de 15 ou 18 caracteres -> 15 (os 3 finais só codificam a caixa)."""
+    return sf_id[:15]
+
+def record_ids(value: Any) -> set:
+    """Ids (15) dos registros do resultado: Id e campos ...Id de cada linha."""
+    out = set()
+    for r in value if isinstance(value, Sequence) else ():
+        getter = getattr(r, "get", None)
+        if getter is None:
+            continue
+        for key in ("Id", "ServiceResourceId", "SkillId", "RelatedRecordId"):
+            v = getter(key)
+            if isinstance(v, str) and len(v) in (15, 18):
+                out.add(short_id(v))
+    return out
+
+class Entry:
+    __slots__ = ("value", "expires", "objects", "ids", "filtered")
+
+    def __init__(self, value: Any, expires: float, objects: FrozenSet[str], ids: FrozenSet[str], filtered: bool):
+        self.value = value
+        self.expires = expires
+        self.objects = objects    # sObjects lidos (FROM)
+        self.ids = ids            # Ids citados na consulta + Ids do resultado
+        self.filtered = filtered  # a consulta filtra por Id (senão qualquer escrita no sObject invalida)
+
+class Memo:
+    """
+    Resultados de leituras guardados durante um escopo (1 execução do CLI ou
+    1 requisição da API), pela chave da consulta normalizada. Diferente do
+    single-flight, o resultado fica para as próximas leituras iguais do escopo,
+    até o ttl (segundos; None = até o escopo fechar) ou uma escrita no mesmo
+    sObject/Id (invalidate).
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: Dict[Hashable, Entry] = {}
+        self.generation = 0  # muda a cada invalidação: leitura que começou antes não é guardada
+
+    def lookup(self, key: Hashable):
+        """(True, valor) se há entrada válida; senão (False, geração atual)."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry.expires and entry.expires <= time.monotonic():
+                    del self.entries[key]
+                else:
+                    return True, entry.value
+            return False, self.generation
+
+    def store(self, key: Hashable, value: Any, query: str, generation: int,
+              objects: Optional[Iterable[str]] = None) -> None:
+        if isinstance(value, Sequence) and len(value) > MAX_RECORDS:
+            return
+        text_ids = {short_id(i) for i in ID_LITERAL.findall(query or "")}
+        entry = Entry(
+            value,
+            time.monotonic() + self.ttl if self.ttl else 0.0,
+            frozenset(objects if objects is not None else (o.lower() for o in FROM_OBJECTS.findall(query or ""))),
+            frozenset(text_ids | record_ids(value)),
+            bool(text_ids),
+        )
+        with self.lock:
+            if generation != self.generation:
+                return
+            if key not in self.entries and len(self.entries) >= MAX_ENTRIES:
+                del self.entries[next(iter(self.entries))]
+            self.entries[key] = entry
+
+    def invalidate(self, sobject: str, ids: Iterable[str] = ()) -> int:
+        """Remove as entradas que leem `sobject` e citam algum dos ids (ou não filtram por Id)."""
+        sobject = sobject.lower()
+        ids = {short_id(i) for i in ids if i}
+        with self.lock:
+            self.generation += 1
+            stale = [k for k, e in self.entries.items()
+                     if sobject in e.objects and (not ids or not e.filtered or not ids.isdisjoint(e.ids))]
+            for k in stale:
+                del self.entries[k]
+        return len(stale)
+
+@contextmanager
+def scope(ttl: Optional[float] = None):
+    """
+    Abre um escopo de memo no contexto atual (o CLI abre 1 por execução; a API, 1 por
+    requisição). Dentro de um escopo já aberto, reaproveita o de fora.
+
+    with memo.scope(ttl=300):
+        ...
+    """
+    current = SCOPE.get()
+    if current is not None:
+        yield current
+        return
+    m = Memo(ttl)
+    with LIVE_LOCK:
+        LIVE.add(m)
+    count("escopos")
+    token = SCOPE.set(m)
+    try:
+        yield m
+    finally:
+        SCOPE.reset(token)
+        with LIVE_LOCK:
+            LIVE.discard(m)
+
+def remember(key: Hashable, loader: Callable[[], Any], query: str = "",
+             objects: Optional[Iterable[str]] = None) -> Any:
+    """
+    Valor da leitura `key` no escopo atual; na falta, chama loader() e guarda.
+    query: texto da SOQL (sObjects do FROM e Ids citados, para a invalidação);
+    objects: sObjects lidos, quando não dá para tirar do texto (ex.: Composite).
+    Só guarda o que loader() devolve: leitura que falhou tem que levantar exceção
+    (que passa direto, sem guardar nada), senão a falha vale até o fim do escopo.
+    """
+    m = SCOPE.get()
+    if m is None:
+        return loader()
+    hit, found = m.lookup(key)
+    if hit:
+        count("acertos")
+        return found
+    count("faltas")
+    value = loader()
+    m.store(key, value, query, found, None if objects is None else [o.lower() for o in objects])
+    return value
+
+def invalidate(sobject: str, ids: Iterable[str] = ()) -> None:
+    """Escrita em `sobject` (nos ids): tira dos escopos vivos o que ela pode ter mudado."""
+    with LIVE_LOCK:
+        scopes = list(LIVE)
+    ids = list(ids)
+    removed = sum(m.invalidate(sobject, ids) for m in scopes)
+    if removed:
+        count("invalidadas", removed)
+
+def invalidates(sobject: str, ids_of: Callable[..., Iterable[str]]):
+    """
+    Decorador das escritas: terminada a chamada (com sucesso ou não), invalida
+    `sobject` nos ids que ids_of(*args, **kwargs) devolve.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                invalidate(sobject, ids_of(*args, **kwargs))
+        return wrapper
+    return decorator
+
+def stats() -> Dict[str, Any]:
+    with COUNTERS_LOCK:
+        out = dict(COUNTERS)
+    with LIVE_LOCK:
+        out["abertos"] = len(LIVE)
+    return out
@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import logging
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from sf_query import get_all_query_results
+
+# Configuração do logging
+logger = logging.getLogger("salesforce_api")
+
+# Reconstrói o índice do zero depois desse tempo (pega registros apagados/renomeados fora do modstamp)
+FULL_REBUILD_SECONDS = 24 * 3600
+
+# Nota mínima (Dice de trigramas, 0..1) para aparecer como sugestão
+MIN_SCORE = 0.35
+
+def fold(text: str) -> str:
+    """Normaliza para comparar: sem acento, minúsculo, só letras/números e 1 espaço entre palavras."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in text).split())
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def soql_datetime(modstamp: str) -> str:
+    """'2024-05-01T12:30:00.000+0000' -> '2024-05-01T12:30:00Z' (literal aceito pela SOQL)."""
+    return modstamp[:19] + "Z"
+
+class NameIndex:
+    """
+    Índice local dos nomes de ServiceResource (sem acento/caixa, trigramas).
+    Resolve nome -> técnico sem ir ao Salesforce e, quando não há match seguro,
+    devolve os candidatos mais parecidos na hora.
+    """
+
+    def __init__(self, instance_url: str = ""):
+        self.reset(instance_url)
+
+    def reset(self, instance_url: str = "") -> None:
+        """Esvazia o índice (antes de uma reconstrução completa)."""
+        self.instance_url = instance_url
+        self.records: Dict[str, Tuple[str, bool]] = {}  # id -> (nome, ativo)
+        self.folded: Dict[str, str] = {}                # id -> nome normalizado
+        self.by_folded: Dict[str, set] = {}             # nome normalizado -> {ids}
+        self.postings: Dict[str, set] = {}              # trigrama -> {ids}
+        self.modstamp = ""                              # maior SystemModstamp visto
+        self.built_at = 0.0
+
+    # ---------- manutenção ----------
+    def upsert(self, sr_id: str, name: str, is_active: bool) -> None:
+        self.remove(sr_id)
+        key = fold(name)
+        self.records[sr_id] = (name, bool(is_active))
+        self.folded[sr_id] = key
+        self.by_folded.setdefault(key, set()).add(sr_id)
+        for t in trigrams(f" {key} "):
+            self.postings.setdefault(t, set()).add(sr_id)
+
+    def remove(self, sr_id: str) -> None:
+        key = self.folded.pop(sr_id, None)
+        if key is None:
+            return
+        self.records.pop(sr_id, None)
+        ids = self.by_folded.get(key)
+        if ids:
+            ids.discard(sr_id)
+            if not ids:
+                del self.by_folded[key]
+        for t in trigrams(f" {key} "):
+            ids = self.postings.get(t)
+            if ids:
+                ids.discard(sr_id)
+                if not ids:
+                    del self.postings[t]
+
+    def apply(self, rows: List[Dict[str, Any]]) -> int:
+        for r in rows:
+            self.upsert(r["Id"], r.get("Name") or "", r.get("IsActive"))
+            stamp = r.get("SystemModstamp") or ""
+            if stamp > self.modstamp:
+                self.modstamp = stamp
+        return len(rows)
+
+    def refresh(self, instance_url: str, headers: Dict, api_version: str, columnar: bool = False) -> int:
+        """
+        Atualização incremental: só o que mudou desde o último SystemModstamp, mais os
+        apagados nesse intervalo (queryAll, IsDeleted = true), que saem do índice; ou tudo,
+        se o índice está vazio ou velho demais (pega também o que já saiu da lixeira).
+        columnar: lê a org em colunas (columnar.Columns) em vez de 1 dict por registro.
+
+        Returns:
+            Nº de registros lidos do Salesforce
+        """
+        full = not self.records or time.time() - self.built_at > FULL_REBUILD_SECONDS
+        since = "" if full else self.modstamp
+        q = "SELECT Id, Name, IsActive, SystemModstamp FROM ServiceResource"
+        if since:
+            q += f" WHERE SystemModstamp >= {soql_datetime(since)}"
+        rows = get_all_query_results(instance_url, headers, q, api_version, columnar=columnar)
+        if full and rows:
+            self.reset(instance_url)
+            self.built_at = time.time()
+        elif full and self.records:
+            logger.warning("Índice de nomes: reconstrução não trouxe registros; mantendo o índice anterior")
+        count = self.apply(rows)
+        removed = 0
+        if since:
+            deleted = get_all_query_results(
+                instance_url, headers,
+                f"SELECT Id FROM ServiceResource WHERE IsDeleted = true AND SystemModstamp >= {soql_datetime(since)}",
+                api_version, query_all=True)
+            for r in deleted:
+                if r["Id"] in self.records:
+                    self.remove(r["Id"])
+                    removed += 1
+            count += len(deleted)
+        logger.info("Índice de nomes: %s | %d registro(s) | %d apagado(s) | total %d",
+                    "completo" if full else "incremental", count, removed, len(self.records))
+        return count
+
+    # ---------- busca ----------
+    def entry(self, sr_id: str) -> Dict[str, Any]:
+        name, active = self.records[sr_id]
+        return {"id": sr_id, "name": name, "is_active": active}
+
+    def containing(self, key: str) -> List[str]:
+        """Ids cujo nome normalizado contém `key` (o LIKE '%...%', mas sem acento/caixa)."""
+        grams = sorted((self.postings.get(t, set()) for t in trigrams(key)), key=len)
+        if not grams:
+            return [i for i, k in self.folded.items() if key in k] if key else []
+        ids = set(grams[0])
+        for g in grams[1:]:
+            ids &= g
+            if not ids:
+                break
+        return [i for i in ids if key in self.folded[i]]
+
+    def search(self, text: str, limit: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
+        """Candidatos mais parecidos (Dice de trigramas), do melhor para o pior."""
+        key = fold(text)
+        grams = trigrams(f" {key} ")
+        if not grams:
+            return []
+        shared: Dict[str, int] = {}
+        for t in grams:
+            for i in self.postings.get(t, ()):
+                shared[i] = shared.get(i, 0) + 1
+        scored = []
+        for i, n in shared.items():
+            score = 2.0 * n / (len(grams) + len(trigrams(f" {self.folded[i]} ")))
+            if score >= MIN_SCORE:
+                scored.append((score, i))
+        scored.sort(key=lambda x: (-x[0], self.records[x[1]][0]))
+        return [(round(score, 3), self.entry(i)) for score, i in scored[:limit]]
+
+    def resolve(self, text: str) -> Dict[str, Any]:
+        """
+        Resolve um nome como o fluxo antigo (exato, depois LIKE), só que local e sem acento/caixa.
+        Parecido mas não igual NÃO é aplicado: vira erro com as sugestões.
+
+        Returns:
+            {"id", "name", "is_active"}
+
+        Raises:
+            ValueError: nome duplicado/ambíguo ou não encontrado (com os candidatos)
+        """
+        key = fold(text)
+        exact = sorted(self.by_folded.get(key, ()))
+        if len(exact) == 1:
+            return self.entry(exact[0])
+        if len(exact) > 1:
+            raise ValueError(f"Nome duplicado. Use o Id 0Hn... | encontrados: {', '.join(exact)}")
+
+        contains = sorted(self.containing(key), key=lambda i: self.records[i][0]) if key else []
+        if len(contains) == 1:
+            return self.entry(contains[0])
+        if len(contains) > 1:
+            shown = ", ".join(f"{self.records[i][0]} ({i})" for i in contains[:10])
+            more = f" (+{len(contains) - 10})" if len(contains) > 10 else ""
+            raise ValueError(f"Nome ambíguo. Use o Id 0Hn... | encontrados: {shown}{more}")
+
+        suggestions = self.search(text)
+        if suggestions:
+            shown = ", ".join(f"{e['name']} ({e['id']}, {int(score * 100)}%)" for score, e in suggestions)
+            raise ValueError(f"Nenhum técnico encontrado com: {text} | parecidos: {shown}")
+        raise ValueError(f"Nenhum técnico encontrado com: {text}")
+
+    # ---------- cache em arquivo ----------
+    def save(self, path: str) -> None:
+        data = {
+            "instance_url": self.instance_url,
+            "modstamp": self.modstamp,
+            "built_at": self.built_at,
+            "records": [[i, name, active] for i, (name, active) in self.records.items()],
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, instance_url: str) -> Optional["NameIndex"]:
+        """Lê o cache; None se não existe, está corrompido ou é de outra org."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("instance_url") != instance_url:
+            return None
+        index = cls(instance_url)
+        for sr_id, name, active in data.get("records") or []:
+            index.upsert(sr_id, name, active)
+        index.modstamp = data.get("modstamp") or ""
+        index.built_at = float(data.get("built_at") or 0)
+        return index
+
+def open_index(instance_url: str, headers: Dict, api_version: str, path: Optional[str] = None,
+               columnar: bool = False) -> NameIndex:
+    """
+    Carrega o índice do cache (se houver), atualiza incrementalmente e salva de volta.
+
+    Args:
+        instance_url: URL da instância do Salesforce
+        headers: Cabeçalhos de autorização
+        api_version: Versão da API
+        path: Arquivo de cache (None = só em memória)
+        columnar: Consulta decodificada em colunas (menos memória na carga completa)
+
+    Returns:
+        NameIndex pronto para resolve()/search()
+    """
+    index = (NameIndex.load(path, instance_url) if path else None) or NameIndex(instance_url)
+    index.refresh(instance_url, headers, api_version, columnar=columnar)
+    if path:
+        try:
+            index.save(path)
+        except OSError as e:
+            logger.warning("Não consegui salvar o índice de nomes em %s: %s", path, e)
+    return index
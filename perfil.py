@@ -0,0 +1,227 @@
+import io
+import re
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from functools import wraps
+from typing import Any, Dict, Optional
+
+import sf_http
+
+# Perfil ativo (None = --perfil desligado; as fases viram chamadas diretas)
+ACTIVE: Optional["Profiler"] = None
+
+OUTSIDE = "(fora de fase)"
+
+def operation_name(method: str, url: str) -> str:
+    """Agrupa URLs do Salesforce por operação (ex.: 'GET query', 'POST collections')."""
+    path = url.split("?", 1)[0]
+    if "/oauth2/token" in path:
+        return f"{method} token"
+    m = re.search(r"/services/data/v[\d.]+/(.*)$", path)
+    rest = (m.group(1) if m else path).rstrip("/")
+    if rest == "query":
+        return f"{method} query"
+    if rest.startswith("query/"):
+        return f"{method} queryMore"
+    if rest.startswith("composite/sobjects"):
+        return f"{method} collections"
+    if rest.startswith("composite"):
+        return f"{method} composite"
+    if rest.startswith("sobjects/"):
+        return f"{method} sobjects/{rest.split('/')[1]}"
+    if rest.startswith("jobs/ingest"):
+        parts = rest.split("/")
+        return f"{method} bulk{'/' + parts[3] if len(parts) > 3 else ''}"
+    return f"{method} {rest}"
+
+class Profiler:
+    """
+    Tempo de parede por fase (exclusivo: fase aninhada pausa a de fora) e, por fase e por
+    operação do Salesforce, nº de chamadas e bytes enviados/recebidos.
+    As fases valem para a thread principal; chamadas HTTP de threads auxiliares
+    (--paralelo) entram na fase em que a thread principal está.
+    """
+
+    def __init__(self, cprofile_path: Optional[str] = None, memoria: bool = False):
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.main_thread = threading.get_ident()
+        self.stack = []  # [[fase, início], ...]
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.ops: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.cprofile_path = cprofile_path
+        self.cprofile = cProfile.Profile() if cprofile_path else None
+        self.memoria = memoria
+
+    def phase_stats(self, name: str) -> Dict[str, Any]:
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = {"s": 0.0, "vezes": 0, "sf_chamadas": 0, "bytes_env": 0, "bytes_rec": 0}
+        return stats
+
+    def enter(self, name: str) -> bool:
+        if threading.get_ident() != self.main_thread or (self.stack and self.stack[-1][0] == name):
+            return False
+        now = time.perf_counter()
+        with self.lock:
+            if self.stack:
+                outer = self.stack[-1]
+                self.phase_stats(outer[0])["s"] += now - outer[1]
+            self.phase_stats(name)["vezes"] += 1
+            self.stack.append([name, now])
+        return True
+
+    def leave(self) -> None:
+        now = time.perf_counter()
+        with self.lock:
+            name, start = self.stack.pop()
+            self.phase_stats(name)["s"] += now - start
+            if self.stack:
+                self.stack[-1][1] = now
+
+    def on_response(self, method: str, url: str, response, elapsed: float) -> None:
+        body = response.request.body if response.request is not None else None
+        sent = len(body.encode("utf-8") if isinstance(body, str) else body or b"")
+        received = len(response.content or b"")
+        op = operation_name(method, url)
+        with self.lock:
+            phase = self.stack[-1][0] if self.stack else OUTSIDE
+            ps = self.phase_stats(phase)
+            ps["sf_chamadas"] += 1
+            ps["bytes_env"] += sent
+            ps["bytes_rec"] += received
+            stats = self.ops.setdefault(op, {"chamadas": 0, "s": 0.0, "bytes_env": 0, "bytes_rec": 0, "erros": 0})
+            stats["chamadas"] += 1
+            stats["s"] += elapsed
+            stats["bytes_env"] += sent
+            stats["bytes_rec"] += received
+            if response.status_code >= 400:
+                stats["erros"] += 1
+
+    def report(self) -> Dict[str, Any]:
+        total = (self.finished or time.perf_counter()) - self.started
+        phases = {k: dict(v) for k, v in self.phases.items()}
+        inside = sum(v["s"] for k, v in phases.items() if k != OUTSIDE)
+        phases.setdefault(OUTSIDE, {"s": 0.0, "vezes": 0, "sf_chamadas": 0, "bytes_env": 0, "bytes_rec": 0})
+        phases[OUTSIDE]["s"] = max(0.0, total - inside)
+        out = {
+            "total_s": round(total, 4),
+            "fases": {k: {**v, "s": round(v["s"], 4)} for k, v in sorted(phases.items(), key=lambda kv: -kv[1]["s"])},
+            "operacoes": {k: {**v, "s": round(v["s"], 4)} for k, v in sorted(self.ops.items(), key=lambda kv: -kv[1]["s"])},
+        }
+        if self.cprofile_path:
+            out["cprofile"] = self.cprofile_path
+        if self.memoria and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            out["memoria"] = {
+                "atual_bytes": current,
+                "pico_bytes": peak,
+                "top": [{"onde": str(s.traceback), "bytes": s.size, "blocos": s.count} for s in top],
+            }
+        return out
+
+def fase(name: str):
+    """Decorador: o tempo da função entra na fase `name` (custo ~zero sem --perfil)."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            prof = ACTIVE
+            if prof is None or not prof.enter(name):
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                prof.leave()
+        return wrapper
+    return decorator
+
+def record_response(method, url, response, elapsed):
+    prof = ACTIVE
+    if prof is not None:
+        prof.on_response(method, url, response, elapsed)
+
+sf_http.on_response(record_response)
+
+def start(cprofile_path: Optional[str] = None, memoria: bool = False) -> Profiler:
+    """Liga o perfil (e, se pedido, o cProfile e o tracemalloc) para o resto do processo."""
+    global ACTIVE
+    prof = Profiler(cprofile_path, memoria)
+    if memoria:
+        tracemalloc.start()
+    ACTIVE = prof
+    if prof.cprofile:
+        prof.cprofile.enable()
+    return prof
+
+def human_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024.0
+    return f"{n:.1f}GB"
+
+def format_table(report: Dict[str, Any]) -> str:
+    total = report["total_s"] or 1e-9
+    lines = [f"\n⏱  PERFIL — total {report['total_s']:.2f}s", ""]
+    lines.append(f"{'FASE':<22} {'TEMPO':>9} {'%':>6} {'VEZES':>7} {'SF':>6} {'ENVIADO':>9} {'RECEBIDO':>9}")
+    for name, v in report["fases"].items():
+        lines.append(f"{name:<22} {v['s']:>8.2f}s {100 * v['s'] / total:>5.1f}% {v['vezes']:>7} {v['sf_chamadas']:>6} "
+                     f"{human_bytes(v['bytes_env']):>9} {human_bytes(v['bytes_rec']):>9}")
+    if report["operacoes"]:
+        lines.append("")
+        lines.append(f"{'OPERAÇÃO SALESFORCE':<28} {'CHAMADAS':>8} {'TEMPO':>9} {'MÉDIA':>8} {'ERROS':>6} {'ENVIADO':>9} {'RECEBIDO':>9}")
+        for name, v in report["operacoes"].items():
+            avg = 1000 * v["s"] / v["chamadas"] if v["chamadas"] else 0.0
+            lines.append(f"{name:<28} {v['chamadas']:>8} {v['s']:>8.2f}s {avg:>6.0f}ms {v['erros']:>6} "
+                         f"{human_bytes(v['bytes_env']):>9} {human_bytes(v['bytes_rec']):>9}")
+    if "memoria" in report:
+        mem = report["memoria"]
+        lines.append("")
+        lines.append(f"MEMÓRIA (tracemalloc): atual {human_bytes(mem['atual_bytes'])} | pico {human_bytes(mem['pico_bytes'])}")
+        for item in mem["top"][:5]:
+            lines.append(f"  {human_bytes(item['bytes']):>9}  {item['onde']}")
+    return "\n".join(lines)
+
+def finish(prof: Profiler, json_path: Optional[str] = None, table: bool = True, stream=None) -> Dict[str, Any]:
+    """
+    Desliga o perfil e entrega o relatório.
+
+    Args:
+        prof: Perfil devolvido por start()
+        json_path: Se informado, grava o relatório em JSON nesse arquivo
+        table: Imprime a tabela resumo
+        stream: Onde imprimir (padrão: stderr, para não misturar com --saida)
+
+    Returns:
+        Relatório (dicionário)
+    """
+    global ACTIVE
+    if prof.cprofile:
+        prof.cprofile.disable()
+    prof.finished = time.perf_counter()
+    report = prof.report()
+    ACTIVE = None
+    if prof.memoria:
+        tracemalloc.stop()
+
+    stream = stream or sys.stderr
+    if prof.cprofile:
+        prof.cprofile.dump_stats(prof.cprofile_path)
+    if table:
+        print(format_table(report), file=stream)
+        if prof.cprofile:
+            buf = io.StringIO()
+            pstats.Stats(prof.cprofile, stream=buf).sort_stats("cumulative").print_stats(12)
+            print(f"\ncProfile (top 12 cumulativo; completo em {prof.cprofile_path}):", file=stream)
+            print(buf.getvalue().strip(), file=stream)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
@@ -1,14 +1,14 @@
-import requests
+import sf_http
+import sf_log
+import sf_trace
 import logging
 from typing import Dict, Optional
 
-# Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# Configuração do logging (fila + thread de escrita; SF_LOG_JSON=1 para JSON)
+sf_log.setup()
 logger = logging.getLogger("salesforce_api")
 
+@sf_trace.traced("sf.auth.token", "client")
 def get_salesforce_token(
     domain: str,
     client_id: str,
@@ -46,19 +46,23 @@ def get_salesforce_token(
             'Content-Type': 'application/x-www-form-urlencoded'
         }
         
-        logger.info(f"Realizando autenticação no Salesforce: {domain}")
-        response = requests.post(url, data=payload, headers=headers, verify=False)
+        logger.info("Realizando autenticação no Salesforce: %s", domain)
+        response = sf_http.request("POST", url, data=payload, headers=headers, verify=False, idempotent=True)
         
         if response.status_code == 200:
             token_data = response.json()
             logger.info("Autenticação realizada com sucesso")
             return token_data
         else:
-            logger.error(f"Falha na autenticação: {response.status_code} - {response.text}")
+            logger.error("Falha na autenticação: %s - %s", response.status_code, response.text)
+            sf_trace.current().error(f"HTTP {response.status_code}")
             return None
             
+    except sf_http.DeadlineExceeded:
+        raise
     except Exception as e:
-        logger.error(f"Erro ao obter token: {str(e)}")
+        logger.error("Erro ao obter token: %s", e)
+        sf_trace.current().error(str(e))
         return None
 
 def get_auth_headers(token_data: Dict) -> Dict:
@@ -0,0 +1,285 @@
+import csv
+import io
+import time
+import sf_http
+import logging
+from typing import Dict, Optional, Any, List
+
+# Configuração do logging
+logger = logging.getLogger("salesforce_api")
+
+def create_ingest_job(
+    instance_url: str,
+    auth_headers: Dict,
+    sobject: str,
+    operation: str,
+    api_version: str = "v55.0"
+) -> Optional[Dict[str, Any]]:
+    """
+    Cria um job de ingestão do Bulk API 2.0 (CSV).
+
+    Args:
+        instance_url: URL da instância do Salesforce (obtida após autenticação)
+        auth_headers: Cabeçalhos de autorização (obtidos com get_auth_headers)
+        sobject: Objeto alvo (ex: ServiceResourceSkill)
+        operation: insert, delete, update, upsert ou hardDelete
+        api_version: Versão da API do Salesforce
+
+    Returns:
+        Dicionário com os dados do job criado ou None em caso de falha
+    """
+    try:
+        url = f"{instance_url}/services/data/{api_version}/jobs/ingest"
+        payload = {
+            "object": sobject,
+            "operation": operation,
+            "contentType": "CSV",
+            "lineEnding": "LF",
+        }
+
+        logger.info(f"Criando job Bulk API 2.0: {operation} {sobject}")
+        response = sf_http.request("POST", url, headers={**auth_headers, "Content-Type": "application/json"}, json=payload, timeout=60)
+
+        if response.status_code in (200, 201):
+            return response.json()
+        else:
+            logger.error(f"Falha ao criar job: {response.status_code} - {response.text}")
+            return None
+
+    except sf_http.DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao criar job Bulk API 2.0: {str(e)}")
+        return None
+
+def upload_job_data(
+    instance_url: str,
+    auth_headers: Dict,
+    job_id: str,
+    csv_data: str,
+    api_version: str = "v55.0"
+) -> bool:
+    """
+    Envia o CSV com os registros do job e marca o job como UploadComplete.
+
+    Args:
+        instance_url: URL da instância do Salesforce (obtida após autenticação)
+        auth_headers: Cabeçalhos de autorização (obtidos com get_auth_headers)
+        job_id: Id do job criado com create_ingest_job
+        csv_data: Conteúdo CSV (cabeçalho + linhas, terminadas em LF)
+        api_version: Versão da API do Salesforce
+
+    Returns:
+        True se o upload e o fechamento do job deram certo, False caso contrário
+    """
+    try:
+        base = f"{instance_url}/services/data/{api_version}/jobs/ingest/{job_id}"
+
+        logger.info(f"Enviando dados do job {job_id} ({len(csv_data.encode('utf-8'))} bytes)")
+        response = sf_http.request("PUT", f"{base}/batches", headers={**auth_headers, "Content-Type": "text/csv"},
+                                   data=csv_data.encode("utf-8"), timeout=300)
+        if response.status_code >= 400:
+            logger.error(f"Falha no upload do job: {response.status_code} - {response.text}")
+            return False
+
+        response = sf_http.request("PATCH", base, headers={**auth_headers, "Content-Type": "application/json"},
+                                   json={"state": "UploadComplete"}, timeout=60)
+        if response.status_code >= 400:
+            logger.error(f"Falha ao fechar o job: {response.status_code} - {response.text}")
+            return False
+        return True
+
+    except sf_http.DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao enviar dados do job: {str(e)}")
+        return False
+
+def abort_job(
+    instance_url: str,
+    auth_headers: Dict,
+    job_id: str,
+    api_version: str = "v55.0"
+) -> bool:
+    """
+    Aborta um job de ingestão (PATCH state=Aborted), ex.: upload que falhou no meio.
+    Roda com prazo próprio (sf_http.detached): também serve quando o prazo de fora acabou.
+
+    Args:
+        instance_url: URL da instância do Salesforce (obtida após autenticação)
+        auth_headers: Cabeçalhos de autorização (obtidos com get_auth_headers)
+        job_id: Id do job
+        api_version: Versão da API do Salesforce
+
+    Returns:
+        True se o Salesforce aceitou o Aborted, False caso contrário
+    """
+    url = f"{instance_url}/services/data/{api_version}/jobs/ingest/{job_id}"
+    try:
+        with sf_http.detached(60):
+            response = sf_http.request("PATCH", url, headers={**auth_headers, "Content-Type": "application/json"},
+                                       json={"state": "Aborted"}, timeout=60)
+        if response.status_code >= 400:
+            logger.error(f"Falha ao abortar o job {job_id}: {response.status_code} - {response.text}")
+            return False
+        logger.warning(f"Job {job_id} abortado")
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao abortar o job {job_id}: {str(e)}")
+        return False
+
+def wait_for_job(
+    instance_url: str,
+    auth_headers: Dict,
+    job_id: str,
+    api_version: str = "v55.0",
+    poll_interval: float = 2.0,
+    max_wait: float = 3600.0
+) -> Optional[Dict[str, Any]]:
+    """
+    Consulta o job até ele terminar (JobComplete, Failed ou Aborted).
+
+    Args:
+        instance_url: URL da instância do Salesforce (obtida após autenticação)
+        auth_headers: Cabeçalhos de autorização (obtidos com get_auth_headers)
+        job_id: Id do job
+        api_version: Versão da API do Salesforce
+        poll_interval: Intervalo inicial entre consultas (segundos, cresce até 30s)
+        max_wait: Tempo máximo de espera (segundos)
+
+    Returns:
+        Dicionário com o estado final do job ou None em caso de falha/timeout
+    """
+    url = f"{instance_url}/services/data/{api_version}/jobs/ingest/{job_id}"
+    started = time.monotonic()
+    interval = poll_interval
+
+    while time.monotonic() - started < max_wait:
+        try:
+            response = sf_http.request("GET", url, headers=auth_headers, timeout=60)
+            if response.status_code != 200:
+                logger.error(f"Falha ao consultar job: {response.status_code} - {response.text}")
+                return None
+            info = response.json()
+            state = info.get("state")
+            if state in ("JobComplete", "Failed", "Aborted"):
+                logger.info(
+                    f"Job {job_id} finalizado: {state} | processados={info.get('numberRecordsProcessed')} "
+                    f"falhas={info.get('numberRecordsFailed')}"
+                )
+                return info
+        except sf_http.DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao consultar job: {str(e)}")
+            return None
+        left = sf_http.remaining()
+        time.sleep(interval if left is None else max(0.0, min(interval, left)))
+        interval = min(30.0, interval * 1.5)
+
+    logger.error(f"Timeout aguardando o job {job_id}")
+    return None
+
+def get_job_results(
+    instance_url: str,
+    auth_headers: Dict,
+    job_id: str,
+    kind: str,
+    api_version: str = "v55.0"
+) -> List[Dict[str, str]]:
+    """
+    Baixa os resultados de um job (CSV) e devolve como lista de dicionários.
+
+    Args:
+        instance_url: URL da instância do Salesforce (obtida após autenticação)
+        auth_headers: Cabeçalhos de autorização (obtidos com get_auth_headers)
+        job_id: Id do job
+        kind: successfulResults, failedResults ou unprocessedrecords
+        api_version: Versão da API do Salesforce
+
+    Returns:
+        Lista de linhas (colunas sf__Id/sf__Error + colunas originais)
+    """
+    try:
+        url = f"{instance_url}/services/data/{api_version}/jobs/ingest/{job_id}/{kind}/"
+        response = sf_http.request("GET", url, headers=auth_headers, timeout=300)
+        if response.status_code != 200:
+            logger.error(f"Falha ao obter {kind}: {response.status_code} - {response.text}")
+            return []
+        response.encoding = "utf-8"
+        return list(csv.DictReader(io.StringIO(response.text)))
+    except sf_http.DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao obter {kind} do job: {str(e)}")
+        return []
+
+def to_csv(rows: List[Dict[str, Any]], fields: List[str]) -> str:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=fields, lineterminator="\n", extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({k: ("" if row.get(k) is None else row.get(k)) for k in fields})
+    return out.getvalue()
+
+def run_ingest_job(
+    instance_url: str,
+    auth_headers: Dict,
+    sobject: str,
+    operation: str,
+    rows: List[Dict[str, Any]],
+    fields: List[str],
+    api_version: str = "v55.0",
+    poll_interval: float = 2.0,
+    max_wait: float = 3600.0
+) -> Dict[str, Any]:
+    """
+    Executa um job de ingestão completo: cria, envia o CSV, aguarda e baixa os resultados.
+
+    Args:
+        instance_url: URL da instância do Salesforce (obtida após autenticação)
+        auth_headers: Cabeçalhos de autorização (obtidos com get_auth_headers)
+        sobject: Objeto alvo
+        operation: Operação do job (insert, delete...)
+        rows: Registros a enviar
+        fields: Colunas do CSV (na ordem)
+        api_version: Versão da API do Salesforce
+        poll_interval: Intervalo inicial entre consultas do estado
+        max_wait: Tempo máximo de espera (segundos)
+
+    Returns:
+        Dicionário com job_id, state, successful, failed e unprocessed
+        (listas de linhas CSV) e error (mensagem, se o job nem rodou)
+    """
+    out = {"job_id": None, "state": None, "successful": [], "failed": [], "unprocessed": [], "error": None}
+
+    job = create_ingest_job(instance_url, auth_headers, sobject, operation, api_version)
+    if not job or not job.get("id"):
+        out["error"] = "Falha ao criar job Bulk API 2.0"
+        return out
+    out["job_id"] = job["id"]
+
+    # job que não chegou a UploadComplete fica Open na org até expirar: aborta antes de sair
+    try:
+        uploaded = upload_job_data(instance_url, auth_headers, job["id"], to_csv(rows, fields), api_version)
+    except BaseException:
+        abort_job(instance_url, auth_headers, job["id"], api_version)
+        raise
+    if not uploaded:
+        abort_job(instance_url, auth_headers, job["id"], api_version)
+        out["state"] = "Aborted"
+        out["error"] = f"Falha ao enviar dados do job {job['id']} (job abortado)"
+        return out
+
+    info = wait_for_job(instance_url, auth_headers, job["id"], api_version, poll_interval, max_wait)
+    if not info:
+        out["error"] = f"Job {job['id']} não terminou (timeout ou erro ao consultar)"
+        return out
+    out["state"] = info.get("state")
+    if info.get("state") != "JobComplete":
+        out["error"] = f"Job {job['id']} terminou como {info.get('state')}: {info.get('errorMessage') or ''}".strip()
+
+    out["successful"] = get_job_results(instance_url, auth_headers, job["id"], "successfulResults", api_version)
+    out["failed"] = get_job_results(instance_url, auth_headers, job["id"], "failedResults", api_version)
+    out["unprocessed"] = get_job_results(instance_url, auth_headers, job["id"], "unprocessedrecords", api_version)
+    return out
@@ -0,0 +1,536 @@
+import os
+import re
+import time
+import threading
+import contextvars
+import requests
+import logging
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from typing import Callable, List, Optional
+
+# Configuração do logging
+logger = logging.getLogger("salesforce_api")
+
+# Tamanho do pool de conexões keep-alive por host (ajuste com configure())
+POOL_SIZE = 20
+
+# Transporte no lugar do HTTPAdapter (ex.: reprodução de um cassete, ver sf_replay); None = rede
+TRANSPORT = None
+
+# Tentativas extras quando o Salesforce responde 429/503/limite de concorrência (com backoff)
+MAX_RETRIES = 3
+
+# Timeout (s) de cada chamada quando nem o chamador nem o prazo (deadline) definem um
+DEFAULT_TIMEOUT = float(os.getenv("SF_TIMEOUT", "60"))
+
+# Prazo (s) do trabalho compartilhado por várias requisições (lote de escrita juntado): não
+# herda o prazo de quem o abriu, cada uma espera pelo seu (ver detached)
+SHARED_TIMEOUT = float(os.getenv("SF_PRAZO_COMPARTILHADO", "120"))
+
+# Prazo da operação atual (time.monotonic() absoluto), herdado por tudo que roda no mesmo contexto
+DEADLINE: contextvars.ContextVar = contextvars.ContextVar("sf_deadline", default=None)
+
+class DeadlineExceeded(TimeoutError):
+    """O prazo da operação (ex.: requisição da API) acabou antes de terminar as chamadas ao Salesforce."""
+
+SESSION: Optional[requests.Session] = None
+SESSION_LOCK = threading.Lock()
+UNAUTHORIZED_HOOKS: List[Callable[[], None]] = []
+RESPONSE_HOOKS: List[Callable[[str, str, requests.Response, float], None]] = []
+
+class AdaptiveLimiter:
+    """
+    Limita as requisições simultâneas ao Salesforce com AIMD (como o controle de congestionamento do TCP):
+    - cada resposta boa aumenta a janela em ~1 por "rodada" (+1/janela);
+    - 429/503/REQUEST_LIMIT_EXCEEDED cortam a janela pela metade;
+    - UNABLE_TO_LOCK_ROW corta 25% (disputa de lock no mesmo técnico);
+    - latência muito acima da mínima observada corta 10% (fila do lado do Salesforce); a linha
+      de base é por classe de operação (ver latency_class) e escritas/Bulk/login ficam de fora;
+    - erro sem resposta (conexão, SSL) e o nosso prazo não mexem na janela.
+    No máximo 1 corte por intervalo (~latência média), para uma rajada de erros não zerar a janela.
+    """
+
+    def __init__(self, initial: float = 8, minimum: float = 1, maximum: float = 64, latency_factor: float = 4.0):
+        self.window = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None  # todas as respostas boas (só dá o intervalo entre cortes)
+        self.baselines = {}  # classe da operação -> [latência média (EWMA), mínima]
+        self.last_decrease = 0.0
+        self.counts = {"ok": 0, "throttle": 0, "lock": 0, "lenta": 0, "prazo": 0, "erro": 0}
+        self.cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Espera uma vaga (até `timeout` segundos; None = sem limite). False = não conseguiu."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.in_flight >= max(1, int(self.window)):
+                left = None if end is None else end - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self.cond.wait(left)
+            self.in_flight += 1
+            return True
+
+    def release(self, signal: str, latency: float, op: Optional[str] = None) -> None:
+        """
+        Devolve a vaga e ajusta a janela.
+
+        Args:
+            signal: ok, throttle (429/503/limite), lock (UNABLE_TO_LOCK_ROW), prazo (cancelada
+                    pelo nosso prazo) ou erro (sem resposta); prazo e erro não dizem nada sobre
+                    a carga do Salesforce e não mexem na janela
+            latency: Duração da requisição (segundos)
+            op: Classe da operação para a linha de base de latência (None = não entra no sinal)
+        """
+        with self.cond:
+            saturated = self.in_flight >= int(self.window)
+            self.in_flight -= 1
+            now = time.monotonic()
+            if signal == "ok":
+                self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+                if op is not None:
+                    base = self.baselines.get(op)
+                    if base is None:
+                        base = self.baselines[op] = [latency, latency]
+                    else:
+                        base[0] = 0.8 * base[0] + 0.2 * latency
+                        base[1] = min(base[1], latency)
+                    if base[0] > self.latency_factor * max(base[1], 0.005):
+                        signal = "lenta"
+            self.counts[signal] += 1
+
+            if signal in ("prazo", "erro"):
+                pass
+            elif signal == "ok":
+                # só cresce se a janela estava cheia (sem demanda, não há o que provar)
+                if saturated:
+                    self.window = min(self.maximum, self.window + 1.0 / self.window)
+            elif now - self.last_decrease >= max(0.2, self.latency_ewma or 0.0):
+                factor = {"throttle": 0.5, "lock": 0.75, "lenta": 0.9}[signal]
+                self.window = max(self.minimum, self.window * factor)
+                self.last_decrease = now
+            self.cond.notify_all()
+
+    def stats(self) -> dict:
+        with self.cond:
+            return {
+                "janela": round(self.window, 2),
+                "em_voo": self.in_flight,
+                "min": self.minimum,
+                "max": self.maximum,
+                "latencia_media_ms": round((self.latency_ewma or 0.0) * 1000, 1),
+                "latencia_por_operacao_ms": {op: {"media": round(b[0] * 1000, 1), "min": round(b[1] * 1000, 1)}
+                                             for op, b in self.baselines.items()},
+                "sinais": dict(self.counts),
+            }
+
+LIMITER = AdaptiveLimiter()
+
+def classify(response: requests.Response) -> str:
+    """Sinal de controle a partir da resposta: ok, throttle ou lock."""
+    if response.status_code in (429, 503):
+        return "throttle"
+    content = response.content or b""
+    if b"REQUEST_LIMIT_EXCEEDED" in content:
+        return "throttle"
+    if b"UNABLE_TO_LOCK_ROW" in content:
+        return "lock"
+    return "ok"
+
+def retryable(response: requests.Response, idempotent: bool = True) -> bool:
+    """
+    429/503 e limite de requisições CONCORRENTES (passa sozinho); o limite diário (TotalRequests) não.
+    Escrita (idempotent=False) só repete no limite de concorrência, que o Salesforce recusa antes
+    de processar: um 429/503 pode chegar depois do insert feito e a repetição duplicaria registros.
+    """
+    content = response.content or b""
+    concurrent = response.status_code == 403 and b"REQUEST_LIMIT_EXCEEDED" in content and b"Concurrent" in content
+    if not idempotent:
+        return concurrent
+    return concurrent or response.status_code in (429, 503)
+
+API_SEGMENT = re.compile(r"/services/data/v[\d.]+/([^/?]+)")
+
+def latency_class(method: str, url: str, idempotent: bool) -> Optional[str]:
+    """
+    Classe da operação para a linha de base de latência do limitador (ex.: 'GET query').
+    None = fora do sinal: escritas, Bulk e login são lentos por natureza, não por fila.
+    """
+    path = url.split("?", 1)[0]
+    if not idempotent or "/oauth2/" in path or "/jobs/" in path:
+        return None
+    m = API_SEGMENT.search(path)
+    return f"{method} {m.group(1) if m else path}"
+
+def limiter_stats() -> dict:
+    """Janela atual do limitador adaptativo, requisições em voo, latência e contagem de sinais."""
+    return LIMITER.stats()
+
+def get_session() -> requests.Session:
+    """
+    Retorna a Session compartilhada (pool de conexões keep-alive), criada na primeira chamada.
+    Pode ser usada por várias threads ao mesmo tempo.
+    """
+    global SESSION
+    if SESSION is None:
+        with SESSION_LOCK:
+            if SESSION is None:
+                session = requests.Session()
+                adapter = TRANSPORT or HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                SESSION = session
+    return SESSION
+
+def reset_session() -> None:
+    """Descarta a Session atual (ex.: depois de um fork, conexões não podem ser compartilhadas)."""
+    global SESSION
+    with SESSION_LOCK:
+        if SESSION is not None:
+            SESSION.close()
+        SESSION = None
+
+def configure(pool_size: Optional[int] = None, max_concurrency: Optional[int] = None, transport=None) -> None:
+    """
+    Ajusta o transporte HTTP.
+
+    Args:
+        pool_size: Conexões keep-alive por host (normalmente >= nº de threads do servidor)
+        max_concurrency: Teto da janela do limitador adaptativo (requisições simultâneas)
+        transport: Adapter do requests usado para http/https no lugar da rede (ex.: sf_replay)
+    """
+    global POOL_SIZE, TRANSPORT
+    if pool_size:
+        POOL_SIZE = int(pool_size)
+    if transport is not None:
+        TRANSPORT = transport
+    if max_concurrency:
+        with LIMITER.cond:
+            LIMITER.maximum = float(max_concurrency)
+            LIMITER.window = min(LIMITER.window, LIMITER.maximum)
+            LIMITER.cond.notify_all()
+    reset_session()
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    Define o prazo (segundos a partir de agora) para tudo que rodar dentro do bloco,
+    inclusive em threads que copiem o contexto (ver run_in_context). Prazo de fora
+    mais curto prevalece. None = não muda nada.
+    """
+    if seconds is None:
+        yield
+        return
+    end = time.monotonic() + seconds
+    current = DEADLINE.get()
+    token = DEADLINE.set(end if current is None else min(current, end))
+    try:
+        yield
+    finally:
+        DEADLINE.reset(token)
+
+@contextmanager
+def detached(seconds: Optional[float] = None):
+    """
+    Troca o prazo de fora por um próprio (padrão SHARED_TIMEOUT) dentro do bloco: para
+    trabalho que serve a várias requisições e não pode cair no prazo de quem o começou.
+    """
+    token = DEADLINE.set(time.monotonic() + (SHARED_TIMEOUT if seconds is None else seconds))
+    try:
+        yield
+    finally:
+        DEADLINE.reset(token)
+
+def remaining() -> Optional[float]:
+    """Segundos que faltam no prazo atual (None = sem prazo)."""
+    end = DEADLINE.get()
+    return None if end is None else end - time.monotonic()
+
+def check_deadline(what: str = "chamada ao Salesforce") -> Optional[float]:
+    """Levanta DeadlineExceeded se o prazo acabou; senão devolve o que falta (None = sem prazo)."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Prazo esgotado antes da {what}")
+    return left
+
+def run_in_context(executor, fn, *args):
+    """executor.submit com o contexto atual (o prazo vale também na thread do pool)."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+def on_unauthorized(callback: Callable[[], None]) -> None:
+    """Registra uma função chamada sempre que o Salesforce responder 401 (token expirado/revogado)."""
+    UNAUTHORIZED_HOOKS.append(callback)
+
+def on_response(callback: Callable[[str, str, requests.Response, float], None]) -> None:
+    """Registra uma função chamada a cada resposta: callback(método, url, response, segundos). Exceção no callback só vai para o log."""
+    RESPONSE_HOOKS.append(callback)
+
+def request(method: str, url: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+    """
+    Faz uma requisição HTTP pelo pool compartilhado, respeitando o limitador adaptativo.
+    429/503 e limite de concorrência são repetidos até MAX_RETRIES vezes (Retry-After ou backoff
+    exponencial); escritas só no limite de concorrência (ver retryable).
+    Dentro de um prazo (deadline()), o timeout de cada tentativa é o tempo que falta e,
+    esgotado o prazo, levanta DeadlineExceeded em vez de esperar/repetir.
+
+    Args:
+        method: GET, POST, PATCH, PUT ou DELETE
+        url: URL completa
+        idempotent: Pode repetir sem efeito duplicado (padrão: só GET/HEAD; passe True para
+            POST de leitura, ex.: Composite só com GETs, token OAuth)
+        **kwargs: Mesmos argumentos do requests (headers, json, data, params, timeout, verify...)
+
+    Returns:
+        Objeto Response do requests
+    """
+    timeout = kwargs.pop("timeout", None) or DEFAULT_TIMEOUT
+    if idempotent is None:
+        idempotent = method.upper() in ("GET", "HEAD")
+    op = latency_class(method, url, idempotent)
+    for attempt in range(MAX_RETRIES + 1):
+        left = check_deadline()
+        if not LIMITER.acquire(left):
+            raise DeadlineExceeded("Prazo esgotado esperando vaga no limitador de concorrência")
+        started = time.monotonic()
+        signal = "erro"
+        bounded = left is not None and left < timeout
+        try:
+            response = get_session().request(method, url, timeout=left if bounded else timeout, **kwargs)
+            signal = classify(response)
+        except requests.exceptions.Timeout:
+            if bounded:
+                signal = "prazo"
+                raise DeadlineExceeded(f"Prazo esgotado esperando o Salesforce ({method} {url.split('?', 1)[0]})")
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            LIMITER.release(signal, elapsed, op)
+        for callback in RESPONSE_HOOKS:
+            # perfil/trace/gravação não podem derrubar uma chamada que deu certo
+            try:
+                callback(method, url, response, elapsed)
+            except Exception as e:
+                logger.error("Erro no callback de resposta %s: %s", getattr(callback, "__name__", callback), e)
+        if not retryable(response, idempotent) or attempt == MAX_RETRIES:
+            break
+        try:
+            delay = float(response.headers.get("Retry-After") or 0)
+        except ValueError:
+            delay = 0.0
+        delay = min(30.0, delay or 0.5 * 2 ** attempt)
+        left = remaining()
+        if left is not None and delay >= left:
+            break  # não dá tempo de outra tentativa: devolve a resposta que temos
+        logger.warning("Salesforce respondeu %s; nova tentativa em %.1fs", response.status_code, delay)
+        time.sleep(delay)
+
+    if response.status_code == 401:
+        for callback in UNAUTHORIZED_HOOKS:
+            try:
+                callback()
+            except Exception as e:
+                logger.error("Erro no callback de 401: %s", e)
+    return response
+
+class Hedger:
+    """
+    Leituras "hedged": se a resposta não chega até o percentil `percentile` das latências
+    recentes daquela operação, manda uma cópia da mesma requisição e fica com a que
+    responder primeiro (a outra termina em segundo plano e é descartada); 5xx/429 de uma
+    cópia não ganha: espera a outra. Só para leituras idempotentes (GET de SOQL/queryMore,
+    Composite só com GETs). Leitura sem histórico ou sem orçamento roda na thread de quem
+    chamou; as que podem ganhar cópia rodam num pool de primárias (threads reaproveitadas,
+    separado do pool das cópias para uma não esperar pela outra). Pool de primárias
+    cheio = roda na thread de quem chamou, sem cópia (nunca fica na fila).
+    As cópias são limitadas por um orçamento: no máximo `budget` (ex.: 0,05 = 5%) das
+    requisições, acumulado num balde com teto (rajadas curtas de lentidão ainda são cobertas).
+    """
+
+    def __init__(self, percentile: float = 95.0, budget: float = 0.05, min_delay: float = 0.01,
+                 min_samples: int = 20, window: int = 512):
+        self.enabled = False
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}     # operação -> [latências (anel), próxima posição, limiar, novas desde o cálculo]
+        self.tokens = 1.0
+        self.counts = {"leituras": 0, "hedges": 0, "vitorias_hedge": 0, "sem_orcamento": 0, "sem_thread": 0}
+        self.pools = {}       # "hedge" / "primaria" -> (ThreadPoolExecutor, pid que criou)
+        self.running = 0      # primárias em voo no pool de primárias
+
+    def configure(self, enabled: Optional[bool] = None, percentile: Optional[float] = None,
+                  budget: Optional[float] = None) -> None:
+        with self.lock:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if percentile is not None:
+                self.percentile = float(percentile)
+            if budget is not None:
+                self.budget = float(budget)
+
+    @property
+    def workers(self) -> int:
+        return max(8, 2 * POOL_SIZE)
+
+    def executor(self, kind: str = "hedge") -> ThreadPoolExecutor:
+        entry = self.pools.get(kind)
+        if entry is None or entry[1] != os.getpid():
+            with self.lock:
+                entry = self.pools.get(kind)
+                if entry is None or entry[1] != os.getpid():
+                    entry = self.pools[kind] = (ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=kind),
+                                                os.getpid())
+        return entry[0]
+
+    def record(self, op: str, latency: float) -> None:
+        with self.lock:
+            entry = self.samples.get(op)
+            if entry is None:
+                entry = self.samples[op] = [[], 0, None, 0]
+            ring = entry[0]
+            if len(ring) < self.window:
+                ring.append(latency)
+            else:
+                ring[entry[1]] = latency
+                entry[1] = (entry[1] + 1) % self.window
+            entry[3] += 1
+            # recalcula o percentil a cada 32 amostras (ordenar a cada resposta custaria mais que o ganho)
+            if len(ring) >= self.min_samples and (entry[2] is None or entry[3] >= 32):
+                ordered = sorted(ring)
+                k = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+                entry[2] = max(self.min_delay, ordered[k])
+                entry[3] = 0
+
+    def threshold(self, op: str) -> Optional[float]:
+        with self.lock:
+            entry = self.samples.get(op)
+            return entry[2] if entry else None
+
+    def reserve(self) -> bool:
+        """Reserva 1 cópia do orçamento para esta leitura (devolvida se o hedge não disparar)."""
+        with self.lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            self.counts["sem_orcamento"] += 1
+            return False
+
+    def refund(self) -> None:
+        with self.lock:
+            self.tokens = min(10.0, self.tokens + 1.0)
+
+    def timed(self, op: str, method: str, url: str, kwargs: dict) -> requests.Response:
+        started = time.monotonic()
+        response = request(method, url, **kwargs)
+        if response.status_code < 400:
+            self.record(op, time.monotonic() - started)
+        return response
+
+    def start_primary(self, op: str, method: str, url: str, kwargs: dict) -> Optional[Future]:
+        """Primária no pool de primárias (None se todas as threads estão ocupadas)."""
+        with self.lock:
+            if self.running >= self.workers:
+                self.counts["sem_thread"] += 1
+                return None
+            self.running += 1
+        future = run_in_context(self.executor("primaria"), self.timed, op, method, url, kwargs)
+        future.add_done_callback(self.release)
+        return future
+
+    def release(self, _future: Future) -> None:
+        with self.lock:
+            self.running -= 1
+
+    @staticmethod
+    def good(future: Future) -> bool:
+        """Resposta que encerra a corrida: sem exceção e sem 5xx/429 (esses esperam a outra cópia)."""
+        if future.exception() is not None:
+            return False
+        status = future.result().status_code
+        return status < 500 and status != 429
+
+    def request(self, op: str, method: str, url: str, **kwargs) -> requests.Response:
+        if not self.enabled:
+            return request(method, url, **kwargs)
+        with self.lock:
+            self.counts["leituras"] += 1
+            self.tokens = min(10.0, self.tokens + self.budget)
+        delay = self.threshold(op)
+        if delay is None or not self.reserve():
+            # sem histórico ou sem orçamento: não haverá cópia, a leitura roda na thread de quem chamou
+            return self.timed(op, method, url, kwargs)
+
+        # com cópia possível a primária vai para o pool de primárias (quem chamou precisa poder
+        # ficar com a cópia se ela responder antes); há thread livre, então ela começa na hora
+        primary = self.start_primary(op, method, url, kwargs)
+        if primary is None:
+            self.refund()
+            return self.timed(op, method, url, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            self.refund()
+            return primary.result()
+
+        with self.lock:
+            self.counts["hedges"] += 1
+        hedge = run_in_context(self.executor(), self.timed, op, method, url, kwargs)
+        pending = {primary, hedge}
+        failed = []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if not self.good(future):
+                    failed.append(future)
+                    continue
+                if future is hedge:
+                    with self.lock:
+                        self.counts["vitorias_hedge"] += 1
+                return future.result()
+        # as 2 falharam: prefere uma resposta (5xx/429) a uma exceção
+        answered = [f for f in failed if f.exception() is None]
+        return (answered or failed)[0].result()
+
+    def stats(self) -> dict:
+        with self.lock:
+            out = dict(self.counts)
+            out["ligado"] = self.enabled
+            out["percentil"] = self.percentile
+            out["orcamento"] = self.budget
+            out["taxa_hedge"] = round(out["hedges"] / out["leituras"], 4) if out["leituras"] else 0.0
+            out["taxa_vitoria"] = round(out["vitorias_hedge"] / out["hedges"], 4) if out["hedges"] else 0.0
+            out["limiar_ms"] = {op: round(e[2] * 1000, 1) for op, e in self.samples.items() if e[2] is not None}
+        return out
+
+HEDGER = Hedger(percentile=float(os.getenv("SF_HEDGE_PERCENTIL", "95")),
+                budget=float(os.getenv("SF_HEDGE_ORCAMENTO", "0.05")))
+HEDGER.enabled = os.getenv("SF_HEDGE", "") in ("1", "true", "sim")
+
+def hedged_request(op: str, method: str, url: str, **kwargs) -> requests.Response:
+    """
+    request() com hedge para LEITURAS idempotentes (desligado por padrão; ver configure_hedge).
+
+    Args:
+        op: Nome da operação (cada uma tem seu próprio histórico de latência/limiar)
+        method: Método HTTP (GET, ou POST de Composite só com consultas)
+        url: URL completa
+        **kwargs: Mesmos argumentos do requests
+    """
+    kwargs.setdefault("idempotent", True)
+    return HEDGER.request(op, method, url, **kwargs)
+
+def configure_hedge(enabled: Optional[bool] = None, percentile: Optional[float] = None,
+                    budget: Optional[float] = None) -> None:
+    """Liga/desliga o hedge de leituras e ajusta percentil do limiar e orçamento (fração de cópias extras)."""
+    HEDGER.configure(enabled, percentile, budget)
+
+def hedge_stats() -> dict:
+    """Leituras, hedges disparados, vitórias do hedge, taxas e limiar atual por operação."""
+    return HEDGER.stats()
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from typing import Any, Dict, Optional
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Logs por consulta (SOQL/página) que passam por segundo, por tipo; o resto é contado e descartado
+RATE_PER_SECOND = float(os.getenv("SF_LOG_POR_SEGUNDO", "5"))
+
+class TextFormatter(logging.Formatter):
+    """Formato de sempre + campos estruturados no fim (' | duracao_ms=12 registros=3')."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        campos = getattr(record, "campos", None)
+        if campos:
+            line += " | " + " ".join(f"{k}={v}" for k, v in campos.items())
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """1 objeto JSON por linha: ts, nivel, logger, msg, pid, thread + campos estruturados."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        campos = getattr(record, "campos", None)
+        if campos:
+            out.update(campos)
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+class RateLimiter:
+    """Até `rate` eventos por segundo por tipo (balde de fichas); conta os descartados."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, list] = {}  # tipo -> [fichas, último, descartados]
+
+    def allow(self, kind: str) -> Optional[int]:
+        """None = descarte; senão, quantos foram descartados desde o último que passou."""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(kind)
+            if bucket is None:
+                bucket = self.buckets[kind] = [self.rate, now, 0]
+            bucket[0] = min(self.rate, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return None
+            bucket[0] -= 1.0
+            dropped, bucket[2] = bucket[2], 0
+            return dropped
+
+SAMPLER = RateLimiter(RATE_PER_SECOND)
+
+class Lazy:
+    """Valor de campo calculado só quando o registro é escrito (na thread de escrita)."""
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.fn(*self.args))
+
+class QuietThreads(logging.Filter):
+    """Descarta INFO/DEBUG de threads com nome iniciado por um dos prefixos (WARNING+ sempre passa)."""
+
+    def __init__(self):
+        super().__init__()
+        self.prefixes: tuple = ()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return (record.levelno >= logging.WARNING or not self.prefixes
+                or not record.threadName.startswith(self.prefixes))
+
+QUIET = QuietThreads()
+
+# Estado da configuração atual (setup pode ser chamado de novo, ex.: --log-json)
+STATE: Dict[str, Any] = {"handler": None, "listener": None, "targets": ()}
+
+def setup(level: Optional[str] = None, json_format: Optional[bool] = None, stream=None, force: bool = False) -> None:
+    """
+    Logging do processo (substitui o basicConfig): os threads só enfileiram o registro
+    (QueueHandler) e uma thread própria formata e escreve (QueueListener).
+
+    Args:
+        level: Nível (padrão: SF_LOG_NIVEL ou INFO)
+        json_format: 1 JSON por linha (padrão: SF_LOG_JSON=1); senão o formato texto de sempre
+        stream: Destino (padrão: stderr)
+        force: Reconfigura mesmo se o logging já tem handlers (como no basicConfig)
+    """
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return
+    if level is None:
+        level = os.getenv("SF_LOG_NIVEL", "INFO")
+    if json_format is None:
+        json_format = os.getenv("SF_LOG_JSON", "") in ("1", "true", "sim")
+
+    shutdown()
+    target = logging.StreamHandler(stream or sys.stderr)
+    target.setFormatter(JsonFormatter() if json_format else TextFormatter(TEXT_FORMAT))
+    handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    handler.addFilter(QUIET)
+    listener = logging.handlers.QueueListener(handler.queue, target, respect_handler_level=False)
+    listener.start()
+
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    STATE.update(handler=handler, listener=listener, targets=(target,))
+
+def shutdown() -> None:
+    """Esvazia a fila (escreve o que falta) e para a thread de escrita."""
+    listener = STATE.get("listener")
+    if listener is not None:
+        STATE["listener"] = None
+        try:
+            listener.stop()
+        except Exception:
+            pass
+
+def flush(timeout: float = 1.0) -> None:
+    """Espera a fila esvaziar (ex.: antes de um prompt, para o log não cair no meio da pergunta)."""
+    handler = STATE.get("handler")
+    if handler is None or STATE.get("listener") is None:
+        return
+    deadline = time.monotonic() + timeout
+    while not handler.queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.002)
+
+def quiet_threads(prefix: str, enabled: bool = True) -> None:
+    """
+    Silencia (enabled=True) ou volta a mostrar os logs INFO/DEBUG das threads `prefix*`
+    (ex.: leitura em segundo plano enquanto o terminal espera uma resposta).
+    """
+    prefixes = set(QUIET.prefixes)
+    (prefixes.add if enabled else prefixes.discard)(prefix)
+    QUIET.prefixes = tuple(sorted(prefixes))
+
+def restart_in_child() -> None:
+    # a thread do listener não existe no filho do fork: fila e thread novas
+    handler = STATE.get("handler")
+    if handler is None:
+        return
+    handler.queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(handler.queue, *STATE["targets"], respect_handler_level=False)
+    listener.start()
+    STATE["listener"] = listener
+
+atexit.register(shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=restart_in_child)
+
+def info_sampled(logger: logging.Logger, kind: str, msg: str, *args, **campos) -> None:
+    """
+    INFO de caminho quente (1 por consulta/página): nada é formatado se INFO está
+    desligado e passam no máximo SF_LOG_POR_SEGUNDO por tipo; o próximo que passar
+    leva 'suprimidos=N'.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    dropped = SAMPLER.allow(kind)
+    if dropped is None:
+        return
+    if dropped:
+        campos["suprimidos"] = dropped
+    logger.info(msg, *args, extra={"campos": campos})
@@ -1,19 +1,29 @@
-import requests
+import re
+import time
+import sf_http
+import sf_log
+import sf_trace
+import memo
 import logging
 import urllib.parse
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, Union
+
+from columnar import Columns
+from singleflight import READS, headers_key
 
 # from sf_auth import get_salesforce_token, get_auth_headers
 
 # Configuração do logging
 logger = logging.getLogger("salesforce_api")
 
+@sf_trace.traced("sf.query", "client")
 def execute_soql_query(
     instance_url: str,
     auth_headers: Dict,
     query: str,
     api_version: str = "v55.0",
-    batch_size: Optional[int] = None
+    batch_size: Optional[int] = None,
+    query_all: bool = False
 ) -> Optional[Dict[str, Any]]:
     """
     Executa uma consulta SOQL no Salesforce.
@@ -24,37 +34,49 @@ def execute_soql_query(
         query: Consulta SOQL a ser executada
         api_version: Versão da API do Salesforce
         batch_size: Tamanho do lote de resultados (opcional)
+        query_all: Usa o queryAll (inclui registros apagados na lixeira, IsDeleted = true)
         
     Returns:
         Dicionário com os resultados da consulta ou None em caso de falha
     """
+    span = sf_trace.current()
+    if span.recording:
+        span.set({"soql.objeto": read_op(query).partition(":")[2], "soql.forma": soql_shape(query)})
     try:
         # Codifica a consulta SOQL para URL
         encoded_query = urllib.parse.quote(query)
         
         # Constrói a URL da requisição
-        url = f"{instance_url}/services/data/{api_version}/query/?q={encoded_query}"
+        url = f"{instance_url}/services/data/{api_version}/{'queryAll' if query_all else 'query'}/?q={encoded_query}"
         
         # Adiciona o cabeçalho de opções de consulta se batch_size for especificado
         headers = auth_headers.copy()
         if batch_size:
             headers["Sforce-Query-Options"] = f"batchSize={batch_size}"
         
-        logger.info(f"Executando consulta SOQL: {query}")
-        response = requests.get(url, headers=headers)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Executando consulta SOQL: %s", normalize_soql(query))
+        response = sf_http.hedged_request(read_op(query), "GET", url, headers=headers)
         
+        span.set({"http.status_code": response.status_code})
         if response.status_code == 200:
             result = response.json()
-            logger.info(f"Consulta executada com sucesso. Total de registros: {result.get('totalSize', 0)}")
+            logger.debug("Consulta executada com sucesso. Total de registros: %s", result.get("totalSize", 0))
+            span.set(registros=len(result.get("records", [])), total=result.get("totalSize", 0))
             return result
         else:
-            logger.error(f"Falha na consulta: {response.status_code} - {response.text}")
+            logger.error("Falha na consulta: %s - %s", response.status_code, response.text)
+            span.error(f"HTTP {response.status_code}")
             return None
             
+    except sf_http.DeadlineExceeded:
+        raise
     except Exception as e:
-        logger.error(f"Erro ao executar consulta SOQL: {str(e)}")
+        logger.error("Erro ao executar consulta SOQL: %s", e)
+        span.error(str(e))
         return None
 
+@sf_trace.traced("sf.queryMore", "client")
 def query_more_results(
     instance_url: str,
     auth_headers: Dict,
@@ -71,34 +93,115 @@ def query_more_results(
     Returns:
         Dicionário com o próximo lote de resultados ou None em caso de falha
     """
+    span = sf_trace.current()
     try:
         # Constrói a URL completa para o próximo lote
         url = f"{instance_url}{next_records_url}"
         
-        logger.info("Obtendo próximo lote de resultados")
-        response = requests.get(url, headers=auth_headers)
+        response = sf_http.hedged_request("queryMore", "GET", url, headers=auth_headers)
         
+        span.set({"http.status_code": response.status_code})
         if response.status_code == 200:
             result = response.json()
-            logger.info(f"Próximo lote obtido com sucesso. Registros neste lote: {len(result.get('records', []))}")
+            logger.debug("Próximo lote obtido com sucesso. Registros neste lote: %s", len(result.get("records", [])))
+            span.set(registros=len(result.get("records", [])))
             return result
         else:
-            logger.error(f"Falha ao obter próximo lote: {response.status_code} - {response.text}")
+            logger.error("Falha ao obter próximo lote: %s - %s", response.status_code, response.text)
+            span.error(f"HTTP {response.status_code}")
             return None
             
+    except sf_http.DeadlineExceeded:
+        raise
     except Exception as e:
-        logger.error(f"Erro ao obter próximo lote de resultados: {str(e)}")
+        logger.error("Erro ao obter próximo lote de resultados: %s", e)
+        span.error(str(e))
         return None
 
+class QueryFailed(RuntimeError):
+    """
+    A consulta (ou um dos lotes do queryMore) falhou: `records` tem o que chegou a vir.
+    Sai do fetch como exceção para nem o memo nem o single-flight tratarem o parcial
+    como resultado; get_all_query_results devolve `records` a quem chamou.
+    """
+
+    def __init__(self, message: str, records):
+        super().__init__(message)
+        self.records = records
+
+FROM_OBJECT = re.compile(r"\bFROM\s+(\w+)", re.I)
+
+def read_op(query: str) -> str:
+    """Nome da leitura para o histórico de latência do hedge (ex.: 'query:ServiceResource')."""
+    m = FROM_OBJECT.search(query)
+    return f"query:{m.group(1)}" if m else "query"
+
+QUOTED_LITERAL = re.compile(r"('(?:[^'\\]|\\.)*')")
+WHITESPACE = re.compile(r"\s+")
+
+def normalize_soql(query: str) -> str:
+    """Texto da consulta sem diferença de espaços/quebras de linha (literais entre aspas ficam intactos)."""
+    parts = QUOTED_LITERAL.split(query)
+    return "".join(p if i % 2 else WHITESPACE.sub(" ", p) for i, p in enumerate(parts)).strip()
+
+PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+def soql_shape(query: str) -> str:
+    """Forma da consulta para rastreamento: literais viram '?' e listas do IN viram '?,…' (sem dados)."""
+    return PLACEHOLDER_LIST.sub("?,…", QUOTED_LITERAL.sub("?", normalize_soql(query)))
+
 def get_all_query_results(
     instance_url: str,
     auth_headers: Dict,
     query: str,
     api_version: str = "v55.0",
-    batch_size: Optional[int] = None
-) -> List[Dict[str, Any]]:
+    batch_size: Optional[int] = None,
+    columnar: bool = False,
+    query_all: bool = False
+) -> Union[List[Dict[str, Any]], Columns]:
     """
     Executa uma consulta SOQL e obtém todos os resultados, lidando automaticamente com paginação.
+    Consultas idênticas em voo ao mesmo tempo (mesma org/token e texto normalizado)
+    compartilham uma única ida ao Salesforce (single-flight); dentro de um memo.scope o
+    resultado também fica para as próximas consultas iguais do escopo.
+    
+    Args:
+        instance_url: URL da instância do Salesforce (obtida após autenticação)
+        auth_headers: Cabeçalhos de autorização (obtidos com get_auth_headers)
+        query: Consulta SOQL a ser executada
+        api_version: Versão da API do Salesforce
+        batch_size: Tamanho do lote de resultados (opcional)
+        columnar: Decodifica cada página direto em colunas (Columns: sem `attributes`,
+            strings internadas, linhas com .get()); o resultado é compartilhado entre
+            quem esperou a mesma consulta e não deve ser alterado
+        query_all: Inclui os registros apagados (queryAll; filtre por IsDeleted)
+        
+    Returns:
+        Lista com todos os registros retornados pela consulta (ou Columns)
+    """
+    key = ("query", instance_url, headers_key(auth_headers), api_version, batch_size, columnar, query_all,
+           normalize_soql(query))
+    try:
+        result = memo.remember(key, lambda: READS.do(key, fetch_all_query_results, instance_url, auth_headers, query,
+                                                     api_version, batch_size, columnar, query_all), query)
+    except QueryFailed as e:
+        # falha não fica no memo: a próxima consulta igual vai ao Salesforce de novo
+        result = e.records
+    return result if columnar else list(result)
+
+@sf_trace.traced("sf.consulta")
+def fetch_all_query_results(
+    instance_url: str,
+    auth_headers: Dict,
+    query: str,
+    api_version: str = "v55.0",
+    batch_size: Optional[int] = None,
+    columnar: bool = False,
+    query_all: bool = False
+) -> Union[List[Dict[str, Any]], Columns]:
+    """
+    Executa uma consulta SOQL e obtém todos os resultados, lidando automaticamente com paginação
+    (sem single-flight; use get_all_query_results).
     
     Args:
         instance_url: URL da instância do Salesforce (obtida após autenticação)
@@ -106,18 +209,25 @@ def get_all_query_results(
         query: Consulta SOQL a ser executada
         api_version: Versão da API do Salesforce
         batch_size: Tamanho do lote de resultados (opcional)
+        columnar: Cada página vai direto para colunas e é descartada (ver get_all_query_results)
+        query_all: Inclui os registros apagados (queryAll)
         
     Returns:
-        Lista com todos os registros retornados pela consulta
+        Lista com todos os registros retornados pela consulta (ou Columns)
+
+    Raises:
+        QueryFailed: a consulta inicial ou um lote seguinte falhou (com os registros já lidos)
     """
-    all_records = []
+    all_records = Columns() if columnar else []
+    started = time.perf_counter()
+    pages = 1
     
     # Executa a consulta inicial
-    result = execute_soql_query(instance_url, auth_headers, query, api_version, batch_size)
+    result = execute_soql_query(instance_url, auth_headers, query, api_version, batch_size, query_all)
     
     if not result:
         logger.error("Falha ao executar consulta inicial")
-        return all_records
+        raise QueryFailed("Falha ao executar consulta inicial", all_records)
     
     # Adiciona os registros do primeiro lote
     all_records.extend(result.get("records", []))
@@ -133,9 +243,126 @@ def get_all_query_results(
         
         if not result:
             logger.error("Falha ao obter próximo lote de resultados")
-            break
+            raise QueryFailed(f"Falha ao obter o lote {pages + 1} da consulta", all_records)
             
+        pages += 1
         all_records.extend(result.get("records", []))
     
-    logger.info(f"Consulta completa. Total de registros obtidos: {len(all_records)}")
+    sf_trace.current().set(registros=len(all_records), paginas=pages)
+    sf_log.info_sampled(logger, "consulta", "Consulta completa",
+                        registros=len(all_records), paginas=pages,
+                        duracao_ms=round(1000 * (time.perf_counter() - started), 1),
+                        soql=sf_log.Lazy(normalize_soql, query))
+    return all_records
+
+def soql_subrequest(
+    reference_id: str,
+    query: str,
+    api_version: str = "v55.0"
+) -> Dict[str, Any]:
+    """
+    Monta uma subrequisição de consulta SOQL para a Composite API.
+
+    Args:
+        reference_id: Nome da subrequisição (usado em referências @{referenceId...})
+        query: Consulta SOQL (pode conter referências, ex: '@{tecnico.records[0].Id}')
+        api_version: Versão da API do Salesforce
+
+    Returns:
+        Dicionário da subrequisição (method, url, referenceId)
+    """
+    # mantém @{...} sem codificar para o Salesforce resolver a referência
+    encoded_query = urllib.parse.quote(" ".join(query.split()), safe="@{}[].'=,()")
+    return {
+        "method": "GET",
+        "url": f"/services/data/{api_version}/query/?q={encoded_query}",
+        "referenceId": reference_id,
+    }
+
+@sf_trace.traced("sf.composite", "client")
+def execute_composite(
+    instance_url: str,
+    auth_headers: Dict,
+    subrequests: List[Dict[str, Any]],
+    api_version: str = "v55.0",
+    all_or_none: bool = False
+) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Executa várias subrequisições dependentes (até 25) numa única chamada Composite.
+    Subrequisições podem referenciar resultados anteriores com @{referenceId.campo}.
+
+    Args:
+        instance_url: URL da instância do Salesforce (obtida após autenticação)
+        auth_headers: Cabeçalhos de autorização (obtidos com get_auth_headers)
+        subrequests: Lista de subrequisições (method, url, referenceId e body opcional)
+        api_version: Versão da API do Salesforce
+        all_or_none: Se True, desfaz tudo quando alguma subrequisição falhar
+
+    Returns:
+        Dicionário {referenceId: {"httpStatusCode": int, "body": ...}} ou None em caso de falha
+    """
+    span = sf_trace.current()
+    span.set(subrequisicoes=len(subrequests), referencias=",".join(s["referenceId"] for s in subrequests))
+    try:
+        url = f"{instance_url}/services/data/{api_version}/composite"
+        payload = {"allOrNone": all_or_none, "compositeRequest": subrequests}
+
+        started = time.perf_counter()
+        kwargs = {"headers": {**auth_headers, "Content-Type": "application/json"}, "json": payload}
+        if all(s.get("method") == "GET" for s in subrequests):
+            # só consultas: leitura idempotente, pode ir com hedge
+            op = "composite:" + ",".join(s["referenceId"] for s in subrequests)
+            response = sf_http.hedged_request(op, "POST", url, **kwargs)
+        else:
+            response = sf_http.request("POST", url, **kwargs)
+
+        if response.status_code == 200:
+            results = {}
+            for item in response.json().get("compositeResponse", []):
+                results[item.get("referenceId")] = {"httpStatusCode": item.get("httpStatusCode"), "body": item.get("body")}
+            sf_log.info_sampled(logger, "composite", "Composite executado",
+                                subrequisicoes=len(subrequests),
+                                referencias=",".join(s["referenceId"] for s in subrequests),
+                                duracao_ms=round(1000 * (time.perf_counter() - started), 1))
+            return results
+        else:
+            logger.error("Falha no Composite: %s - %s", response.status_code, response.text)
+            span.error(f"HTTP {response.status_code}")
+            return None
+
+    except sf_http.DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error("Erro ao executar Composite: %s", e)
+        span.error(str(e))
+        return None
+
+def get_composite_query_records(
+    instance_url: str,
+    auth_headers: Dict,
+    result: Optional[Dict[str, Any]]
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Extrai os registros de uma subrequisição de consulta do Composite, buscando
+    os lotes seguintes (nextRecordsUrl) se o resultado veio paginado.
+
+    Args:
+        instance_url: URL da instância do Salesforce (obtida após autenticação)
+        auth_headers: Cabeçalhos de autorização (obtidos com get_auth_headers)
+        result: Item retornado por execute_composite para a subrequisição
+
+    Returns:
+        Lista de registros ou None se a subrequisição (ou um lote seguinte) falhou
+    """
+    if not result or result.get("httpStatusCode") != 200 or not isinstance(result.get("body"), dict):
+        return None
+
+    body = result["body"]
+    all_records = list(body.get("records", []))
+    while not body.get("done", True) and body.get("nextRecordsUrl"):
+        body = query_more_results(instance_url, auth_headers, body["nextRecordsUrl"])
+        if not body:
+            logger.error("Falha ao obter próximo lote de resultados do Composite")
+            return None  # parcial não serve: quem chama trata como falha (e o memo não guarda)
+        all_records.extend(body.get("records", []))
     return all_records
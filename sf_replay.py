@@ -0,0 +1,399 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import urllib.parse
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+import sf_http
+
+# Configuração do logging
+logger = logging.getLogger("salesforce_api")
+
+CASSETTE_VERSION = 2
+
+# Sal dos pseudônimos: nunca vai no cassete (com ele dá para testar e-mails/nomes contra
+# os hashes). Fica em <cassete>.sal ao lado (não compartilhe junto) ou em SF_REPLAY_SAL.
+SALT_ENV = "SF_REPLAY_SAL"
+
+# Campos que nunca vão para o arquivo (token, senha, segredo do app)
+SECRET_KEYS = {"access_token", "refresh_token", "id_token", "signature", "password", "client_secret",
+               "client_id", "username", "code"}
+
+# Campos com dado pessoal nas respostas: viram um pseudônimo estável (mesmo valor, sem diferença
+# de maiúsculas/minúsculas -> mesmo pseudônimo; a SOQL também compara Name assim)
+PERSONAL_KEYS = {"Name", "Email", "Username", "Phone", "MobilePhone", "FirstName", "LastName"}
+
+# Cabeçalhos de resposta que importam para o cliente (limitador, retry, paginação do Bulk)
+KEPT_HEADERS = ("Content-Type", "Retry-After", "Sforce-Limit-Info", "Sforce-Locator", "Sforce-NumberOfRecords")
+
+REPLAY_INSTANCE = "https://instancia.replay.invalid"
+
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+SOQL_LITERAL = re.compile(r"'((?:[^'\\]|\\.)*)'")
+TIMESTAMP = re.compile(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.\d+)?(?:Z|[+-]\d\d:?\d\d)?")
+SALESFORCE_ID = re.compile(r"[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?")
+ESCAPED = re.compile(r"\\(.)")
+
+class Scrubber:
+    """
+    Tira token/senha e troca dado pessoal (e-mail, nomes, literais da SOQL) por
+    pseudônimos estáveis: hash com o sal do arquivo, então o mesmo valor vira sempre
+    o mesmo pseudônimo e a chave de uma requisição é igual na gravação e na reprodução.
+    """
+
+    def __init__(self, salt: str):
+        self.salt = salt
+
+    def pseudonym(self, value: str) -> str:
+        return "x" + hashlib.sha256((self.salt + value).encode("utf-8")).hexdigest()[:10]
+
+    def email(self, match) -> str:
+        return f"{self.pseudonym(match.group(0).lower())}@exemplo.invalid"
+
+    def literal(self, match) -> str:
+        value = match.group(1)
+        if not value or SALESFORCE_ID.fullmatch(value) or value.startswith("@{"):
+            return match.group(0)  # Ids e referências do Composite não são dado pessoal
+        return f"'{self.pseudonym(value)}'"
+
+    def text(self, value: str) -> str:
+        """Texto livre de requisição (SOQL, CSV): e-mails, literais entre aspas e datas da execução."""
+        value = EMAIL.sub(self.email, value)
+        value = SOQL_LITERAL.sub(self.literal, value)
+        return TIMESTAMP.sub("<data>", value)
+
+    def request_value(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: "***" if k in SECRET_KEYS else self.request_value(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.request_value(v) for v in value]
+        if isinstance(value, str):
+            return self.text(value)
+        return value
+
+    def response_value(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: self.response_field(k, v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.response_value(v) for v in value]
+        if isinstance(value, str):
+            return EMAIL.sub(self.email, value)
+        return value
+
+    def response_field(self, key: str, value: Any) -> Any:
+        if key in SECRET_KEYS and isinstance(value, str):
+            return "***"
+        if key == "instance_url" and isinstance(value, str):
+            return REPLAY_INSTANCE
+        if key in PERSONAL_KEYS and isinstance(value, str):
+            return EMAIL.sub(self.email, value) if EMAIL.fullmatch(value) else self.pseudonym(value.lower())
+        return self.response_value(value)
+
+    def originals(self, method: str, url: str, body: Any) -> Dict[str, str]:
+        """
+        {pseudônimo: valor} dos literais da SOQL e e-mails desta requisição: na reprodução,
+        o Name/Email que a resposta gravada trouxe pseudonimizado volta a ser o que quem
+        chamou mandou (o resolvedor em lote casa o Name da resposta com o nome digitado).
+        """
+        text = " ".join(v for _, v in urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query, keep_blank_values=True))
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", "replace")
+        if isinstance(body, str):
+            text += " " + body
+        out = {}
+        for email in EMAIL.findall(text):
+            out[f"{self.pseudonym(email.lower())}@exemplo.invalid"] = email
+        for literal in SOQL_LITERAL.findall(text):
+            value = ESCAPED.sub(r"\1", literal)
+            if value and not SALESFORCE_ID.fullmatch(value) and not EMAIL.fullmatch(value):
+                out[self.pseudonym(value.lower())] = value
+                out.setdefault(self.pseudonym(value), value)  # cassete gravado antes de ignorar a caixa
+        return out
+
+    def restore(self, value: Any, originals: Dict[str, str]) -> Any:
+        """Troca de volta, nos campos PERSONAL_KEYS, os pseudônimos que estão em originals."""
+        if isinstance(value, dict):
+            return {k: originals.get(v, v) if k in PERSONAL_KEYS and isinstance(v, str) else self.restore(v, originals)
+                    for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.restore(v, originals) for v in value]
+        return value
+
+    def request_key(self, method: str, url: str, body: Any) -> str:
+        """Identifica a requisição sem host, segredo nem dado pessoal (mesma chave na gravação e na reprodução)."""
+        parts = urllib.parse.urlsplit(url)
+        # espaços/quebras de linha da SOQL não contam (reformatar a consulta não muda a chave)
+        query = [(k, "***" if k in SECRET_KEYS else self.text(" ".join(v.split())))
+                 for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)]
+        key = f"{method.upper()} {parts.path}"
+        if query:
+            key += "?" + "&".join(f"{k}={v}" for k, v in query)
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", "replace")
+        if body:
+            try:
+                key += " " + json.dumps(self.request_value(json.loads(body)), sort_keys=True, ensure_ascii=False)
+            except ValueError:
+                form = urllib.parse.parse_qsl(body, keep_blank_values=True) if "=" in body and "\n" not in body else None
+                if form:
+                    key += " " + urllib.parse.urlencode(sorted((k, "***" if k in SECRET_KEYS else self.text(v)) for k, v in form))
+                else:
+                    key += " " + self.text(body)
+        return key
+
+    def response_body(self, response: requests.Response) -> str:
+        content = response.content or b""
+        text = content.decode(response.encoding or "utf-8", "replace")
+        if "json" in (response.headers.get("Content-Type") or "") or text[:1] in ("{", "["):
+            try:
+                return json.dumps(self.response_value(json.loads(text)), ensure_ascii=False)
+            except ValueError:
+                pass
+        return EMAIL.sub(self.email, text)
+
+def salt_path(path: str) -> str:
+    return path + ".sal"
+
+def salt_fingerprint(salt: str) -> str:
+    """Vai no cabeçalho no lugar do sal: confere se a reprodução usa o mesmo, sem revelá-lo."""
+    return hashlib.sha256(("cassete:" + salt).encode("utf-8")).hexdigest()[:16]
+
+def load_salt(path: str) -> Optional[str]:
+    """Sal do cassete: SF_REPLAY_SAL ou o arquivo <cassete>.sal (None se nenhum dos 2)."""
+    salt = os.getenv(SALT_ENV)
+    if salt:
+        return salt.strip()
+    try:
+        with open(salt_path(path), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def save_salt(path: str, salt: str) -> None:
+    fd = os.open(salt_path(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(salt + "\n")
+
+def cassette_salt(path: str, header: Dict[str, Any]) -> str:
+    """Sal para usar com um cassete existente; SystemExit se falta ou não é o da gravação."""
+    salt = load_salt(path)
+    if not salt:
+        raise SystemExit(f"❌ Falta o sal do cassete {path}: coloque o arquivo {salt_path(path)} "
+                         f"(gerado na gravação) ao lado dele ou defina {SALT_ENV}.")
+    if salt_fingerprint(salt) != header.get("sal_hash"):
+        raise SystemExit(f"❌ O sal ({SALT_ENV} ou {salt_path(path)}) não é o da gravação de {path}.")
+    return salt
+
+def read_header(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            first = f.readline()
+    except OSError:
+        return None
+    try:
+        header = json.loads(first)
+    except ValueError:
+        return None
+    return header if isinstance(header, dict) and header.get("tipo") == "cassete" else None
+
+class Recorder:
+    """
+    Grava cada resposta do Salesforce (hook do sf_http) num arquivo JSONL "cassete":
+    1ª linha = cabeçalho (versão, hash do sal); depois 1 linha por chamada com a chave
+    da requisição, status, cabeçalhos úteis, corpo da resposta e duração — já limpos.
+    O sal vai para <cassete>.sal (ou vem de SF_REPLAY_SAL), nunca para o cassete.
+    Arquivo existente (do mesmo formato) recebe as chamadas novas no fim.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.handle = None
+        self.pid = 0
+        self.started = time.monotonic()
+        self.count = 0
+        header = read_header(path)
+        if header is None:
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                raise SystemExit(f"❌ {path} existe e não é um cassete: escolha outro arquivo para --gravar.")
+            salt = os.getenv(SALT_ENV, "").strip() or os.urandom(16).hex()
+            header = {"tipo": "cassete", "versao": CASSETTE_VERSION, "sal_hash": salt_fingerprint(salt),
+                      "gravado_em": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            if not os.getenv(SALT_ENV):
+                save_salt(path, salt)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(header) + "\n")
+        elif header.get("versao") != CASSETTE_VERSION:
+            raise SystemExit(f"❌ Cassete {path} em formato antigo (versão {header.get('versao')}): grave num arquivo novo.")
+        else:
+            salt = cassette_salt(path, header)
+        self.scrubber = Scrubber(salt)
+
+    def stream(self):
+        # com pre-fork, cada processo abre o arquivo de novo (append, 1 write por linha)
+        if self.handle is None or self.pid != os.getpid():
+            self.handle = open(self.path, "a", encoding="utf-8")
+            self.pid = os.getpid()
+        return self.handle
+
+    def on_response(self, method: str, url: str, response: requests.Response, elapsed: float) -> None:
+        # a URL preparada inclui params= (ex.: ids do DELETE em lote), como o transporte vê na reprodução
+        prepared = response.request
+        if prepared is not None:
+            method, url = prepared.method, prepared.url
+        entry = {
+            "chave": self.scrubber.request_key(method, url, prepared.body if prepared is not None else None),
+            "t_ms": round(1000 * (time.monotonic() - self.started), 1),
+            "status": response.status_code,
+            "cabecalhos": {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers},
+            "corpo": self.scrubber.response_body(response),
+            "duracao_ms": round(1000 * elapsed, 1),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self.lock:
+            out = self.stream()
+            out.write(line)
+            out.flush()
+            self.count += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"modo": "gravando", "arquivo": self.path, "chamadas": self.count}
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transporte do requests que responde com o cassete, sem rede. Cada chave guarda
+    suas respostas na ordem gravada (repetida além do gravado = reusa a última).
+    Espera a duração gravada x `scale` (0 = sem espera), respeitando o timeout.
+    Requisição que não está no cassete recebe 501 REPLAY_MISS e é contada.
+    Nomes/e-mails que a própria requisição cita voltam ao valor original na resposta.
+    """
+
+    def __init__(self, path: str, scale: float = 1.0):
+        super().__init__()
+        header = read_header(path)
+        if header is None:
+            raise SystemExit(f"❌ {path} não é um cassete gravado com --gravar.")
+        if header.get("versao") == 1 and header.get("sal"):
+            salt = header["sal"]  # formato antigo, com o sal no próprio arquivo
+        elif header.get("versao") != CASSETTE_VERSION:
+            raise SystemExit(f"❌ Cassete {path} em formato desconhecido (versão {header.get('versao')}).")
+        else:
+            salt = cassette_salt(path, header)
+        self.path = path
+        self.scale = scale
+        self.scrubber = Scrubber(salt)
+        self.lock = threading.Lock()
+        self.entries: Dict[str, List[Dict[str, Any]]] = {}
+        self.recorded = 0
+        with open(path, encoding="utf-8") as f:
+            next(f)
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries.setdefault(entry["chave"], []).append(entry)
+                    self.recorded += 1
+        self.position: Dict[str, int] = {}
+        self.counters = {"servidas": 0, "repetidas": 0, "fora_do_roteiro": 0}
+        self.misses: Dict[str, int] = {}
+
+    def next_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entries = self.entries.get(key)
+            if not entries:
+                self.counters["fora_do_roteiro"] += 1
+                self.misses[key] = self.misses.get(key, 0) + 1
+                return None
+            pos = self.position.get(key, 0)
+            if pos < len(entries):
+                self.position[key] = pos + 1
+                self.counters["servidas"] += 1
+                return entries[pos]
+            self.counters["repetidas"] += 1
+            return entries[-1]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = self.scrubber.request_key(request.method, request.url, request.body)
+        entry = self.next_entry(key)
+        if entry is None:
+            logger.warning("Reprodução: requisição fora do cassete: %s", key[:300])
+            entry = {"status": 501, "cabecalhos": {"Content-Type": "application/json"}, "duracao_ms": 0.0,
+                     "corpo": json.dumps([{"errorCode": "REPLAY_MISS", "message": f"Fora do cassete: {key[:200]}"}])}
+
+        delay = entry["duracao_ms"] / 1000.0 * self.scale
+        limit = timeout[1] if isinstance(timeout, tuple) else timeout
+        if limit is not None and delay > limit:
+            time.sleep(limit)
+            raise requests.exceptions.ReadTimeout(f"Reprodução: resposta gravada levou {entry['duracao_ms']:.0f} ms", request=request)
+        if delay > 0:
+            time.sleep(delay)
+
+        body = entry["corpo"]
+        originals = self.scrubber.originals(request.method, request.url, request.body)
+        if originals and body[:1] in ("{", "[") and any(p in body for p in originals):
+            body = json.dumps(self.scrubber.restore(json.loads(body), originals), ensure_ascii=False)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry.get("cabecalhos") or {})
+        response._content = body.encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.reason = "Replay"
+        response.elapsed = timedelta(seconds=delay)
+        return response
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            unused = sum(max(0, len(v) - self.position.get(k, 0)) for k, v in self.entries.items())
+            out = {"modo": "reproduzindo", "arquivo": self.path, "escala": self.scale,
+                   "gravadas": self.recorded, "nao_usadas": unused, **self.counters}
+            if self.misses:
+                out["exemplos_fora"] = sorted(self.misses, key=self.misses.get, reverse=True)[:5]
+        return out
+
+# Gravador/reprodutor ativo (None = tráfego real, sem gravação)
+ACTIVE = None
+
+def start_recording(path: str) -> Recorder:
+    """Liga a gravação do tráfego com o Salesforce para o resto do processo."""
+    global ACTIVE
+    recorder = Recorder(path)
+    sf_http.on_response(recorder.on_response)
+    ACTIVE = recorder
+    return recorder
+
+def start_replay(path: str, scale: float = 1.0) -> ReplayAdapter:
+    """Troca o transporte do sf_http pelo cassete (sem rede) para o resto do processo."""
+    global ACTIVE
+    adapter = ReplayAdapter(path, scale)
+    sf_http.configure(transport=adapter)
+    ACTIVE = adapter
+    return adapter
+
+def stats() -> Dict[str, Any]:
+    return ACTIVE.stats() if ACTIVE is not None else {"modo": "desligado"}
+
+def format_stats(report: Dict[str, Any]) -> str:
+    if report.get("modo") == "gravando":
+        return f"⏺  Gravação: {report['chamadas']} chamada(s) em {report['arquivo']}"
+    if report.get("modo") != "reproduzindo":
+        return ""
+    line = (f"⏵  Reprodução ({report['arquivo']}, escala {report['escala']:g}): "
+            f"{report['servidas']} servida(s), {report['repetidas']} repetida(s), "
+            f"{report['fora_do_roteiro']} fora do cassete, {report['nao_usadas']} de {report['gravadas']} não usada(s)")
+    for key in report.get("exemplos_fora") or []:
+        line += f"\n   fora: {key[:160]}"
+    return line
@@ -0,0 +1,279 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+import sf_http
+import perfil
+
+# Exportador ativo (None = rastreamento desligado; span()/traced() viram chamadas diretas)
+ACTIVE: Optional["Exporter"] = None
+
+# Span aberto no contexto atual (pai dos próximos); herdado por threads que copiam o contexto
+CURRENT: contextvars.ContextVar = contextvars.ContextVar("sf_span", default=None)
+
+SERVICE_NAME = "api_skill_tec"
+
+# Spans terminados que um trace junta antes de gravar uma linha (a execução inteira do CLI
+# é 1 trace: sem esse limite tudo ficaria na memória até o span raiz terminar)
+FLUSH_SPANS = int(os.getenv("SF_TRACE_LOTE", "500"))
+
+# SpanKind do OTLP
+KINDS = {"internal": 1, "server": 2, "client": 3}
+STATUS_OK, STATUS_ERROR = 1, 2
+
+def new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+def otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def otlp_attributes(attrs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": otlp_value(v)} for k, v in attrs.items() if v is not None]
+
+class Trace:
+    """
+    Spans já terminados de um trace, exportados quando o span raiz termina ou a cada
+    FLUSH_SPANS (aí o trace sai em várias linhas com o mesmo traceId; o raiz vai na última).
+    """
+    __slots__ = ("lock", "spans", "exported")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans: List["Span"] = []
+        self.exported = False
+
+class Span:
+    """Um trecho cronometrado (OTLP): nome, pai, atributos e status."""
+    __slots__ = ("trace", "trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attrs", "status", "message")
+    recording = True
+
+    def __init__(self, name: str, kind: str, parent: Optional["Span"], attrs: Optional[Dict[str, Any]],
+                 remote: Optional[tuple] = None):
+        if parent is not None:
+            self.trace, self.trace_id, self.parent_id = parent.trace, parent.trace_id, parent.span_id
+        elif remote is not None:
+            self.trace, (self.trace_id, self.parent_id) = Trace(), remote
+        else:
+            self.trace, self.trace_id, self.parent_id = Trace(), new_id(16), ""
+        self.span_id = new_id(8)
+        self.name = name
+        self.kind = KINDS.get(kind, 1)
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attrs = dict(attrs) if attrs else {}
+        self.status = 0
+        self.message = ""
+
+    def set(self, attrs: Optional[Dict[str, Any]] = None, **kwargs) -> None:
+        if attrs:
+            self.attrs.update(attrs)
+        if kwargs:
+            self.attrs.update(kwargs)
+
+    def error(self, message: str) -> None:
+        self.status = STATUS_ERROR
+        self.message = str(message)[:500]
+
+    def finish(self, root: bool) -> None:
+        self.end_ns = time.time_ns()
+        trace = self.trace
+        with trace.lock:
+            if trace.exported:
+                batch = [self]  # terminou depois do raiz (ex.: cópia do hedge que perdeu)
+            else:
+                trace.spans.append(self)
+                if not root and len(trace.spans) < FLUSH_SPANS:
+                    return
+                batch, trace.spans, trace.exported = trace.spans, [], root
+        exporter = ACTIVE
+        if exporter is not None:
+            exporter.export(batch)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        out = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": otlp_attributes(self.attrs),
+            "status": {"code": self.status or STATUS_OK, **({"message": self.message} if self.message else {})},
+        }
+        if self.parent_id:
+            out["parentSpanId"] = self.parent_id
+        return out
+
+class NoopSpan:
+    """Span quando o rastreamento está desligado: aceita tudo e não guarda nada."""
+    __slots__ = ()
+    recording = False
+
+    def set(self, attrs=None, **kwargs) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+NOOP = NoopSpan()
+
+class Exporter:
+    """
+    Grava cada trace (ou lote de FLUSH_SPANS spans dele) como 1 linha JSON no formato
+    OTLP/JSON (resourceSpans), o mesmo do file exporter do OpenTelemetry Collector.
+    path '-' = stdout.
+    Com pre-fork, cada processo abre o arquivo de novo (modo append, 1 write por linha).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.handle = None
+        self.pid = 0
+        self.counters = {"linhas": 0, "spans": 0}
+
+    def stream(self):
+        if self.path == "-":
+            return sys.stdout
+        if self.handle is None or self.pid != os.getpid():
+            self.handle = open(self.path, "a", encoding="utf-8")
+            self.pid = os.getpid()
+        return self.handle
+
+    def export(self, spans: List[Span]) -> None:
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": otlp_attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+            "scopeSpans": [{"scope": {"name": "sf_trace"}, "spans": [s.to_otlp() for s in spans]}],
+        }]}, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self.lock:
+            try:
+                out = self.stream()
+                out.write(line + "\n")
+                out.flush()
+            except OSError:
+                return
+            self.counters["linhas"] += 1
+            self.counters["spans"] += len(spans)
+
+    def close(self) -> None:
+        with self.lock:
+            if self.handle is not None and self.pid == os.getpid():
+                self.handle.close()
+            self.handle = None
+
+class span:
+    """
+    Context manager: abre um span filho do span atual (ou raiz de um trace novo).
+    Exceção que atravessa o bloco marca o span com erro. Sem --trace devolve NOOP.
+
+    with sf_trace.span("sf.query", "client", {"soql.objeto": "ServiceResource"}) as sp:
+        sp.set(registros=10)
+    """
+    __slots__ = ("name", "kind", "attrs", "remote", "current", "token", "root")
+
+    def __init__(self, name: str, kind: str = "internal", attrs: Optional[Dict[str, Any]] = None,
+                 remote: Optional[tuple] = None):
+        self.name = name
+        self.kind = kind
+        self.attrs = attrs
+        self.remote = remote
+        self.current = None
+
+    def __enter__(self):
+        if ACTIVE is None:
+            return NOOP
+        parent = CURRENT.get()
+        self.root = parent is None
+        self.current = Span(self.name, self.kind, parent, self.attrs, self.remote)
+        self.token = CURRENT.set(self.current)
+        return self.current
+
+    def __exit__(self, exc_type, exc, tb):
+        sp = self.current
+        if sp is None:
+            return False
+        CURRENT.reset(self.token)
+        if exc is not None and not sp.status and not (isinstance(exc, SystemExit) and not exc.code):
+            sp.error(f"{exc_type.__name__}: {exc}")
+        sp.finish(root=self.root)
+        return False
+
+def traced(name: str, kind: str = "internal"):
+    """Decorador: a função vira um span `name` (custo ~zero sem --trace)."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if ACTIVE is None:
+                return fn(*args, **kwargs)
+            with span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def current():
+    """Span aberto no contexto atual (NOOP se não há ou o rastreamento está desligado)."""
+    return (CURRENT.get() if ACTIVE is not None else None) or NOOP
+
+def parse_traceparent(value: Optional[str]) -> Optional[tuple]:
+    """Cabeçalho W3C traceparent ('00-<trace 32 hex>-<span 16 hex>-01') -> (trace_id, span_id)."""
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1].lower(), parts[2].lower()
+
+def record_response(method, url, response, elapsed):
+    # cada ida ao Salesforce (inclui retries e cópias do hedge) vira um span filho já terminado
+    if ACTIVE is None:
+        return
+    parent = CURRENT.get()
+    if parent is None:
+        return
+    sp = Span("sf.http", "client", parent, {
+        "http.method": method,
+        "sf.operacao": perfil.operation_name(method, url),
+        "http.status_code": response.status_code,
+        "http.response_content_length": len(response.content or b""),
+    })
+    sp.start_ns = time.time_ns() - int(elapsed * 1e9)
+    if response.status_code >= 400:
+        sp.error(f"HTTP {response.status_code}")
+    sp.finish(root=False)
+
+sf_http.on_response(record_response)
+
+def start(path: str) -> Exporter:
+    """Liga o rastreamento para o resto do processo (path '-' = stdout)."""
+    global ACTIVE
+    ACTIVE = Exporter(path)
+    return ACTIVE
+
+def stop() -> None:
+    global ACTIVE
+    exporter, ACTIVE = ACTIVE, None
+    if exporter is not None:
+        exporter.close()
+
+def stats() -> Dict[str, Any]:
+    exporter = ACTIVE
+    if exporter is None:
+        return {"ligado": False}
+    with exporter.lock:
+        return {"ligado": True, "destino": exporter.path, **exporter.counters}
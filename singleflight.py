@@ -0,0 +1,85 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import sf_http
+
+class Call:
+    """Uma leitura em voo: quem chegar depois espera `done` e usa o mesmo resultado."""
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException = None
+
+class SingleFlight:
+    """
+    Leituras idênticas simultâneas viram UMA chamada: a primeira executa, as outras
+    esperam e recebem o mesmo resultado (ou a mesma exceção). Nada fica guardado depois
+    que a chamada termina — a próxima leitura vai ao Salesforce de novo (não é cache).
+
+    budget() -> segundos que quem espera ainda pode esperar (None = sem limite); passado
+    esse tempo, a espera termina com TimeoutError e a chamada do líder segue sozinha.
+    A chamada roda no prazo do líder: se ela cai nele (DeadlineExceeded), quem esperava e
+    ainda tem prazo não recebe o erro — tenta de novo (e vira o novo líder, ou espera outro).
+    """
+
+    def __init__(self, budget: Optional[Callable[[], Optional[float]]] = None):
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, Call] = {}
+        self.counters = {"chamadas": 0, "compartilhadas": 0}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        while True:
+            call, leader = self.join(key)
+            if leader:
+                return self.lead(key, call, fn, *args, **kwargs)
+            left = self.budget() if self.budget else None
+            if not call.done.wait(None if left is None else max(0.0, left)):
+                raise TimeoutError("Prazo esgotado esperando leitura igual em andamento")
+            if isinstance(call.error, sf_http.DeadlineExceeded):
+                left = self.budget() if self.budget else None
+                if left is None or left > 0:
+                    continue  # o prazo que acabou foi o do líder, não o meu
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def join(self, key: Hashable):
+        """(chamada em voo da chave, True se quem chamou abriu a chamada e deve executá-la)."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+                self.counters["chamadas"] += 1
+            else:
+                self.counters["compartilhadas"] += 1
+        return call, leader
+
+    def lead(self, key: Hashable, call: Call, fn: Callable, *args, **kwargs) -> Any:
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            out = dict(self.counters)
+            out["em_voo"] = len(self.calls)
+        return out
+
+def headers_key(headers: Dict) -> tuple:
+    """Cabeçalhos (token) como parte da chave: orgs/tokens diferentes não compartilham leitura."""
+    return tuple(sorted((headers or {}).items()))
+
+# Instância do processo usada pelas leituras do Salesforce (sf_query e contexto da API);
+# quem espera respeita o prazo da requisição (sf_http.deadline)
+READS = SingleFlight(budget=sf_http.remaining)